@@ -1,8 +1,7 @@
 import os
 import logging
+import importlib
 from   . import defaults
-from   .utils.downloader import download_model, set_symlink
-from   .models.model_factory import load_inference_model
 
 logger = logging.getLogger(__name__)
 
@@ -11,12 +10,26 @@ logger = logging.getLogger(__name__)
 __version__ = '0.5.1'
 
 
+# Functions that are imported the first time they're used, so that "import amrlib" doesn't load
+# heavy libraries (ie.. requests) until they're needed.  Note that torch, transformers, etc.. are only
+# imported by the model's inference module, when the model is loaded.
+lazy_imports = {'download_model':'.utils.downloader', 'set_symlink':'.utils.downloader',
+                'load_inference_model':'.models.model_factory'}
+def __getattr__(name):
+    if name in lazy_imports:
+        value = getattr(importlib.import_module(lazy_imports[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
 # Download the model to and un-tar it in the mdata_dir
 # ie.. download('model_generate_t5', 'http://127.0.0.1:8000/model_generate_t5-v_0_0_0.tar.gz')
 # the model_name will the the linkname in the mdata_dir pointing to the new model's directory
 # For testing with local data, cd to the directory with the models run a local file server with...
 # `python3 -m http.server 8000`
 def download(model_name, url, mdata_dir=None, rm_tar=True, set_links=True):
+    from .utils.downloader import download_model, set_symlink
     mdata_dir = mdata_dir if mdata_dir is not None else defaults.data_dir
     model_dir = download_model(url, mdata_dir, rm_tar)
     if set_links and model_dir is not None:
@@ -30,6 +43,7 @@ def download(model_name, url, mdata_dir=None, rm_tar=True, set_links=True):
 # Load the sentence to graph model
 stog_model = None   # cache model once loaded
 def load_stog_model(model_dir=None, **kwargs):
+    from .models.model_factory import load_inference_model
     model_dir = model_dir if model_dir is not None else os.path.join(defaults.data_dir, 'model_stog')
     global stog_model
     stog_model = load_inference_model(model_dir, **kwargs)
@@ -38,6 +52,7 @@ def load_stog_model(model_dir=None, **kwargs):
 # Load the graph to sentence model
 gtos_model = None   # cache model once loaded
 def load_gtos_model(model_dir=None, **kwargs):
+    from .models.model_factory import load_inference_model
     global gtos_model
     model_dir = model_dir if model_dir is not None else os.path.join(defaults.data_dir, 'model_gtos')
     gtos_model = load_inference_model(model_dir, **kwargs)
@@ -0,0 +1,206 @@
+import os
+import json
+import heapq
+import logging
+import numpy
+
+logger = logging.getLogger(__name__)
+
+
+###################################################################################################
+# Native python/numpy replacement for the fast_align and atools binaries used during inference
+#
+# fast_align's force-align mode (-f params -d) finds the Viterbi alignment under IBM Model 2 with
+# the diagonal-favoring distortion model.  For each target word f_j, every source word e_i
+# (1 based) scores
+#     t(e_i | f_j) * exp(-T * |i/n - (j+1)/m|) / Z(j+1, m, n) * (1 - p_null)
+# and the null word scores t(<eps> | f_j) * p_null, where n / m are the source / target lengths.
+# The highest scoring source word is the alignment (the first one for ties) and target words
+# where the null word is at least as probable are left unaligned.  Words not in the translation
+# table get a probability of 1e-9, the same as fast_align.
+# The scores for a batch of sentence pairs are computed together as flat numpy arrays with one
+# entry per (pair, target word, source word).
+#
+# The forward and reverse alignments are then symmetrized with grow-diag-final-and, done the same
+# way (and in the same order) as atools.
+###################################################################################################
+
+NULL_WORD = '<eps>'
+UNK_PROB  = 1e-9
+NEIGHBORS = [(1, 0), (-1, 0), (0, 1), (0, -1), (-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+
+# Drop-in replacement for TrainedAligner that doesn't need the binaries
+class NativeAligner(object):
+    def __init__(self, model_in_dir, **kwargs):
+        with open(os.path.join(model_in_dir, 'amrlib_meta.json')) as f:
+            meta = json.load(f)
+        p = meta['train_params']
+        self.batch_size = kwargs.get('batch_size', 1000)
+        # Use the same parameters for both directions as the fast_align command lines in TrainedAligner
+        self.fwd_model  = IBM2Model(os.path.join(model_in_dir, 'fwd_params'), p['q'], p['fwd_T'])
+        self.rev_model  = IBM2Model(os.path.join(model_in_dir, 'rev_params'), p['q'], p['fwd_T'])
+        if p['heuristic'] != 'grow-diag-final-and':
+            raise ValueError('Unsupported heuristic %s' % p['heuristic'])
+
+    # Same inputs and outputs as TrainedAligner.align
+    def align(self, eng_td_lines, amr_td_lines):
+        eng_toks = [l.split() for l in eng_td_lines]
+        amr_toks = [l.split() for l in amr_td_lines]
+        at_lines = []
+        for start in range(0, len(eng_toks), self.batch_size):
+            eng_batch = eng_toks[start:start+self.batch_size]
+            amr_batch = amr_toks[start:start+self.batch_size]
+            fwd_links = self.fwd_model.align(eng_batch, amr_batch)
+            # reverse direction, flip the links back to (eng, amr) order
+            rev_links = [[(i, j) for j, i in links] for links in self.rev_model.align(amr_batch, eng_batch)]
+            for fwd, rev in zip(fwd_links, rev_links):
+                links = grow_diag_final_and(fwd, rev)
+                at_lines.append(' '.join('%d-%d' % l for l in links))
+        return at_lines
+
+    # Nothing to check or shut down.  These are here for compatibility with TrainedAligner.
+    def check_for_binaries(self):
+        pass
+
+    def close(self):
+        pass
+
+
+###############################################################################
+#### IBM Model 2 Viterbi alignment
+###############################################################################
+
+class IBM2Model(object):
+    def __init__(self, params_fn, p_null, tension):
+        self.p_null  = p_null       # fast_align -q
+        self.tension = tension      # fast_align -T
+        self.load_params(params_fn)
+
+    # Load the translation table, written by fast_align as "src_word <tab> trg_word <tab> log_prob"
+    # The table is stored as sorted integer keys (src_id * num_trg + trg_id) and the probabilities.
+    def load_params(self, fn):
+        self.src_vocab, self.trg_vocab = {NULL_WORD:0}, {}
+        src_ids, trg_ids, log_probs = [], [], []
+        with open(fn, encoding='utf8') as f:
+            for line in f:
+                parts = line.rstrip('\n').split('\t')
+                if len(parts) != 3:
+                    continue
+                src_ids.append(self.src_vocab.setdefault(parts[0], len(self.src_vocab)))
+                trg_ids.append(self.trg_vocab.setdefault(parts[1], len(self.trg_vocab)))
+                log_probs.append(float(parts[2]))
+        keys  = numpy.array(src_ids, dtype=numpy.int64) * len(self.trg_vocab) + \
+                numpy.array(trg_ids, dtype=numpy.int64)
+        order = numpy.argsort(keys, kind='stable')
+        self.keys  = keys[order]
+        self.probs = numpy.exp(numpy.array(log_probs, dtype=numpy.float64)[order])
+        logger.debug('Loaded %d translation probabilities from %s' % (len(self.keys), fn))
+
+    # Translation probabilities for arrays of src / trg ids.  Unknown words have an id of -1.
+    def get_probs(self, src_ids, trg_ids):
+        probs = numpy.full(len(src_ids), UNK_PROB)
+        known = (src_ids >= 0) & (trg_ids >= 0)
+        if not len(self.keys) or not known.any():
+            return probs
+        keys  = src_ids[known] * len(self.trg_vocab) + trg_ids[known]
+        idx   = numpy.minimum(numpy.searchsorted(self.keys, keys), len(self.keys) - 1)
+        found = self.keys[idx] == keys
+        probs[numpy.flatnonzero(known)[found]] = self.probs[idx[found]]
+        return probs
+
+    # Viterbi alignment for lists of tokenized source and target sentences.  Returns a list of
+    # (src_idx, trg_idx) links for each pair, 0 based.  Empty sentences get no links.
+    def align(self, src_sents, trg_sents):
+        n = numpy.array([len(s) for s in src_sents], dtype=numpy.int64)
+        m = numpy.array([len(t) for t in trg_sents], dtype=numpy.int64)
+        n[m == 0] = 0       # nothing to align for either of these
+        m[n == 0] = 0
+        src_ids = numpy.array([self.src_vocab.get(w, -1) for s, l in zip(src_sents, n) if l for w in s],
+                              dtype=numpy.int64)
+        trg_ids = numpy.array([self.trg_vocab.get(w, -1) for t, l in zip(trg_sents, m) if l for w in t],
+                              dtype=numpy.int64)
+        # One group per target word: sentence index, target position j and token id
+        g_sent   = numpy.repeat(numpy.arange(len(m)), m)
+        g_j      = numpy.arange(len(g_sent)) - numpy.repeat(numpy.cumsum(m) - m, m)
+        g_n, g_m = n[g_sent].astype(numpy.float64), m[g_sent].astype(numpy.float64)
+        # One cell per (target word, source word) with the source position i (1 based)
+        c_group  = numpy.repeat(numpy.arange(len(g_sent)), n[g_sent])
+        c_starts = numpy.cumsum(n[g_sent]) - n[g_sent]
+        c_i      = numpy.arange(len(c_group)) - c_starts[c_group] + 1
+        src_starts = numpy.cumsum(n) - n
+        c_src    = src_ids[src_starts[g_sent[c_group]] + c_i - 1]
+        # Distortion probabilities
+        j1 = (g_j + 1).astype(numpy.float64)
+        az = diagonal_z(j1, g_m, g_n, self.tension) / (1.0 - self.p_null)
+        c_prob_a = unnormalized_prob(j1[c_group], c_i.astype(numpy.float64), g_m[c_group], g_n[c_group],
+                                     self.tension) / az[c_group]
+        c_pat    = self.get_probs(c_src, trg_ids[c_group]) * c_prob_a
+        null_pat = self.get_probs(numpy.zeros(len(trg_ids), dtype=numpy.int64), trg_ids) * self.p_null
+        # Best source word for each target word, the first one if there's a tie
+        links = [[] for _ in range(len(src_sents))]
+        if not len(c_group):
+            return links
+        max_pat = numpy.maximum.reduceat(c_pat, c_starts)
+        best_i  = numpy.where(c_pat == max_pat[c_group], c_i, numpy.iinfo(numpy.int64).max)
+        best_i  = numpy.minimum.reduceat(best_i, c_starts)
+        aligned = numpy.flatnonzero(max_pat > null_pat)
+        for sent, i, j in zip(g_sent[aligned].tolist(), best_i[aligned].tolist(), g_j[aligned].tolist()):
+            links[sent].append((i - 1, j))
+        return links
+
+
+# fast_align's DiagonalAlignment::UnnormalizedProb
+def unnormalized_prob(i, j, m, n, tension):
+    return numpy.exp(-numpy.abs(j / n - i / m) * tension)
+
+# fast_align's DiagonalAlignment::ComputeZ, the sum of unnormalized_prob over j = 1..n in closed form
+def diagonal_z(i, m, n, tension):
+    split   = i * n / m
+    floor   = numpy.floor(split)
+    ratio   = numpy.exp(-tension / n)
+    num_top = n - floor
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        ezt = unnormalized_prob(i, floor + 1, m, n, tension) * (1.0 - ratio**num_top) / (1.0 - ratio)
+        ezb = unnormalized_prob(i, floor, m, n, tension) * (1.0 - ratio**floor) / (1.0 - ratio)
+    return numpy.where(floor > 0, ezb, 0.0) + numpy.where(num_top > 0, ezt, 0.0)
+
+
+###############################################################################
+#### Symmetrization
+###############################################################################
+
+# Symmetrize the forward and reverse (src_idx, trg_idx) links, the same as atools -c grow-diag-final-and.
+# atools scans the alignment matrix in row order, growing from each aligned point as it goes, and
+# repeats until nothing is added.  Points are processed here in the same order with a heap, so a
+# point added ahead of the current position is handled in the same pass and one behind it in the next.
+def grow_diag_final_and(fwd_links, rev_links):
+    fwd, rev  = set(fwd_links), set(rev_links)
+    union     = fwd | rev
+    alignment = fwd & rev
+    src_aligned = {i for i, _ in alignment}
+    trg_aligned = {j for _, j in alignment}
+    added = True
+    while added:
+        added = False
+        heap  = list(alignment)
+        heapq.heapify(heap)
+        while heap:
+            i, j = heapq.heappop(heap)
+            for di, dj in NEIGHBORS:
+                point = (i + di, j + dj)
+                if point in union and point not in alignment and \
+                        (point[0] not in src_aligned or point[1] not in trg_aligned):
+                    alignment.add(point)
+                    src_aligned.add(point[0])
+                    trg_aligned.add(point[1])
+                    added = True
+                    if point > (i, j):
+                        heapq.heappush(heap, point)
+    # final-and: add union points where neither word is aligned yet
+    for i, j in sorted(union - alignment):
+        if i not in src_aligned and j not in trg_aligned:
+            alignment.add((i, j))
+            src_aligned.add(i)
+            trg_aligned.add(j)
+    return sorted(alignment)
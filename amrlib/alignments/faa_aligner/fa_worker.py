@@ -0,0 +1,105 @@
+import subprocess
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+###################################################################################################
+# Long-lived wrapper around one of the fast_align binaries
+#
+# fast_align, run with "-i -" and a parameter file, and atools, run with "-i - -j -", read their
+# input one line at a time from stdin and write one output line for every input line (or pair of
+# lines for atools) so a single process can be kept open and re-used for every call, instead of
+# starting it and re-loading the parameter files each time.  This is the same protocol used by
+# fast_align's force_align.py.
+#
+# Lines are written to the process from a separate thread while the output is read, so large
+# batches don't deadlock on full pipe buffers.  If the process has exited, or dies / hangs
+# (longer than timeout seconds) during a call, it's restarted and the call is retried once.
+###################################################################################################
+
+class FAWorker(object):
+    def __init__(self, cmd, timeout=None):
+        self.cmd     = cmd          # command, as a list, to start the process
+        self.timeout = timeout      # seconds allowed per call before the process is killed. None = no limit
+        self.proc    = None
+        self.restarts = 0
+        self.lock    = threading.Lock()
+
+    def start(self):
+        # stderr is discarded since nothing reads it and a full pipe would block the process
+        self.proc = subprocess.Popen(self.cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                     stderr=subprocess.DEVNULL, text=True, bufsize=1)
+
+    def is_alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    # Close stdin so the process exits normally, killing it if it doesn't
+    def close(self):
+        with self.lock:
+            self.stop()
+
+    def stop(self):
+        if self.proc is None:
+            return
+        try:
+            self.proc.stdin.close()
+            self.proc.wait(timeout=1.0)
+        except (OSError, subprocess.TimeoutExpired):
+            self.proc.kill()
+            self.proc.wait()
+        self.proc.stdout.close()
+        self.proc = None
+
+    # Send the lines to the process and return the num_out output lines (without the line-feed)
+    def process(self, lines, num_out):
+        with self.lock:
+            for attempt in range(2):
+                if not self.is_alive():
+                    if self.proc is not None:
+                        logger.warning('%s exited with code %s, restarting' % (self.cmd[0], self.proc.returncode))
+                        self.stop()
+                        self.restarts += 1
+                    self.start()
+                try:
+                    return self.communicate(lines, num_out)
+                except (OSError, EOFError) as e:
+                    logger.warning('%s failed (%s)' % (self.cmd[0], e))
+                    self.proc.kill()
+                    self.proc.wait()
+            raise RuntimeError('%s failed after restarting' % self.cmd[0])
+
+    def communicate(self, lines, num_out):
+        proc   = self.proc
+        errors = []
+        writer = threading.Thread(target=self.write_lines, args=(proc, lines, errors), daemon=True)
+        writer.start()
+        # Kill the process if it hangs.  This closes stdout and the readline below gets an EOF.
+        timer = None
+        if self.timeout is not None:
+            timer = threading.Timer(self.timeout, proc.kill)
+            timer.start()
+        try:
+            out_lines = []
+            for _ in range(num_out):
+                line = proc.stdout.readline()
+                if not line:
+                    raise EOFError('unexpected end of output after %d of %d lines' % (len(out_lines), num_out))
+                out_lines.append(line.rstrip('\n'))
+        finally:
+            if timer is not None:
+                timer.cancel()
+            writer.join()
+        if errors:
+            raise errors[0]
+        return out_lines
+
+    @staticmethod
+    def write_lines(proc, lines, errors):
+        try:
+            for line in lines:
+                proc.stdin.write(line + '\n')
+            proc.stdin.flush()
+        except OSError as e:
+            errors.append(e)
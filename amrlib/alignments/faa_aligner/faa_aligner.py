@@ -4,7 +4,10 @@ import json
 import subprocess
 import logging
 import tarfile
-from   .preprocess import preprocess_infer
+from   concurrent.futures import ThreadPoolExecutor
+from   .fa_worker import FAWorker
+from   .fa_native import NativeAligner
+from   .preprocess import preprocess_infer, load_infer_resources
 from   .postprocess import postprocess
 from   .get_alignments import GetAlignments
 from   ..penman_utils import to_graph_line
@@ -20,6 +23,11 @@ class FAA_Aligner(object):
         self.model_dir    = kwargs.get('model_dir',    os.path.join(data_dir, 'model_aligner_faa'))
         self.model_tar_fn = kwargs.get('model_tar_fn', os.path.join(this_dir, 'model_aligner_faa.tar.gz'))
         self.setup_model_dir()
+        self.resources    = load_infer_resources(**kwargs)   # stopword sets for preprocess_infer
+        # The native aligner is a python/numpy version of fast_align and atools that doesn't need the binaries
+        if kwargs.get('native', False):
+            self.aligner = NativeAligner(self.model_dir, **kwargs)
+            return
         self.aligner = TrainedAligner(self.model_dir, **kwargs)
         try:
             self.aligner.check_for_binaries()   # Will raise FileNotFoundError if binaries can't be found
@@ -33,7 +41,7 @@ class FAA_Aligner(object):
     def align_sents(self, space_tok_sents, graph_strings):
         assert len(space_tok_sents) == len(graph_strings)
         graph_strings = [to_graph_line(g) for g in graph_strings]
-        data = preprocess_infer(space_tok_sents, graph_strings, skip_empty_check=True)
+        data = preprocess_infer(space_tok_sents, graph_strings, skip_empty_check=True, **self.resources)
         # Filter lines for empty strings.  The aligner doesn't return a value for blanks on either eng or amr
         skips, eng_lines, amr_lines = set(), [], []
         for i, (eng_l, amr_l) in enumerate(zip(data.eng_preproc_lines, data.amr_preproc_lines)):
@@ -46,14 +54,16 @@ class FAA_Aligner(object):
         model_out_lines = self.aligner.align(eng_lines, amr_lines)
         assert len(model_out_lines) == len(eng_lines)
         # Add back in blanks for skipped lines
-        final_astrings = [''] * len(data.eng_preproc_lines)
-        for i in range(len(final_astrings)):
-            if i not in skips:
-                final_astrings[i] = model_out_lines.pop(0)
+        model_out_iter = iter(model_out_lines)
+        final_astrings = ['' if i in skips else next(model_out_iter) for i in range(len(data.eng_preproc_lines))]
         data.model_out_lines = final_astrings
         amr_surface_aligns, alignment_strings = postprocess(data)
         return amr_surface_aligns, alignment_strings
 
+    # Stop the worker processes when using persistent=True
+    def close(self):
+        self.aligner.close()
+
 
     # check the model directory, if it doesn't have the metadata file try to create
     # the directory from the tar.gz file
@@ -76,6 +86,9 @@ class FAA_Aligner(object):
 
 
 # Code adapted from from https://github.com/clab/fast_align/blob/master/src/force_align.py
+# With persistent=True the forward and reverse fast_align processes and atools are started once
+# and kept running (see fa_worker.py), and the forward and reverse alignments are run concurrently.
+# Otherwise new processes are started for every call to align().
 class TrainedAligner:
     def __init__(self, model_in_dir, **kwargs):
         # If the bin_dir is not provided, get it from the environment, but default
@@ -101,6 +114,10 @@ class TrainedAligner:
         self.fwd_cmd   = fwd_cmd.split()
         self.rev_cmd   = rev_cmd.split()
         self.tools_cmd = tools_cmd.split()
+        # Long-lived worker processes
+        self.persistent = kwargs.get('persistent', False)
+        self.workers    = None
+        self.executor   = None
 
     # Open a connection to the subprocess in text mode
     @staticmethod
@@ -111,6 +128,8 @@ class TrainedAligner:
     def align(self, eng_td_lines, amr_td_lines):
         # Combine lines into fast align input format
         lines = ['%s ||| %s' % (el, al) for el, al in zip(eng_td_lines, amr_td_lines)]
+        if self.persistent:
+            return self.align_persistent(lines)
         # Open connections to the alignment binaries
         self.fwd_align = self.popen_io(self.fwd_cmd)
         self.rev_align = self.popen_io(self.rev_cmd)
@@ -129,6 +148,34 @@ class TrainedAligner:
         at_lines = [l.strip() for l in at_out.splitlines()]
         return at_lines
 
+    # Align using the long-lived worker processes, started on the first call
+    def align_persistent(self, lines):
+        if not lines:
+            return []
+        if self.workers is None:
+            self.workers  = {name:FAWorker(cmd, self.timeout) for name, cmd in
+                (('fwd', self.fwd_cmd), ('rev', self.rev_cmd), ('tools', self.tools_cmd))}
+            self.executor = ThreadPoolExecutor(max_workers=2)
+        fa_in = [l.strip() for l in lines]
+        fwd_future = self.executor.submit(self.workers['fwd'].process, fa_in, len(fa_in))
+        rev_future = self.executor.submit(self.workers['rev'].process, fa_in, len(fa_in))
+        # output is     f words ||| e words ||| links ||| score
+        fwd_lines = [l.split('|||')[2].strip() for l in fwd_future.result()]
+        rev_lines = [l.split('|||')[2].strip() for l in rev_future.result()]
+        # atools reads the forward and reverse alignments as alternating lines
+        at_in = [l for pair in zip(fwd_lines, rev_lines) for l in pair]
+        at_lines = self.workers['tools'].process(at_in, len(lines))
+        return [l.strip() for l in at_lines]
+
+    # Stop the worker processes.  They'll be restarted if align() is called again.
+    def close(self):
+        if self.workers is not None:
+            for worker in self.workers.values():
+                worker.close()
+            self.executor.shutdown()
+        self.workers  = None
+        self.executor = None
+
     # This will raise FileNotFoundError if either call fails
     # Note that both commands trigger the help message and will produce a return-code of 1
     # which is typically considered and error
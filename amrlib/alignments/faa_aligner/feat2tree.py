@@ -5,10 +5,6 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-# global variables used in functions
-global_input_id = None
-global_input_node_id = None
-
 # Defines
 INSTANCE = '/' # shorthand for ':instance'
 REST = ':rest' # lumping keyword on the lhs
@@ -58,48 +54,63 @@ class FeatGraph(object):
             self.val = alignsplit[0]
 
     # NOTE: yanggao20130814 added alignset printout
-    def pp(self, printed_nodes = set([])):
+    def pp(self):
         '''features:
            1) one-line output
            2) corefering nodes are fully specified once and once only
         '''
-        if not self.feats or self in printed_nodes:
-            if self.alignset:
-                return self.val + '~e.' + ','.join(str(i) for i in sorted(self.alignset))
-            else:
-                return self.val
-        s = self.val + ' '
-        feats_str_list = []
-        printed_nodes = printed_nodes | set([self])
-        for ind, feat in enumerate(self.feats):
-            node_repr = feat.node.pp(printed_nodes)
-            printed_nodes |= set(feat.node.get_nonterm_nodes())
-            if feat.alignset:
-                feats_str_list.append(feat.edge + '~e.' + ','.join(str(i) for i in sorted(feat.alignset)) + ' ' + node_repr)
-            else:
-                feats_str_list.append(feat.edge + ' ' + node_repr)
-        s += ' '.join(feats_str_list)
-        return '(' + s.strip() + ')'
+        # Iterative, post-order.  Each stack entry is a node and the strings for the feats done so far.
+        if not self.feats:
+            return self.leaf_str()
+        printed_nodes = set([self])
+        stack  = [(self, [])]
+        result = None
+        while stack:
+            node, feats_str_list = stack[-1]
+            if result is not None:      # the node for the next feat was just finished
+                feat = node.feats[len(feats_str_list)]
+                if feat.alignset:
+                    feats_str_list.append(feat.edge + '~e.' + ','.join(str(i) for i in sorted(feat.alignset)) + ' ' + result)
+                else:
+                    feats_str_list.append(feat.edge + ' ' + result)
+                result = None
+            if len(feats_str_list) < len(node.feats):
+                child = node.feats[len(feats_str_list)].node
+                if not child.feats or child in printed_nodes:
+                    result = child.leaf_str()
+                else:
+                    printed_nodes.add(child)
+                    stack.append((child, []))
+                continue
+            stack.pop()
+            s = node.val + ' ' + ' '.join(feats_str_list)
+            result = '(' + s.strip() + ')'
+        return result
+
+    def leaf_str(self):
+        if self.alignset:
+            return self.val + '~e.' + ','.join(str(i) for i in sorted(self.alignset))
+        else:
+            return self.val
+
+    # All nodes in the graph, in pre-order
+    def iter_nodes(self):
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(f.node for f in reversed(node.feats))
 
     def get_nonterm_nodes(self):
-        ret = []
-        if self.feats:
-            ret.append(self)
-        for f in self.feats:
-            ret.extend(f.node.get_nonterm_nodes())
-        return ret
-
-    def assign_id(self):
-        global global_input_node_id
-        if self.id == None:
-            self.id = global_input_node_id
-            global_input_node_id += 1
-            for f in self.feats:
-                f.node.assign_id()
-
-    #TODO: create id when doing this corefy, using a dictionary!! similarly for tree, create
-    # dictionary, then for virtual nodes just extend it
-    def corefy(self, all_nt):
+        return [node for node in self.iter_nodes() if node.feats]
+
+    # Number the nodes in pre-order, starting at start_id
+    def assign_id(self, start_id=0):
+        for node_id, node in enumerate(self.iter_nodes(), start_id):
+            if node.id is None:
+                node.id = node_id
+
+    def corefy(self, all_nt, amr_id=None):
         '''make the coref i under :ARG1 in
            (w / want :ARG0 (i / i) :ARG1 i)
            pointing to the primary subgraph
@@ -113,22 +124,29 @@ class FeatGraph(object):
            4) assumes that property value cannot have the
               form of [a-zA-Z]\d*, so not same as nonterm
         '''
+        nt_vals = set(nt.val for nt in all_nt)
         if not self.feats:
-            for nt in all_nt:
-                if self.val == nt.val:
-                    global global_input_id
-                    logger.info('amr %d corefy.  referent triple: (%s %s %s)' % \
-                        (global_input_id, self.pi.val, self.pi_edge, self.val))
-                    # return a non-recursive copy
-                    return FeatGraph(None, self.val, None, [])
-
-        for ind, f in enumerate(self.feats):
-            # don't mistake the second i in
-            # (w / want :ARG0 (i / i) :ARG1 i) as coref
-            if f.edge != INSTANCE:
-                self.feats[ind].node = f.node.corefy(all_nt)
+            return self.coref_copy(amr_id) if self.val in nt_vals else self
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            for f in node.feats:
+                # don't mistake the second i in
+                # (w / want :ARG0 (i / i) :ARG1 i) as coref
+                if f.edge == INSTANCE:
+                    continue
+                if f.node.feats:
+                    stack.append(f.node)
+                elif f.node.val in nt_vals:
+                    f.node = f.node.coref_copy(amr_id)
         return self
 
+    # return a non-recursive copy
+    def coref_copy(self, amr_id):
+        logger.info('amr %s corefy.  referent triple: (%s %s %s)' % \
+            (amr_id, self.pi.val if self.pi else '', self.pi_edge, self.val))
+        return FeatGraph(None, self.val, None, [])
+
 
 # comment starting with '#', or blank line
 COMMENT = re.compile(r'\s*#[^\n]*(\n\s*#[^\n]*)*\n\s*|\n')
@@ -147,78 +165,93 @@ REL_REST = r'\s*%s\s*(=\s*\[\s*%s\s*(\S+)\s*\]\s*)?'%(REST, INSTANCE) # :rest w/
 REL_LABEL_AMR = re.compile(r'%s|%s|%s'%(REL_REST, REL_INST, REL_NORM))
 
 
-def input_amrparse(s, pos = 0, depth = 0):
-    '''return a (pos, FeatGraph) pair
-    '''
-    comment_match = COMMENT.match(s, pos)
-    if comment_match:
-        pos = comment_match.end()
-        comment_symbol = comment_match.group().strip()
-
-    node_match = NODE_AMR.match(s, pos)
-    if node_match:
-        pos = node_match.end()
-        node_symbol = node_match.group().strip()
-        node = FeatGraph(None, node_symbol, None, [])
-        return pos, node
-
-    nb_match = NODE_BEGIN_AMR.match(s, pos)
-    if nb_match:
-        pos = nb_match.end()
-        pos, node = input_amrparse(s, pos, depth+1)
-
-        if not node:
-            return pos, None
-
-        while pos < len(s):
+# Parse the string, starting at pos, and return a (pos, FeatGraph) pair.  The FeatGraph is None
+# if the string couldn't be parsed.
+# This is done iteratively, with a stack of the nodes whose parenthesis are still open.  Each entry
+# is [node, rel] where node is None until the node after the "(" is parsed and rel is the relation
+# waiting for its node to be parsed.
+def input_amrparse(s, pos=0):
+    stack = []
+    while True:
+        # Parse the start of a node
+        comment_match = COMMENT.match(s, pos)
+        if comment_match:
+            pos = comment_match.end()
+        result = None
+        node_match = NODE_AMR.match(s, pos)
+        if node_match:
+            pos = node_match.end()
+            node_symbol = node_match.group().strip()
+            result = FeatGraph(None, node_symbol, None, [])
+        else:
+            nb_match = NODE_BEGIN_AMR.match(s, pos)
+            if nb_match:
+                pos = nb_match.end()
+                stack.append([None, None])
+                continue
+        # Give the result to the open node and parse its relations until the next node is needed
+        while True:
+            if not stack:
+                return pos, result
+            frame = stack[-1]
+            node, rel = frame
+            if result is None:
+                if node is not None:
+                    logger.error('error, return pos %d' % pos)
+                stack.pop()
+                continue
+            if node is None:
+                node = frame[0] = result
+            else:
+                node.feats.append(Feat(rel, result))
+                result.pi, result.pi_edge = node, rel
+            result = None
+            if pos >= len(s):
+                stack.pop()
+                continue
             ne_match = NODE_END_AMR.match(s, pos)
             if ne_match:
                 pos = ne_match.end()
-                return pos, node
-
+                stack.pop()
+                result = node
+                continue
             rel_match = REL_LABEL_AMR.match(s, pos)
             if rel_match:
                 pos = rel_match.end()
                 rel_symbol = rel_match.group().strip()
-                rel = ''.join(rel_symbol.split())
-                pos, newnode = input_amrparse(s, pos, depth+1)
-                if not newnode:
-                    logger.error('error, return pos %d' % pos)
-                    return pos, None
-                node.feats.append(Feat(rel, newnode))
-                newnode.pi, newnode.pi_edge = node, rel
-            else:
-                print('does not match ne or rel, pos %d' % pos)
-                return pos, None
-    return pos, None
+                frame[1] = ''.join(rel_symbol.split())
+                break
+            print('does not match ne or rel, pos %d' % pos)
+            stack.pop()
 
 
+# Set the alignments from the tuples, ie.. ('w', ':arg0', 'e.1') or ('w', '/', 'want-01', 'e.2')
+# If the same tuple is listed more than once, the last one is used.
 def get_alignment(amr, tuples):
-    for f in amr.feats:
-        for tup in tuples:
-            amr_tuple = tuple(tup[:-1])
-            alignset = set(int(i) for i in tup[-1].rsplit('e.', 1)[1].split(','))
-            if len(amr_tuple) == 2 and (amr.val, f.edge) == amr_tuple:
-                f.alignset = alignset
-            elif len(amr_tuple) == 3 and (amr.val, f.edge, f.node.val) == amr_tuple:
-                f.node.alignset = alignset
-        get_alignment(f.node, tuples)
+    alignsets = {}
+    for tup in tuples:
+        alignsets[tuple(tup[:-1])] = set(int(i) for i in tup[-1].rsplit('e.', 1)[1].split(','))
+    for node in amr.iter_nodes():
+        for f in node.feats:
+            alignset = alignsets.get((node.val, f.edge))
+            if alignset is not None:
+                f.alignset = set(alignset)
+            alignset = alignsets.get((node.val, f.edge, f.node.val))
+            if alignset is not None:
+                f.node.alignset = set(alignset)
 
 
-def align(amr_str_lines, align_str_lines):
-    global global_input_id, global_input_node_id
+ALIGN_TUPLE_RE = re.compile(r'.+e\.[\d,]+$')
 
-    global_input_id = -1
+def align(amr_str_lines, align_str_lines):
     lines_out = []
-    for amr_str, align_str in zip(amr_str_lines, align_str_lines):
+    for input_id, (amr_str, align_str) in enumerate(zip(amr_str_lines, align_str_lines)):
         amr_str = amr_str.strip().lower()
         align_str = align_str.strip().lower()
         _, amr = input_amrparse(amr_str)
-        global_input_id += 1
-        amr.corefy(amr.get_nonterm_nodes())
-        global_input_node_id = 0
+        amr = amr.corefy(amr.get_nonterm_nodes(), input_id)
         amr.assign_id()
-        tups = list(tuple(i.split('__')) for i in align_str.split() if re.match(r'.+e\.[\d,]+$', i) )
+        tups = list(tuple(i.split('__')) for i in align_str.split() if ALIGN_TUPLE_RE.match(i))
         get_alignment(amr, tups)
         lines_out.append(amr.pp())
     return lines_out
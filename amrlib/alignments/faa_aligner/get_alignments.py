@@ -1,17 +1,17 @@
 #!/usr/bin/python3
-import io
-import shutil
-import numpy
+import re
 
 
+DELIM_RE = re.compile(r'[ ()]')
+
+# Convert graphs with ISI style surface alignments (ie.. "want-01~e.2" or ":ARG0~e.3") into
+# alignment strings (ie.. "2-1 3-1.1.r ").
+# Each graph is tokenized and the tree is stored as parent / children lists so graphs of any size
+# can be handled.  The tree is walked in pre-order with an explicit stack and the alignments are
+# collected directly into a list of strings, one per graph.
 class GetAlignments(object):
     def __init__(self):
-        self.tokens = []    # strings
-        self.level  = []    # ints
-        self.tree   = numpy.zeros(shape=(1000,100), dtype='int')
-        self.deg    = numpy.zeros(shape=(1000,),    dtype='int')
-        self.p      = numpy.zeros(shape=(1000,),    dtype='int')
-        self.fout   = None
+        self.alignments = []    # one alignment string per graph
 
     @classmethod
     def from_amr_aligned(cls, infn):
@@ -30,11 +30,11 @@ class GetAlignments(object):
 
     def write_to_file(self, outfn):
         with open(outfn, 'w') as f:
-            self.fout.seek(0)
-            shutil.copyfileobj(self.fout, f)
+            for alignment in self.alignments:
+                f.write(alignment + '\n')
 
     def get_alignments(self):
-        return self.fout.getvalue().splitlines()
+        return self.alignments
 
 
     ###########################################################################
@@ -42,101 +42,91 @@ class GetAlignments(object):
     ###########################################################################
 
     def build_alignment_strings(self, lines):
-        self.fout = io.StringIO()
-        for line in lines:
-            self.parse(line)
-            self.print_tree(0, '1')
-            self.fout.write('\n')
-
-    def print_tree(self, r, l):
-        s = ''
-        tkn = self.tokens[r]
-        for i in range(len(tkn)):
-            if tkn[i] == '~':
-                stkn = tkn[i+3:]
-                al = ''
-                for j in range(len(stkn)):
-                    if stkn[j] == ',':
-                        if tkn[0] == ':':
-                            self.fout.write('%s-%s.r ' % (al, l))
-                        else:
-                            self.fout.write('%s-%s ' % (al, l))
-                        al = ''
-                    else:
-                        al = al + stkn[j]
-                if tkn[0] == ':':
-                    self.fout.write('%s-%s.r ' % (al, l))
-                else:
-                    self.fout.write('%s-%s ' % (al, l))
-                break
-        if self.tokens[r] == '/':
-            s = s + '/' + self.print_tree(self.tree[r][0], l)
-            return s
-        if self.tokens[r] == ':':
-            s = s + self.tokens[r] + ' ' + self.print_tree(self.tree[r][0], l)
-            return s
-        if self.deg[r] > 0:
-            s = s + '('
-        s = s + self.tokens[r] + ' '
-        for i in range(self.deg[r]):
-            if i == 0:
-                s = s + ' ' + self.print_tree(self.tree[r][i], l)
-            else:
-                s = s + ' ' + self.print_tree(self.tree[r][i], l + '.' + str(i))
-        if self.deg[r] > 0:
-            s = s + ')'
-        return s
+        self.alignments = [self.get_alignment_string(line) for line in lines]
 
-    def add_child(self, par, ch):
-        self.p[ch] = par
-        self.tree[par][self.deg[par]] = ch
-        self.deg[par] += 1
+    # Alignment string for a single line graph string
+    @classmethod
+    def get_alignment_string(cls, line):
+        tokens, levels = cls.parse(line)
+        if not tokens:
+            return ''
+        children = cls.make_tree(tokens, levels)
+        out = []
+        stack = [(0, '1')]
+        while stack:
+            r, l = stack.pop()
+            tkn  = tokens[r]
+            idx  = tkn.find('~')
+            if idx >= 0:
+                fmt = '%s-%s.r ' if tkn[0] == ':' else '%s-%s '
+                for al in tkn[idx+3:].split(','):
+                    out.append(fmt % (al, l))
+            # "/" and ":" only have the next token as a child
+            if tkn == '/' or tkn == ':':
+                if children[r]:
+                    stack.append((children[r][0], l))
+                continue
+            # The first child has the same label, the others get a .N suffix.  Push in reverse order
+            # so they're popped in order.
+            for i in range(len(children[r]) - 1, 0, -1):
+                stack.append((children[r][i], l + '.' + str(i)))
+            if children[r]:
+                stack.append((children[r][0], l))
+        return ''.join(out)
 
-    def make_tree(self):
+    # Build the children lists from the token levels.  Concepts ("/") and roles are children of
+    # the variable at the same level, and each of these has the following token as its child.
+    @staticmethod
+    def make_tree(tokens, levels):
+        parent   = [-1] * len(tokens)
+        children = [[] for _ in tokens]
+        def add_child(par, ch):
+            parent[ch] = par
+            children[par].append(ch)
         par = 0
-        for i in range(1, len(self.tokens)):
-            if self.level[i] < self.level[i-1]:
-                while self.level[par] > self.level[i]:
-                    par = self.p[par]
-                par = self.p[par]
-            if self.level[i] > self.level[i-1]:
+        for i in range(1, len(tokens)):
+            if levels[i] < levels[i-1]:
+                while levels[par] > levels[i]:
+                    par = parent[par]
+                par = parent[par]
+            if levels[i] > levels[i-1]:
                 par = i
-            if self.tokens[i] == '/' or self.tokens[i][0] == ':':
-                self.add_child(par, i)
-                self.add_child(i, i+1)
+            if tokens[i] == '/' or tokens[i][0] == ':':
+                add_child(par, i)
+                if i + 1 < len(tokens):
+                    add_child(i, i+1)
+        return children
 
+    # Split the graph string into tokens and their nesting level.  Quoted strings are kept as a
+    # single token, along with anything up to the next space or parenthesis (ie.. an alignment).
     @staticmethod
-    def find_first_of(string, chars, pos):
-        char_set = set(list(chars))
-        for i, string_char in enumerate(string[pos:]):
-            if string_char in char_set:
-                return i + pos
-        return -1
-
-    def parse(self, s0):
+    def parse(s0):
         v    = []   # string
         prev = 0
-        #while (pos := self.find_first_of(s0, ' ()', prev)) < 0:   # := operator new in python 3.8
+        size = len(s0)
         while True:
-            pos = self.find_first_of(s0, ' ()', prev)
-            if pos < 0: break
+            match = DELIM_RE.search(s0, prev)
+            if match is None:
+                break
+            pos = match.start()
             if pos > prev:
                 if s0[prev] == '\"':
-                    pos = prev + 1
-                    while s0[pos] != '\"':
-                        pos += 1
-                    while s0[pos] != ')' and s0[pos] != '(' and s0[pos] != ' ':
+                    pos = s0.find('\"', prev + 1)
+                    pos = size if pos < 0 else pos
+                    while pos < size and s0[pos] not in ' ()':
                         pos += 1
                 v.append(s0[prev:pos])
+                if pos >= size:
+                    prev = size
+                    break
             if s0[pos] == '(':
                 v.append('(')
             if s0[pos] == ')':
                 v.append(')')
             prev = pos + 1
-        if prev < len(s0):
+        if prev < size:
             v.append(s0[prev:])
-        self.tokens = []
-        self.level = []
+        tokens, levels = [], []
         l = 0
         for i in range(1, len(v)):
             if v[i] == '(':
@@ -145,9 +135,6 @@ class GetAlignments(object):
             if v[i] == ')':
                 l -= 1
                 continue
-            self.tokens.append(v[i])
-            self.level.append(l)
-        for i in range(1000):
-            self.deg[i] = 0
-            self.p[i] = -1
-        self.make_tree()
+            tokens.append(v[i])
+            levels.append(l)
+        return tokens, levels
@@ -1,26 +1,40 @@
 #!/usr/bin/python3
 import os
 import re
+from   itertools import zip_longest
+from   ...graph_processing.amr_loading import imap_batches
 from   .process_utils import stem_4_letters_word, stem_4_letters_line, stem_4_letters_string
 from   .process_utils import filter_eng_by_stopwords, get_lineartok_with_rel
-from   .process_utils import get_id_mapping_uniq
+from   .process_utils import get_id_mapping_uniq, load_stopwords
 from   .proc_data import ProcData
 
 # Set the default data data for misc files
 default_res_dir = os.path.dirname(os.path.realpath(__file__))
 default_res_dir = os.path.realpath(os.path.join(default_res_dir, 'resources'))
 
+amr_sense_re = re.compile(r'\-[0-9]{2,3}$')
 
-# Preprocess for inference
-def preprocess_infer(eng_lines, amr_lines, **kwargs):
-    assert len(eng_lines) == len(amr_lines)
-    # Resource filenames
+
+# Load the resource files used by preprocess_infer.  Pass the returned dictionary in as kwargs
+# to preprocess_infer so the files aren't re-read on every call.
+def load_infer_resources(**kwargs):
     res_dir         = kwargs.get('res_dir', default_res_dir)
     eng_sw_fn       = kwargs.get('eng_sw_fn', os.path.join(res_dir, 'eng_stopwords.txt'))
     amr_sw_fn       = kwargs.get('amr_sw_fn', os.path.join(res_dir, 'amr_stopwords.txt'))
+    return {'eng_stopwords':load_stopwords(eng_sw_fn), 'amr_stopwords':load_stopwords(amr_sw_fn)}
+
+
+# Preprocess for inference
+def preprocess_infer(eng_lines, amr_lines, **kwargs):
+    assert len(eng_lines) == len(amr_lines)
+    # Resources, loaded from the files if they aren't supplied
+    if 'eng_stopwords' not in kwargs or 'amr_stopwords' not in kwargs:
+        kwargs = {**kwargs, **load_infer_resources(**kwargs)}
+    eng_stopwords   = kwargs['eng_stopwords']
+    amr_stopwords   = kwargs['amr_stopwords']
 
     # Filter out stopwords from sentences
-    eng_tok_filtered_lines, eng_tok_origpos_lines = filter_eng_by_stopwords(eng_lines, eng_sw_fn)
+    eng_tok_filtered_lines, eng_tok_origpos_lines = filter_eng_by_stopwords(eng_lines, eng_stopwords)
     if not kwargs.get('skip_empty_check', False):
         for i, line in enumerate(eng_tok_origpos_lines):
             if not line.strip():
@@ -30,14 +44,14 @@ def preprocess_infer(eng_lines, amr_lines, **kwargs):
     eng_preproc_lines = [stem_4_letters_line(l) for l in eng_tok_filtered_lines]
 
     # Process the AMR data / remove stopwords
-    amr_linear_lines, amr_tuple_lines = get_lineartok_with_rel(amr_lines, amr_sw_fn)
+    amr_linear_lines, amr_tuple_lines = get_lineartok_with_rel(amr_lines, amr_stopwords)
 
     # Stem the AMR lines
     amr_preproc_lines = []
     for line in amr_linear_lines:
         new_tokens = []
         for token in line.split():
-            token = re.sub(r'\-[0-9]{2,3}$', '', token)
+            token = amr_sense_re.sub('', token)
             token = token.replace('"', '')
             token = stem_4_letters_word(token).strip()
             new_tokens.append(token)
@@ -54,24 +68,104 @@ def preprocess_infer(eng_lines, amr_lines, **kwargs):
 # extra translation lines from resource files, etc..
 def preprocess_train(eng_lines, amr_lines, **kwargs):
     repeat_td       = kwargs.get('repeat_td', 10)   # 10X is original value from isi aligner
-    # Resource filenames
-    res_dir         = kwargs.get('res_dir', default_res_dir)
-    prep_roles_fn   = kwargs.get('prep_roles_fn', os.path.join(res_dir, 'prep-roles_id.txt'))
-    eng_id_map_fn   = kwargs.get('eng_id_map_fn', os.path.join(res_dir, 'eng_id_map.txt'))
-    amr_id_map_fn   = kwargs.get('amr_id_map_fn', os.path.join(res_dir, 'amr_id_map.txt'))
 
     # Run the inference process which creates the basic translation data
     data = preprocess_infer(eng_lines, amr_lines, **kwargs)
     eng_preproc_lines = data.eng_preproc_lines
     amr_preproc_lines = data.amr_preproc_lines
 
-    # Get tokens common between the two datasets (obvious translations
-    common_tok_lines = get_id_mapping_uniq(eng_preproc_lines, amr_preproc_lines)
+    # Get tokens common between the two datasets (obvious translations) and the extra translations
+    common_tok_lines = sorted(get_id_mapping_uniq(eng_preproc_lines, amr_preproc_lines))
+    eng_td_lines, amr_td_lines = get_train_extra_lines(common_tok_lines, **kwargs)
+
+    # Create the final training data using the original sentences
+    # and 10X copies of the additional data (other translations)
+    data.eng_preproc_lines += [l for _ in range(repeat_td) for l in eng_td_lines]
+    data.amr_preproc_lines += [l for _ in range(repeat_td) for l in amr_td_lines]
+    assert len(data.eng_preproc_lines) == len(data.amr_preproc_lines)
+
+    return data
+
+
+# Streaming version of preprocess_train that writes fa_in.txt, eng_tok_origpos.txt and amr_tuple.txt
+# (see ProcData.build_filenames) to wk_dir.  eng_lines and amr_lines can be any iterables, such as
+# open files, and are preprocessed in chunks of chunk_size lines, using a pool of processes if
+# processes > 1.  Only a few chunks are held in memory at a time and the common tokens between the
+# eng and amr lines are accumulated as a set, so memory use doesn't depend on the corpus size.
+# The repeated extra translation data is written at the end, one copy at a time.
+# Returns the number of corpus lines written.
+def preprocess_train_to_dir(eng_lines, amr_lines, wk_dir, chunk_size=1000, processes=1, **kwargs):
+    repeat_td = kwargs.get('repeat_td', 10)
+    files     = ProcData()
+    files.build_filenames(wk_dir, **kwargs)
+    # Load the stopwords here so each chunk doesn't re-read the files
+    chunk_kwargs = {**kwargs, **load_infer_resources(**kwargs), 'skip_empty_check':True}
+    chunks = ((eng_chunk, amr_chunk, chunk_kwargs) for eng_chunk, amr_chunk in
+                iter_chunks(eng_lines, amr_lines, chunk_size))
+    common = set()
+    count  = 0
+    # Give the pool a few chunks at a time so the corpus is streamed through it
+    results = imap_batches(preprocess_train_chunk, chunks, processes, batch_size=max(1, 2*processes))
+    with open(files.fa_in_fn, 'w') as f_fa, open(files.eng_tok_pos_fn, 'w') as f_pos, \
+         open(files.amr_tuple_fn, 'w') as f_tuple:
+        for data, chunk_common in results:
+            if not kwargs.get('skip_empty_check', False):
+                for i, line in enumerate(data.eng_tok_origpos_lines):
+                    if not line.strip():
+                        raise ValueError('!!! ERROR Empty line# %d. This will cause issues and must be fixed !!!' % (count + i))
+            for en_line, amr_line in zip(data.eng_preproc_lines, data.amr_preproc_lines):
+                f_fa.write('%s ||| %s\n' % (en_line, amr_line))
+            for line in data.eng_tok_origpos_lines:
+                f_pos.write(line + '\n')
+            for line in data.amr_tuple_lines:
+                f_tuple.write(line + '\n')
+            common |= chunk_common
+            count  += len(data.eng_preproc_lines)
+        # Add the repeated copies of the additional data (other translations)
+        eng_td_lines, amr_td_lines = get_train_extra_lines(sorted(common), **kwargs)
+        for _ in range(repeat_td):
+            for en_line, amr_line in zip(eng_td_lines, amr_td_lines):
+                f_fa.write('%s ||| %s\n' % (en_line, amr_line))
+    return count
+
+
+# Preprocess a chunk of the training data and get the common tokens.  Module level for multiprocessing.
+def preprocess_train_chunk(args):
+    eng_lines, amr_lines, kwargs = args
+    data = preprocess_infer(eng_lines, amr_lines, **kwargs)
+    common = set(get_id_mapping_uniq(data.eng_preproc_lines, data.amr_preproc_lines))
+    data.eng_lines = data.amr_lines = None      # not needed, don't send back to the main process
+    return data, common
+
+
+# Read the two iterables in lockstep and yield lists of up to chunk_size lines from each
+def iter_chunks(eng_lines, amr_lines, chunk_size):
+    eng_chunk, amr_chunk = [], []
+    for eng_line, amr_line in zip_longest(eng_lines, amr_lines):
+        if eng_line is None or amr_line is None:
+            raise ValueError('The number of eng and amr lines are different')
+        eng_chunk.append(eng_line)
+        amr_chunk.append(amr_line)
+        if len(eng_chunk) >= chunk_size:
+            yield eng_chunk, amr_chunk
+            eng_chunk, amr_chunk = [], []
+    if eng_chunk:
+        yield eng_chunk, amr_chunk
+
+
+# Get the eng and amr lines for the extra translation data used in training.  These are the tokens
+# common to both sides of the corpus plus translations from the resource files.
+def get_train_extra_lines(common_tok_lines, **kwargs):
+    # Resource filenames
+    res_dir         = kwargs.get('res_dir', default_res_dir)
+    prep_roles_fn   = kwargs.get('prep_roles_fn', os.path.join(res_dir, 'prep-roles_id.txt'))
+    eng_id_map_fn   = kwargs.get('eng_id_map_fn', os.path.join(res_dir, 'eng_id_map.txt'))
+    amr_id_map_fn   = kwargs.get('amr_id_map_fn', os.path.join(res_dir, 'amr_id_map.txt'))
+
     eng_td_lines = common_tok_lines[:]  # copy
 
     # Append the second field in prep-roles.id.txt
-    res_fn = os.path.join(res_dir, 'prep-roles_id.txt')
-    with open(res_fn) as f:
+    with open(prep_roles_fn) as f:
         prep_roles_lines = [l.strip() for l in f]
     add_lines = [x.split()[1] for x in prep_roles_lines]
     add_lines = [stem_4_letters_line(l) for l in add_lines]
@@ -94,11 +188,5 @@ def preprocess_train(eng_lines, amr_lines, **kwargs):
     with open(amr_id_map_fn) as f:
         add_lines = [stem_4_letters_line(l.strip()) for l in f]
     amr_td_lines = amr_td_lines + add_lines
-
-    # Create the final training data using the original sentences
-    # and 10X copies of the additional data (other translations)
-    data.eng_preproc_lines += [l for _ in range(repeat_td) for l in eng_td_lines]
-    data.amr_preproc_lines += [l for _ in range(repeat_td) for l in amr_td_lines]
-    assert len(data.eng_preproc_lines) == len(data.amr_preproc_lines)
-
-    return data
+    assert len(eng_td_lines) == len(amr_td_lines)
+    return eng_td_lines, amr_td_lines
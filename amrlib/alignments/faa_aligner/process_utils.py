@@ -16,16 +16,21 @@ def stem_4_letters_string(string):
     return '\n'.join(stem_4_letters_line(line) for line in string.splitlines()) + '\n'
 
 
+# Load a stopword file, one word per line
+def load_stopwords(f_stopwords):
+    with open(f_stopwords) as f:
+        return frozenset(i.strip() for i in f)
+
+
 # #### stem-4-letters.py ####
-def filter_eng_by_stopwords(lines, f_stopwords):
+# stop_set is the set of stopwords from load_stopwords()
+def filter_eng_by_stopwords(lines, stop_set):
     orig_ind_line_list, out_tok_line_list = [], []
-    with open(f_stopwords) as f:
-        STOP_SET = set(i.strip() for i in f)
     for line in lines:
         orig_ind_list = []
         out_tok_list = []
         for ind, tok in enumerate(line.strip().split()):
-            if tok not in STOP_SET:
+            if tok not in stop_set:
                 orig_ind_list.append(ind)
                 out_tok_list.append(tok)
         orig_ind_line_list.append(' '.join(out_tok_list))
@@ -34,33 +39,34 @@ def filter_eng_by_stopwords(lines, f_stopwords):
 
 
 #### get_lineartok_with_rel.py ####
-def get_lineartok_with_rel(lines, f_stopwords):
+# stop_set is the set of stopwords from load_stopwords()
+def get_lineartok_with_rel(lines, stop_set):
     ind = -1
-    def getterminal_except_ne(amr, nt_list):
+    # nt_vals is the set of values for the non-terminal nodes in the graph
+    def getterminal_except_ne(amr, nt_vals):
         nonlocal ind    # allow modification of variable in outer function
         if (not amr.feats):
             ind = ind+1
-            if (amr.val not in [nt.val for nt in nt_list]):
+            if (amr.val not in nt_vals):
                 return [(amr.pi.val, amr.pi_edge, amr.val)]
         ret = []
+        has_name = any(ff.edge == ':name' for ff in amr.feats)
         for f in amr.feats:
             ind = ind+1
             if f.edge == INSTANCE:
                 # as "company" in the context of ".. / company :name (.."
-                if ':name' in [ff.edge for ff in amr.feats]:
+                if has_name:
                     continue
                 if f.node.val == 'name' and f.node.pi.pi_edge == ':name':
                     continue
-                if f.node.val in STOP_SET:
+                if f.node.val in stop_set:
                     continue
                 ret.append((amr.val, INSTANCE, f.node.val))
             else:
-                if f.edge not in STOP_SET:
+                if f.edge not in stop_set:
                     ret.append((amr.val, f.edge))
-                ret.extend(getterminal_except_ne(f.node, nt_list))
+                ret.extend(getterminal_except_ne(f.node, nt_vals))
         return (ret)
-    with open(f_stopwords) as f:
-        STOP_SET = set(i.strip() for i in f)
     count = 0
     amr_linear_lines, amr_tuple_lines = [], []
     ds_string2 = ''
@@ -68,7 +74,7 @@ def get_lineartok_with_rel(lines, f_stopwords):
         line = line.strip().lower()
         count += 1
         _, amr = input_amrparse(line)
-        t_list = getterminal_except_ne(amr, amr.get_nonterm_nodes())
+        t_list = getterminal_except_ne(amr, {nt.val for nt in amr.get_nonterm_nodes()})
         amr_linear_lines.append(' '.join(i[-1] for i in t_list))
         amr_tuple_lines.append(' '.join('__'.join(i) for i in t_list))
     return amr_linear_lines, amr_tuple_lines
@@ -0,0 +1,79 @@
+import warnings
+import logging
+import numpy
+
+logger = logging.getLogger(__name__)
+
+
+###################################################################################################
+# Transpose the mgiza translation (t), alignment (a) and distortion (d) tables between the
+# forward and reverse training runs of the ISI aligner.
+# These were originally the c++ programs transpose-ttable.cpp and transpose-adtable.cpp, which used
+# dense tables.  Here the tables are loaded in bulk with numpy and kept sparse, as arrays of indexes
+# and values.  Transposing is a permutation of the index columns followed by a sort, and duplicate
+# entries keep the last value read, the same as writing into a dense table.
+###################################################################################################
+
+AD_TABLE_SIZE = 110     # only positions less than this are written to the transposed a/d tables
+T_MIN_PROB    = 0.000000001
+
+# ain_fn / din_fn are the alignment and distortion tables with lines of "i j l m prob"
+# Writes the distortion table made from the alignment table and vice-versa, with the indexes swapped.
+def transpose_adtable(ain_fn, din_fn, aout_fn, dout_fn):
+    a_idx, a_vals = load_table(ain_fn, 4)
+    d_idx, d_vals = load_table(din_fn, 4)
+    # d table, keyed on (i, j, m), written as "j i m 100 prob" ordered by m, j, i
+    keys, vals = get_last_values(d_idx[:, [3, 1, 0]], d_vals, AD_TABLE_SIZE)
+    keep = vals > 0
+    write_rows(aout_fn, '%d %d %d 100 %f', keys[keep][:, [1, 2, 0]], vals[keep])
+    # a table, keyed on (i, j, l), written as "j i 100 l prob" ordered by l, j, i
+    keys, vals = get_last_values(a_idx[:, [2, 1, 0]], a_vals, AD_TABLE_SIZE)
+    keep = vals > 0
+    write_rows(dout_fn, '%d %d 100 %d %f', keys[keep][:, [1, 2, 0]], vals[keep])
+
+
+# t0_fn is the previous table, only the leading lines for the null word (source id 0) are used.
+# t1_fn has lines of "s t prob", these are transposed to "t s prob".
+# Writes the table with the probabilities above T_MIN_PROB, ordered by the source then target id.
+def transpose_ttable(t0_fn, t1_fn, tout_fn):
+    t0_idx, t0_vals = load_table(t0_fn, 2)
+    not_null = numpy.flatnonzero(t0_idx[:, 0] != 0)
+    if len(not_null):
+        t0_idx, t0_vals = t0_idx[:not_null[0]], t0_vals[:not_null[0]]
+    t1_idx, t1_vals = load_table(t1_fn, 2)
+    keep = t1_idx[:, 1] != 0
+    idx  = numpy.concatenate([t0_idx, t1_idx[keep][:, [1, 0]]])
+    vals = numpy.concatenate([t0_vals, t1_vals[keep]])
+    keys, vals = get_last_values(idx, vals)
+    keep = vals > T_MIN_PROB
+    write_rows(tout_fn, '%d %d %f', keys[keep], vals[keep])
+
+
+###############################################################################
+#### Helper functions
+###############################################################################
+
+# Load a table of whitespace separated lines with num_idx integer indexes followed by a value.
+# Any additional columns are ignored.  Returns an int64 array of indexes and a float64 array of values.
+def load_table(fn, num_idx):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')     # empty file warning
+        data = numpy.loadtxt(fn, dtype=numpy.float64, usecols=range(num_idx + 1), ndmin=2)
+    return data[:, :num_idx].astype(numpy.int64), data[:, num_idx]
+
+# Sort the entries by their index columns (first column first) and keep the last value for
+# any duplicate indexes.  If max_idx is given, only entries with all indexes less than it are kept.
+def get_last_values(idx, vals, max_idx=None):
+    if max_idx is not None:
+        keep = ((idx >= 0) & (idx < max_idx)).all(axis=1)
+        idx, vals = idx[keep], vals[keep]
+    order = numpy.lexsort(idx.T[::-1])      # stable, so duplicates stay in file order
+    idx, vals = idx[order], vals[order]
+    last  = numpy.ones(len(idx), dtype=bool)
+    last[:-1] = (idx[1:] != idx[:-1]).any(axis=1)
+    return idx[last], vals[last]
+
+def write_rows(fn, fmt, idx, vals):
+    rows = zip(*idx.T.tolist(), vals.tolist())
+    with open(fn, 'w') as f:
+        f.writelines((fmt + '\n') % row for row in rows)
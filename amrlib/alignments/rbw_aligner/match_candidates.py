@@ -1,4 +1,5 @@
-from word2number import w2n
+from   functools import lru_cache
+from   word2number import w2n
 
 
 # Convert months to numeric values
@@ -34,17 +35,39 @@ word2words = {';':['and'], 'also':['include'], 'anti':['oppose','counter'], 'but
 word2words['me'] = ['i']
 
 
+# Maximum number of (token, lemma) pairs kept in the candidate cache
+CACHE_SIZE = 65536
+
+
 # Return a list of possible word candidates in the graph to match for a word/lemma in the sentence
+# The candidates are cached by (token, lemma) since the same words are seen repeatedly in a corpus.
 def get_match_candidates(token, lemma):
+    return list(get_cached_candidates(token, lemma))
+
+# Cache statistics for get_match_candidates (hits, misses, maxsize, currsize)
+def get_cache_info():
+    return get_cached_candidates.cache_info()
+
+def get_cache_hit_rate():
+    info  = get_cache_info()
+    total = info.hits + info.misses
+    return info.hits / total if total > 0 else 0.0
+
+def clear_cache():
+    get_cached_candidates.cache_clear()
+
+@lru_cache(maxsize=CACHE_SIZE)
+def get_cached_candidates(token, lemma):
     # Obvious candidates
     word = token.lower()
     candidates = [word, lemma.lower()]
     # Get candidates for numbers
-    try:
-        number = w2n.word_to_num(word)
-        candidates.append(str(number))
-    except ValueError:
-        pass
+    if could_be_number(word):
+        try:
+            number = w2n.word_to_num(word)
+            candidates.append(str(number))
+        except ValueError:
+            pass
     # Get candidates for months
     month = month2num.get(word, None)
     if month is not None:
@@ -55,4 +78,12 @@ def get_match_candidates(token, lemma):
     # non-negative version of the word
     if word.startswith('in') or word.startswith('un') or word.startswith('ir'):
         candidates.append( word[2:] )
-    return candidates
+    return tuple(candidates)
+
+# w2n.word_to_num raises a ValueError unless the string is all digits or has at least one
+# number word in it.  Check for this first since raising and catching the exception is slow.
+def could_be_number(word):
+    word = word.replace('-', ' ').lower()
+    if word.isdigit():
+        return True
+    return any(w in w2n.american_number_system for w in word.split())
@@ -1,11 +1,14 @@
+import os
 import re
 import json
 import logging
+from   functools import partial
 from   types import SimpleNamespace
 import penman
 from   penman.models.noop import NoOpModel
 from   penman.surface import AlignmentMarker
-from   .match_candidates import get_match_candidates
+from   .match_candidates import get_match_candidates, get_cache_info
+from   ...graph_processing.amr_loading import imap_batches, write_amr_entries
 
 
 logger = logging.getLogger(__name__)
@@ -29,7 +32,8 @@ class RBWAligner(object):
         self.align_prefix   = 'e.'                            # part of align_re above so not setable for now
         self.align_words()
         self.add_surface_alignments()
-        self.add_alignment_string(self.graph, self.align_str_name)
+        # The tree configured from the aligned graph.  Note that this is not updated if the graph is modified.
+        self.tree = self.add_alignment_string(self.graph, self.align_str_name)
 
     # build the aligner from a AMR string that uses json encoded tokens and lemmas (as opposed to space tokenized)
     # Use the NoOpModel to prevent decoding errors.  See https://github.com/goodmami/penman/issues/92
@@ -47,6 +51,36 @@ class RBWAligner(object):
         lemmas = [w for w in json.loads(graph.metadata[lemma_key])]
         return cls(graph, tokens, lemmas, **kwargs)
 
+    # Align a corpus of graphs and write them to out_fn as they are completed.
+    # entries is an iterable of AMR strings or penman graphs, with json encoded tokens and lemmas in
+    # the metadata.  Entries are sent to a pool of worker processes in batches so the corpus doesn't
+    # need to be in memory.  Each entry is decoded once and the tree that's configured to create the
+    # alignment string is re-used to write the graph.  keep_keys is an optional list of the metadata
+    # keys to keep in the output.  Returns the number of graphs written, the number that failed and
+    # the hit rate for the match candidate cache (summed over all the workers).
+    @classmethod
+    def align_corpus(cls, entries, out_fn, workers=None, token_key='tokens', lemma_key='lemmas',
+                     keep_keys=None, batch_size=1000, **kwargs):
+        workers = workers if workers is not None else (os.cpu_count() or 1)
+        func    = partial(align_corpus_entry, token_key=token_key, lemma_key=lemma_key,
+                          keep_keys=keep_keys, kwargs=kwargs)
+        stats   = {'failed':0, 'hits':0, 'misses':0}
+        # Count the failures and cache stats and yield the graph strings to write
+        def get_gstrings(results):
+            for gstring, hits, misses in results:
+                stats['hits']   += hits
+                stats['misses'] += misses
+                if gstring is None:
+                    stats['failed'] += 1
+                else:
+                    yield gstring
+        results = imap_batches(func, entries, workers, batch_size)
+        with open(out_fn, 'w') as f:
+            num_written = write_amr_entries(f, get_gstrings(results))
+        total = stats['hits'] + stats['misses']
+        cache_hit_rate = stats['hits'] / total if total > 0 else 0.0
+        return num_written, stats['failed'], cache_hit_rate
+
     # Get the penman graph object
     def get_penman_graph(self):
         return self.graph
@@ -72,6 +106,8 @@ class RBWAligner(object):
         # Get a 2D list of candidate words for each token/lemma in the sentence
         self.wlist_candidates = [get_match_candidates(t, l) for t, l in zip(self.tokens, self.lemmas)]
         self.alignments = [None] * len(self.wlist_candidates)   # index in tokens
+        # Index the candidates by word (for exact matches) and by prefix (for fuzzy matches)
+        self.candidate_index = CandidateIndex(self.wlist_candidates)
         # Loop through all triples in the graph and extract the concept
         for t in self.graph.triples:        # (source, role, target)
             # Get the concept for the triple (this is what's matched to the words in the sentence)
@@ -141,39 +177,29 @@ class RBWAligner(object):
         return role
 
     # Check for an exact match between words and a list of candidates
+    # The first unaligned token with a matching candidate is aligned.
     def exact_alignment(self, tinfo):
-        found = False
-        for i, candidates in enumerate(self.wlist_candidates):
-            for word in candidates:
-                if word == tinfo.concept and self.alignments[i] == None:
-                    if found:
-                        logger.debug('Duplicate exact match for concept: ' + tinfo.concept)
-                    else:
-                        #logger.debug('Exact match found concept: ' + concept + '  word: ' + word)
-                        self.alignments[i] = tinfo
-                    found = True
-        return found
+        return self.align_first_unaligned(self.candidate_index.get_exact(tinfo.concept), tinfo, 'exact')
 
     # Fuzzy match based on the the number of matching characters between a concept and
-    # a list of candidate words
+    # a list of candidate words.  The best match length is over all tokens (aligned or not) and
+    # the first unaligned token with that length is aligned.
     def fuzzy_alignment(self, tinfo):
+        max_ml, indexes = self.candidate_index.get_longest_prefix(tinfo.concept)
+        if max_ml < self.fuzzy_min_ml:
+            return False
+        return self.align_first_unaligned(indexes, tinfo, 'fuzzy')
+
+    # Align the first token (from the sorted list of indexes) that isn't already aligned
+    def align_first_unaligned(self, indexes, tinfo, match_type):
         found = False
-        # Find the best match length
-        match_lengths = []
-        for i, candidates in enumerate(self.wlist_candidates):
-            ml = [self.match_length(w, tinfo.concept) for w in candidates]
-            match_lengths.append( max(ml) )
-        max_ml = max(match_lengths)
-        # Sort out the good candidates
-        if max_ml >= self.fuzzy_min_ml:
-            for i in range(len(self.wlist_candidates)):
-                if match_lengths[i] == max_ml and self.alignments[i] == None:
-                    if found:
-                        logger.debug('Duplicate fuzzy matches for concept: ' + tinfo.concept)
-                    else:
-                        #logger.debug('Fuzzy match found concept: ' + concept + '  word: ' + self.wlist_candidates[i][0])
-                        self.alignments[i] = tinfo
-                    found = True
+        for i in indexes:
+            if self.alignments[i] is None:
+                if found:
+                    logger.debug('Duplicate %s match for concept: %s' % (match_type, tinfo.concept))
+                    break
+                self.alignments[i] = tinfo
+                found = True
         return found
 
     # Get the length of how many letters in the two strings match
@@ -204,9 +230,11 @@ class RBWAligner(object):
 
     # Get the alignment string by recursing the graph and finding all the surface alignments
     # This is a classmethod so that it can be called on a graph, with surface alignments that aren't applied here
+    # Returns the penman tree configured from the graph (its metadata is the graph's metadata)
     @classmethod
     def add_alignment_string(cls, graph, align_key='alignments'):
-        results = cls.get_addresses(graph)
+        tree = penman.configure(graph, model=NoOpModel())
+        results = cls.get_addresses(graph, tree)
         alignments = []
         # Loop through the results
         for result in results:
@@ -227,6 +255,7 @@ class RBWAligner(object):
         align_strings = [x[1] for x in alignments]
         align_string  = ' '.join(align_strings)
         graph.metadata[align_key] = align_string
+        return tree
 
     # Form a single alignment
     @staticmethod
@@ -241,12 +270,14 @@ class RBWAligner(object):
 
     # Convert the graph to a tree structure and Loop through all branches to get the address
     # of the unique nodes with ~e.X attached
+    # tree is optional and should be the tree already configured from the graph
     @classmethod
-    def get_addresses(cls, graph):
+    def get_addresses(cls, graph, tree=None):
         results = []
         def add_result(addr, name, type):
             results.append( SimpleNamespace(addr=addr, name=name, type=type) )
-        tree = penman.configure(graph, model=NoOpModel())
+        if tree is None:
+            tree = penman.configure(graph, model=NoOpModel())
         for path, branch in cls.walk_tree(tree.node, (1,)):
             # Get the node and attribute addresses
             if penman.tree.is_atomic(branch[1]):    # ==> is None or isinstance(x, (str, int, float))
@@ -277,6 +308,68 @@ class RBWAligner(object):
             if not penman.tree.is_atomic(target):
                 yield from cls.walk_tree(target, curpath)
 
+# Index of the match candidates for the tokens in a sentence, built once per sentence
+#   exact  - dictionary of candidate word to the sorted list of token indexes that have it
+#   prefix - trie of the candidate words.  Each node has the sorted list of token indexes with a
+#            candidate that starts with the prefix for that node.
+# Walking the trie with a concept gives the longest common prefix with any candidate and the
+# tokens that have a candidate with that prefix (ie.. the tokens with the maximum match_length).
+class CandidateIndex(object):
+    def __init__(self, wlist_candidates):
+        self.exact = {}
+        self.root  = ({}, [])           # (children keyed by character, token indexes)
+        for i, candidates in enumerate(wlist_candidates):
+            for word in candidates:
+                indexes = self.exact.setdefault(word, [])
+                if not indexes or indexes[-1] != i:
+                    indexes.append(i)
+                node = self.root
+                self.add_index(node, i)
+                for c in word:
+                    node = node[0].setdefault(c, ({}, []))
+                    self.add_index(node, i)
+
+    @staticmethod
+    def add_index(node, i):
+        if not node[1] or node[1][-1] != i:
+            node[1].append(i)
+
+    # Sorted list of token indexes with a candidate equal to the word
+    def get_exact(self, word):
+        return self.exact.get(word, [])
+
+    # Return the longest match length between the word and any candidate and the
+    # sorted list of token indexes that have a candidate with that match length
+    def get_longest_prefix(self, word):
+        node, length = self.root, 0
+        for c in word:
+            child = node[0].get(c)
+            if child is None:
+                break
+            node, length = child, length + 1
+        return length, node[1]
+
+
+# Align a single entry for RBWAligner.align_corpus
+# Returns the graph string (None on failure) and the match candidate cache hits and misses.
+# This is at the module level so it can be pickled for use in a process pool.
+def align_corpus_entry(entry, token_key, lemma_key, keep_keys, kwargs):
+    info = get_cache_info()
+    try:
+        if isinstance(entry, str):
+            entry = penman.decode(entry, model=NoOpModel())
+        aligner = RBWAligner.from_penman_w_json(entry, token_key, lemma_key, **kwargs)
+        tree = aligner.tree
+        if keep_keys is not None:
+            tree.metadata = {k:v for k, v in tree.metadata.items() if k in keep_keys}
+        gstring = penman.format(tree, indent=6)
+    except Exception as e:
+        logger.error('Failed to align entry: %s' % e)
+        gstring = None
+    new_info = get_cache_info()
+    return gstring, new_info.hits - info.hits, new_info.misses - info.misses
+
+
 # Helper class for information on triples
 class TInfo(object):
     def __init__(self, triple, concept, atype):
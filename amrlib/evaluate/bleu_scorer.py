@@ -1,5 +1,9 @@
-from   nltk.translate.bleu_score import corpus_bleu
-from   nltk.tokenize import word_tokenize
+from   collections import Counter
+import numpy
+
+
+# Number of n-gram orders used for BLEU (weights = 0.25 each)
+MAX_NGRAM = 4
 
 
 # See https://www.nltk.org/api/nltk.translate.html
@@ -11,10 +15,45 @@ class BLEUScorer(object):
     def compute_bleu(self, refs, hyps):
         ref_len = self.get_length(refs)
         hyp_len = self.get_length(hyps)
+        from nltk.translate.bleu_score import corpus_bleu   # nltk is slow to import so only load when used
         refs = self.add_ref_dimension(refs) # nltk allows multiple ref per hyp
         bleu = corpus_bleu(refs, hyps)      # even weights=(0.25, 0.25, 0.25, 0.25)
         return bleu, ref_len, hyp_len
 
+    # Per-sentence statistics, computed once, that the corpus BLEU score can be re-computed from.
+    # Returns an int array of shape (num_sents, 2*MAX_NGRAM + 2) with the columns...
+    #   clipped n-gram matches for n=1..4, n-gram counts for n=1..4, hyp length, ref length
+    # The counts follow nltk's modified_precision (the denominator is at least 1 for each sentence)
+    @staticmethod
+    def get_sentence_stats(refs, hyps):
+        stats = numpy.zeros((len(hyps), 2*MAX_NGRAM + 2), dtype=numpy.int64)
+        for i, (ref, hyp) in enumerate(zip(refs, hyps)):
+            for n in range(1, MAX_NGRAM+1):
+                hyp_counts = Counter(tuple(hyp[j:j+n]) for j in range(len(hyp) - n + 1))
+                ref_counts = Counter(tuple(ref[j:j+n]) for j in range(len(ref) - n + 1))
+                stats[i, n-1] = sum(min(c, ref_counts[g]) for g, c in hyp_counts.items())
+                stats[i, MAX_NGRAM + n-1] = max(1, sum(hyp_counts.values()))
+            stats[i, -2] = len(hyp)
+            stats[i, -1] = len(ref)
+        return stats
+
+    # Compute BLEU from the column sums of the above statistics.  sums may have any number of
+    # leading dimensions (ie.. one row per bootstrap sample) and an array of scores is returned.
+    # This gives the same score as nltk's corpus_bleu with the default weights and no smoothing.
+    @staticmethod
+    def compute_bleu_from_stats(sums):
+        sums    = numpy.asarray(sums, dtype=numpy.float64)
+        matches = sums[..., :MAX_NGRAM]
+        totals  = sums[..., MAX_NGRAM:2*MAX_NGRAM]
+        hyp_len = sums[..., -2]
+        ref_len = sums[..., -1]
+        nonzero = (matches > 0).all(axis=-1) & (hyp_len > 0)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            log_p = numpy.log(matches / totals).mean(axis=-1)
+            bp    = numpy.where(hyp_len > ref_len, 1.0, numpy.exp(1 - ref_len / hyp_len))
+            bleu  = numpy.where(nonzero, bp * numpy.exp(log_p), 0.0)
+        return bleu
+
     @staticmethod
     def get_length(tokenized_sents):
         length = sum([len(ts) for ts in tokenized_sents])
@@ -22,6 +61,8 @@ class BLEUScorer(object):
 
     @staticmethod
     def tokenize_strings(strings, space_tokenize=False):
+        if not space_tokenize:
+            from nltk.tokenize import word_tokenize
         vals = []
         for string in strings:
             if space_tokenize:
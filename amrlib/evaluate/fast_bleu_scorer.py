@@ -0,0 +1,163 @@
+import re
+import logging
+from   multiprocessing import Pool
+import numpy
+from   .bleu_scorer import BLEUScorer, MAX_NGRAM
+
+logger = logging.getLogger(__name__)
+
+
+###################################################################################################
+# Faster version of the BLEUScorer
+#
+# Tokenization
+#   Most sentences only need a few of the rules in nltk's word_tokenize (the Treebank rules plus
+#   Punkt sentence splitting).  Strings that can't trigger any of the other rules (quotes, brackets,
+#   contractions, multiple sentences, ..) are tokenized with a single compiled regex that gives the
+#   same tokens.  Everything else falls back to word_tokenize.
+# BLEU
+#   Tokens are converted to integer ids and every n-gram is hashed, along with its sentence index,
+#   into a 64 bit key.  The clipped n-gram matches are then counted for the whole corpus at once
+#   with numpy.unique / searchsorted.  This gives the per-sentence statistics described in
+#   BLEUScorer.get_sentence_stats so both corpus and sentence level BLEU come from the same pass.
+#   Hash collisions are possible in theory but, with 64 bit keys, vanishingly unlikely.
+# For large corpora, set processes > 1 to split tokenization and n-gram counting over a process pool.
+#
+# Scores are the same as nltk's corpus_bleu / sentence_bleu with the default weights and no smoothing
+###################################################################################################
+
+class FastBLEUScorer(BLEUScorer):
+    def __init__(self, processes=1, shard_size=20000):
+        self.processes  = processes     # number of processes for large corpora
+        self.shard_size = shard_size    # minimum number of sentences per process
+
+    # Take in a tokenized list of refs and hyps and return the bleu score plus the lengths
+    def compute_bleu(self, refs, hyps):
+        bleu, ref_len, hyp_len, _ = self.compute_bleu_and_sentences(refs, hyps)
+        return bleu, ref_len, hyp_len
+
+    # Same as above but also return a numpy array with the sentence level bleu score for each hyp
+    def compute_bleu_and_sentences(self, refs, hyps):
+        stats = self.get_sentence_stats(refs, hyps)
+        sums  = stats.sum(axis=0)
+        bleu  = float(self.compute_bleu_from_stats(sums))
+        sent_bleu = self.compute_bleu_from_stats(stats)
+        return bleu, int(sums[-1]), int(sums[-2]), sent_bleu
+
+    # Per-sentence statistics (see BLEUScorer.get_sentence_stats), computed with hashed n-grams
+    def get_sentence_stats(self, refs, hyps):
+        assert len(refs) == len(hyps), '%d != %d' % (len(refs), len(hyps))
+        shards = self.get_shards(len(hyps))
+        if len(shards) == 1:
+            return get_ngram_stats((refs, hyps))
+        with Pool(self.processes) as pool:
+            results = pool.map(get_ngram_stats, [(refs[s:e], hyps[s:e]) for s, e in shards])
+        return numpy.concatenate(results)
+
+    # Tokenize and lower-case strings, the same as BLEUScorer.tokenize_strings
+    def tokenize_strings(self, strings, space_tokenize=False):
+        if space_tokenize:
+            return super().tokenize_strings(strings, space_tokenize=True)
+        shards = self.get_shards(len(strings))
+        if len(shards) == 1:
+            return fast_tokenize_strings(strings)
+        with Pool(self.processes) as pool:
+            results = pool.map(fast_tokenize_strings, [strings[s:e] for s, e in shards])
+        return [tokens for result in results for tokens in result]
+
+    # Split num items into (start, end) ranges for the process pool
+    def get_shards(self, num):
+        num_shards = max(1, min(self.processes, num // max(1, self.shard_size)))
+        bounds = numpy.linspace(0, num, num_shards + 1).astype(int)
+        return list(zip(bounds[:-1], bounds[1:]))
+
+
+###############################################################################
+#### Tokenization
+###############################################################################
+
+# Strings matching this could be affected by a word_tokenize rule that isn't in TOKEN_RE
+# (quotes, brackets, "*", dashes, "..", repeated ":,", MacIntyre contractions and any
+# possible Punkt sentence break).  These fall back to word_tokenize.
+FALLBACK_RE = re.compile(r'''['"`()\[\]{}<>*\u2012-\u2015«“‘„»”’]|--|\.\.|[:,][:,]|'''
+                         r'''[.?!](?:\s+\S|[?!)";}\]*:@'({\[])|'''
+                         r'''(?i:\b(?:cannot|gimme|gonna|gotta|lemme|wanna)\b)''')
+# Single regex version of the remaining Treebank rules.  ";@#$%&?!" are always split off and ":,"
+# are split off unless followed by a digit.  The final period is handled in fast_tokenize().
+TOKEN_RE = re.compile(r'[;@#$%&?!]|[:,](?!\d)|(?:[^\s;@#$%&?!:,]|[:,](?=\d))+')
+
+def fast_tokenize(string):
+    if FALLBACK_RE.search(string):
+        from nltk.tokenize import word_tokenize     # only imported if a string needs it
+        return word_tokenize(string)
+    tokens = TOKEN_RE.findall(string)
+    if tokens and len(tokens[-1]) > 1 and tokens[-1].endswith('.'):
+        tokens[-1:] = [tokens[-1][:-1], '.']
+    return tokens
+
+def fast_tokenize_strings(strings):
+    return [[w.lower() for w in fast_tokenize(string)] for string in strings]
+
+
+###############################################################################
+#### N-gram statistics
+###############################################################################
+
+# Constants for the splitmix64 hash finalizer
+MIX_ADD   = numpy.uint64(0x9E3779B97F4A7C15)
+MIX_MULT1 = numpy.uint64(0xBF58476D1CE4E5B9)
+MIX_MULT2 = numpy.uint64(0x94D049BB133111EB)
+
+# Per-sentence stats for a (refs, hyps) tuple.  Module level so it can be run in a process pool.
+def get_ngram_stats(args):
+    refs, hyps = args
+    num_sents  = len(hyps)
+    stats = numpy.zeros((num_sents, 2*MAX_NGRAM + 2), dtype=numpy.int64)
+    if num_sents == 0:
+        return stats
+    vocab = {}
+    hyp_ids, hyp_sents, hyp_pos, hyp_lens = encode_sents(hyps, vocab)
+    ref_ids, ref_sents, ref_pos, ref_lens = encode_sents(refs, vocab)
+    stats[:, -2] = hyp_lens
+    stats[:, -1] = ref_lens
+    for n in range(1, MAX_NGRAM+1):
+        hyp_keys, hyp_key_sents = get_ngram_keys(hyp_ids, hyp_sents, hyp_pos, hyp_lens, n)
+        ref_keys, _             = get_ngram_keys(ref_ids, ref_sents, ref_pos, ref_lens, n)
+        # Counts for each unique n-gram in the hyps, clipped to the count in the matching ref
+        hyp_uniq, hyp_first, hyp_counts = numpy.unique(hyp_keys, return_index=True, return_counts=True)
+        ref_uniq, ref_counts = numpy.unique(ref_keys, return_counts=True)
+        clipped = numpy.zeros(len(hyp_uniq), dtype=numpy.int64)
+        if len(ref_uniq):
+            idx   = numpy.minimum(numpy.searchsorted(ref_uniq, hyp_uniq), len(ref_uniq) - 1)
+            found = ref_uniq[idx] == hyp_uniq
+            clipped[found] = numpy.minimum(hyp_counts[found], ref_counts[idx[found]])
+        stats[:, n-1] = numpy.bincount(hyp_key_sents[hyp_first], weights=clipped, minlength=num_sents)
+        totals = numpy.bincount(hyp_key_sents, minlength=num_sents)
+        stats[:, MAX_NGRAM + n-1] = numpy.maximum(1, totals)   # same as nltk's modified_precision
+    return stats
+
+# Convert the tokenized sentences to flat arrays of token ids, the sentence index and position
+# of each token, and the sentence lengths.
+def encode_sents(sents, vocab):
+    ids  = numpy.array([vocab.setdefault(t, len(vocab)) for sent in sents for t in sent], dtype=numpy.uint64)
+    lens = numpy.array([len(sent) for sent in sents], dtype=numpy.int64)
+    sent_idx = numpy.repeat(numpy.arange(len(sents)), lens)
+    starts   = numpy.cumsum(lens) - lens
+    pos      = numpy.arange(len(ids)) - starts[sent_idx]
+    return ids, sent_idx, pos, lens
+
+# Hash every n-gram of order n, that is completely inside its sentence, into a uint64 key
+# that includes the sentence index.  Returns the keys and the sentence index for each.
+def get_ngram_keys(ids, sent_idx, pos, lens, n):
+    starts = numpy.flatnonzero(pos + n <= lens[sent_idx])
+    keys   = mix_hash(sent_idx[starts].astype(numpy.uint64))
+    for k in range(n):
+        keys = mix_hash(keys ^ ids[starts + k])
+    return keys, sent_idx[starts]
+
+# splitmix64 finalizer, applied element-wise to a uint64 array
+def mix_hash(x):
+    x = x + MIX_ADD
+    x = (x ^ (x >> numpy.uint64(30))) * MIX_MULT1
+    x = (x ^ (x >> numpy.uint64(27))) * MIX_MULT2
+    return x ^ (x >> numpy.uint64(31))
@@ -0,0 +1,137 @@
+import logging
+import numpy
+from   .smatch_scorer import use_scorer
+from   .bleu_scorer import BLEUScorer
+
+logger = logging.getLogger(__name__)
+
+
+###################################################################################################
+# Significance testing for smatch and BLEU
+#
+# The expensive part of scoring (smatch hill-climbing or n-gram counting) is done once per item to
+# get an array of per-item statistics.  Both metrics can be re-computed exactly from the column
+# sums of those statistics, so each bootstrap or approximate-randomization sample is just a
+# weighted sum of the rows, done for a batch of samples at once as a matrix multiply.
+#   smatch - per-graph (match, test, gold) counts
+#   bleu   - per-sentence n-gram matches / totals and lengths (see BLEUScorer.get_sentence_stats)
+#
+# Example:
+#   stats_a = get_smatch_stats(test_entries_a, gold_entries)
+#   stats_b = get_smatch_stats(test_entries_b, gold_entries)
+#   result  = paired_bootstrap(stats_a, stats_b, 'smatch', num_samples=10000)
+#   print(result['delta'], result['p_value'], result['delta_ci'])
+###################################################################################################
+
+# Per-graph (match, test, gold) smatch counts as an array of shape (num_graphs, 3)
+# scorer is an optional SmatchScorer (see smatch_scorer.py)
+def get_smatch_stats(test_entries, gold_entries, scorer=None):
+    with use_scorer(scorer) as scorer:
+        counts = scorer.score_entries(test_entries, gold_entries)
+    return numpy.array(counts, dtype=numpy.int64).reshape(-1, 3)
+
+# Per-sentence BLEU statistics for tokenized refs and hyps (see BLEUScorer.tokenize_strings)
+def get_bleu_stats(refs, hyps):
+    return BLEUScorer.get_sentence_stats(refs, hyps)
+
+# smatch F score from the column sums of the counts, for any number of leading dimensions
+def smatch_from_stats(sums):
+    sums  = numpy.asarray(sums, dtype=numpy.float64)
+    match, test, gold = sums[..., 0], sums[..., 1], sums[..., 2]
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        f_score = numpy.where((test > 0) & (gold > 0) & (match > 0), 2 * match / (test + gold), 0.0)
+    return f_score
+
+METRICS = {'smatch':smatch_from_stats, 'bleu':BLEUScorer.compute_bleu_from_stats}
+
+
+# Bootstrap confidence interval for the score of a single system
+# Returns a dictionary with the score and the (lower, upper) confidence interval
+def bootstrap_ci(stats, metric='smatch', num_samples=1000, confidence=0.95, seed=None, batch_size=256):
+    metric_fn = get_metric(metric)
+    stats     = numpy.asarray(stats)
+    rng       = numpy.random.default_rng(seed)
+    scores    = []
+    for weights in iter_bootstrap_weights(rng, len(stats), num_samples, batch_size):
+        scores.append(metric_fn(weights @ stats))
+    scores = numpy.concatenate(scores)
+    return {'score':float(metric_fn(stats.sum(axis=0))), 'ci':get_interval(scores, confidence)}
+
+
+# Paired bootstrap resampling (Koehn, 2004) to compare system a against system b.  stats_a and
+# stats_b must be for the same items in the same order.  p_value is the fraction of samples where
+# system a does not score higher than system b.
+def paired_bootstrap(stats_a, stats_b, metric='smatch', num_samples=1000, confidence=0.95, seed=None,
+                     batch_size=256):
+    metric_fn = get_metric(metric)
+    stats_a, stats_b = check_paired(stats_a, stats_b)
+    rng       = numpy.random.default_rng(seed)
+    scores_a, scores_b = [], []
+    for weights in iter_bootstrap_weights(rng, len(stats_a), num_samples, batch_size):
+        scores_a.append(metric_fn(weights @ stats_a))
+        scores_b.append(metric_fn(weights @ stats_b))
+    scores_a = numpy.concatenate(scores_a)
+    scores_b = numpy.concatenate(scores_b)
+    deltas   = scores_a - scores_b
+    score_a  = float(metric_fn(stats_a.sum(axis=0)))
+    score_b  = float(metric_fn(stats_b.sum(axis=0)))
+    return {'score_a':score_a, 'score_b':score_b, 'delta':score_a - score_b,
+            'ci_a':get_interval(scores_a, confidence), 'ci_b':get_interval(scores_b, confidence),
+            'delta_ci':get_interval(deltas, confidence), 'p_value':float((deltas <= 0).mean())}
+
+
+# Approximate randomization test.  For each sample, the outputs of the two systems are swapped for
+# a random half of the items and the difference in scores is compared to the actual difference.
+# p_value is the (smoothed) fraction of samples with a difference at least as large as the actual one.
+def approximate_randomization(stats_a, stats_b, metric='smatch', num_samples=1000, seed=None, batch_size=256):
+    metric_fn = get_metric(metric)
+    stats_a, stats_b = check_paired(stats_a, stats_b)
+    rng       = numpy.random.default_rng(seed)
+    sum_a     = stats_a.sum(axis=0)
+    sum_b     = stats_b.sum(axis=0)
+    delta     = float(metric_fn(sum_a) - metric_fn(sum_b))
+    diffs     = stats_b - stats_a
+    num_greater = 0
+    for start in range(0, num_samples, batch_size):
+        size  = min(batch_size, num_samples - start)
+        swaps = rng.integers(0, 2, size=(size, len(diffs))).astype(diffs.dtype)
+        moved = swaps @ diffs
+        deltas = metric_fn(sum_a + moved) - metric_fn(sum_b - moved)
+        num_greater += int((numpy.abs(deltas) >= abs(delta)).sum())
+    return {'score_a':float(metric_fn(sum_a)), 'score_b':float(metric_fn(sum_b)), 'delta':delta,
+            'p_value':(num_greater + 1) / (num_samples + 1)}
+
+
+###############################################################################
+#### Helper functions
+###############################################################################
+
+def get_metric(metric):
+    if callable(metric):
+        return metric
+    if metric not in METRICS:
+        raise ValueError('Unknown metric %s' % metric)
+    return METRICS[metric]
+
+def check_paired(stats_a, stats_b):
+    stats_a = numpy.asarray(stats_a)
+    stats_b = numpy.asarray(stats_b)
+    if stats_a.shape != stats_b.shape:
+        raise ValueError('stats shapes are different %s != %s' % (stats_a.shape, stats_b.shape))
+    return stats_a, stats_b
+
+# Generate batches of bootstrap weights.  Each row is the number of times each item was drawn
+# in one sample (with replacement) so the resampled sums are weights @ stats.
+def iter_bootstrap_weights(rng, num_items, num_samples, batch_size):
+    for start in range(0, num_samples, batch_size):
+        size    = min(batch_size, num_samples - start)
+        draws   = rng.integers(0, num_items, size=(size, num_items))
+        draws  += numpy.arange(size)[:, None] * num_items
+        weights = numpy.bincount(draws.ravel(), minlength=size * num_items)
+        yield weights.reshape(size, num_items)
+
+# Percentile interval for the given confidence
+def get_interval(scores, confidence):
+    alpha = (1 - confidence) / 2
+    lower, upper = numpy.quantile(scores, [alpha, 1 - alpha])
+    return float(lower), float(upper)
@@ -0,0 +1,80 @@
+import os
+import json
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+###################################################################################################
+# On-disk cache of per-pair smatch counts
+#
+# During training the same dev set is scored after every epoch and many of the predicted graphs
+# don't change between checkpoints.  The cache stores the (match, test, gold) counts for each
+# pair of graphs, keyed by a hash of the test graph, the gold graph and the metric variant, so
+# only new or changed pairs need to be scored.  The corpus totals are summed from the counts.
+#
+# The cache is used by giving it to a SmatchScorer.
+#   scorer = SmatchScorer(cache=SmatchCache('dev_smatch_cache.json'))
+#   compute_smatch(test_entries, gold_entries, scorer=scorer)
+# The scorer saves the cache to disk after each call that adds new counts.
+# Note that smatch's hill-climbing is randomized so a cached count may differ slightly from what
+# re-scoring the same pair would give.  Within a single cache, identical pairs always score the same.
+###################################################################################################
+
+class SmatchCache(object):
+    def __init__(self, fn=None):
+        self.fn      = fn           # json file to load from / save to. None for an in-memory cache.
+        self.counts  = {}
+        self.hits    = 0
+        self.misses  = 0
+        self.changed = False
+        if fn is not None and os.path.exists(fn):
+            self.load()
+
+    def __len__(self):
+        return len(self.counts)
+
+    # Key for a pair of single line graph strings
+    # method identifies the matching algorithm (see SmatchScorer.get_method_name())
+    @staticmethod
+    def get_key(test_entry, gold_entry, variant='smatch', method='smatch'):
+        hasher = hashlib.sha1()
+        for item in (method, variant, test_entry, gold_entry):
+            hasher.update(item.encode('utf-8'))
+            hasher.update(b'\x00')
+        return hasher.hexdigest()
+
+    # Return the (match, test, gold) counts or None if they're not in the cache
+    def get(self, key):
+        counts = self.counts.get(key)
+        if counts is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return tuple(counts)
+
+    def set(self, key, counts):
+        self.counts[key] = tuple(counts)
+        self.changed = True
+
+    def clear(self):
+        self.counts  = {}
+        self.changed = True
+
+    def load(self):
+        with open(self.fn) as f:
+            self.counts = {k:tuple(v) for k, v in json.load(f).items()}
+        self.changed = False
+        logger.info('Loaded %d smatch cache entries from %s' % (len(self.counts), self.fn))
+
+    # Write the cache to disk if anything was added.  The file is replaced atomically so an
+    # interrupted save doesn't corrupt the cache.
+    def save(self):
+        if self.fn is None or not self.changed:
+            return
+        tmp_fn = self.fn + '.tmp'
+        with open(tmp_fn, 'w') as f:
+            json.dump(self.counts, f)
+        os.replace(tmp_fn, self.fn)
+        self.changed = False
@@ -0,0 +1,242 @@
+import random
+import logging
+import numpy
+from   .smatch_graph_store import ParsedGraph
+
+logger = logging.getLogger(__name__)
+
+
+###################################################################################################
+# Vectorized smatch hill-climbing
+#
+# This is a re-implementation of smatch.get_best_match() from https://github.com/snowblink14/smatch
+# The candidate node mappings and the triple match weights are the same as smatch.compute_pool()
+# but are stored as numpy arrays.
+#   unary[i, j]   - number of instance / attribute (and self-loop relation) triples matched when
+#                   node i of AMR 1 is mapped to node j of AMR 2.
+#   edges         - one row (i, j, k, l) for each pair of node mappings (i->j, k->l) that together
+#                   match a relation triple (stored in both directions).
+# For the current mapping, gains[i, j] is the number of triples matched by mapping i->j with all
+# other nodes left where they are.  The gains for every possible move and swap are computed from
+# it as matrices and the best one is taken.  The search order and tie-breaking follow smatch so,
+# for the same initial mapping, the hill-climbing takes the same steps.
+#
+# An extra column is added to AMR 2 (index = number of nodes) to represent "not mapped" (-1 in smatch).
+###################################################################################################
+
+class SmatchEngine(object):
+    def __init__(self, iteration_num=5, seed=None):
+        self.iteration_num = iteration_num  # number of restarts, the first uses smart initialization
+        self.seed          = seed           # random seed, re-applied for every pair of graphs
+
+    # Same API as smatch.get_best_match()
+    # Returns the best mapping (list of node indexes in AMR 2, -1 for unmapped) and the match number
+    def get_best_match(self, instance1, attribute1, relation1, instance2, attribute2, relation2,
+                       prefix1, prefix2):
+        rng  = random.Random(self.seed)
+        pool = MatchPool(instance1, attribute1, relation1, instance2, attribute2, relation2,
+                         prefix1, prefix2)
+        best_mapping   = [-1] * pool.n1
+        best_match_num = 0
+        for i in range(self.iteration_num):
+            if i == 0:
+                mapping = pool.smart_init_mapping(rng)
+            else:
+                mapping = pool.random_init_mapping(rng)
+            mapping, match_num = pool.hill_climb(mapping)
+            if match_num > best_match_num:
+                best_mapping   = pool.to_smatch_mapping(mapping)
+                best_match_num = match_num
+        return best_mapping, best_match_num
+
+    # Score a pair of single line graph strings.  Returns (match, test, gold) triple counts.
+    def get_amr_match(self, amr1, amr2):
+        graph1 = ParsedGraph.from_string(amr1)
+        graph2 = ParsedGraph.from_string(amr2)
+        if graph1 is None or graph2 is None:
+            return 0, 0, 0
+        return self.get_triples_match(graph1.get_triples('a'), graph2.get_triples('b'))
+
+    # Score a pair of (instance, attribute, relation) triples, renamed with the prefixes 'a' and 'b'
+    def get_triples_match(self, triples1, triples2):
+        inst1, attrib1, rel1 = triples1
+        inst2, attrib2, rel2 = triples2
+        _, best_match_num = self.get_best_match(inst1, attrib1, rel1, inst2, attrib2, rel2, 'a', 'b')
+        num_test = len(inst1) + len(attrib1) + len(rel1)
+        num_gold = len(inst2) + len(attrib2) + len(rel2)
+        return best_match_num, num_test, num_gold
+
+
+# Candidate mappings and match weights for a single pair of graphs
+class MatchPool(object):
+    def __init__(self, instance1, attribute1, relation1, instance2, attribute2, relation2,
+                 prefix1, prefix2):
+        self.n1 = n1 = len(instance1)
+        self.n2 = n2 = len(instance2)
+        self.none = n2                  # column index for an unmapped node
+        self.values1 = [t[2] for t in instance1]
+        self.values2 = [t[2] for t in instance2]
+        self.unary = numpy.zeros((n1, n2 + 1), dtype=numpy.int64)
+        self.cands = numpy.zeros((n1, n2), dtype=bool)
+        vocab = {}
+        # Instance triples
+        node1 = node_indexes(instance1, 1, prefix1)
+        node2 = node_indexes(instance2, 1, prefix2)
+        p, q  = join(key_ids(instance1, vocab, (0, 2)), key_ids(instance2, vocab, (0, 2)))
+        self.add_unary(node1[p], node2[q])
+        # Attribute triples
+        node1 = node_indexes(attribute1, 1, prefix1)
+        node2 = node_indexes(attribute2, 1, prefix2)
+        p, q  = join(key_ids(attribute1, vocab, (0, 2)), key_ids(attribute2, vocab, (0, 2)))
+        self.add_unary(node1[p], node2[q])
+        # Relation triples
+        src1, tgt1 = node_indexes(relation1, 1, prefix1), node_indexes(relation1, 2, prefix1)
+        src2, tgt2 = node_indexes(relation2, 1, prefix2), node_indexes(relation2, 2, prefix2)
+        p, q  = join(key_ids(relation1, vocab, (0,)), key_ids(relation2, vocab, (0,)))
+        a, b, c, d = src1[p], tgt1[p], src2[q], tgt2[q]
+        self.cands[a, c] = True
+        self.cands[b, d] = True
+        same = (a == b) & (c == d)          # both ends are the same node pair
+        self.add_unary(a[same], c[same], set_cands=False)
+        keep = (a != b)                     # a == b with c != d can never be matched
+        a, b, c, d = a[keep], b[keep], c[keep], d[keep]
+        self.ei = numpy.concatenate([a, b])
+        self.ej = numpy.concatenate([c, d])
+        self.ek = numpy.concatenate([b, a])
+        self.el = numpy.concatenate([d, c])
+        self.cand_lists = [numpy.flatnonzero(row).tolist() for row in self.cands]
+
+    def add_unary(self, node1, node2, set_cands=True):
+        numpy.add.at(self.unary, (node1, node2), 1)
+        if set_cands:
+            self.cands[node1, node2] = True
+
+    # Convert the internal mapping to smatch's format (list with -1 for unmapped)
+    def to_smatch_mapping(self, mapping):
+        return [int(m) if m != self.none else -1 for m in mapping]
+
+    # Same as smatch.smart_init_mapping.  Map to a candidate with the same concept if possible,
+    # then randomly map the remaining nodes.
+    def smart_init_mapping(self, rng):
+        mapping = [self.none] * self.n1
+        matched = set()
+        no_word_match = []
+        for i, candidates in enumerate(self.cand_lists):
+            if not candidates:
+                continue
+            for j in candidates:
+                if self.values1[i] == self.values2[j] and j not in matched:
+                    mapping[i] = j
+                    matched.add(j)
+                    break
+            else:
+                no_word_match.append(i)
+        for i in no_word_match:
+            self.random_map_node(mapping, matched, i, rng)
+        return mapping
+
+    # Same as smatch.random_init_mapping
+    def random_init_mapping(self, rng):
+        mapping = [self.none] * self.n1
+        matched = set()
+        for i in range(self.n1):
+            self.random_map_node(mapping, matched, i, rng)
+        return mapping
+
+    def random_map_node(self, mapping, matched, i, rng):
+        candidates = [j for j in self.cand_lists[i] if j not in matched]
+        if candidates:
+            j = candidates[rng.randint(0, len(candidates) - 1)]
+            mapping[i] = j
+            matched.add(j)
+
+    # The number of triples matched by mapping node i to each node j, given the rest of the mapping
+    def get_gains(self, mapping):
+        size   = self.n1 * (self.n2 + 1)
+        active = self.el == mapping[self.ek]
+        flat   = self.ei[active] * (self.n2 + 1) + self.ej[active]
+        rel    = numpy.bincount(flat, minlength=size).reshape(self.n1, self.n2 + 1)
+        return self.unary + rel
+
+    # Sum of the weights of all edges that meet the condition, as an n1 x n1 matrix indexed by (i, k)
+    def pair_matrix(self, cond):
+        flat = self.ei[cond] * self.n1 + self.ek[cond]
+        return numpy.bincount(flat, minlength=self.n1 * self.n1).reshape(self.n1, self.n1)
+
+    # Hill-climb from the initial mapping until no move or swap improves the match number
+    def hill_climb(self, mapping):
+        mapping = numpy.array(mapping, dtype=numpy.int64)
+        rows    = numpy.arange(self.n1)
+        upper   = numpy.triu(numpy.ones((self.n1, self.n1), dtype=bool), k=1)
+        gains   = self.get_gains(mapping)
+        cur     = gains[rows, mapping]
+        match_num = int(self.unary[rows, mapping].sum() + (cur - self.unary[rows, mapping]).sum() // 2)
+        while True:
+            # Move gains: remap node i to an unmatched candidate node j
+            unmatched = numpy.ones(self.n2, dtype=bool)
+            unmatched[mapping[mapping != self.none]] = False
+            valid = self.cands & unmatched
+            move_gain, move = 0, None
+            if valid.any():
+                moves = numpy.where(valid, gains[:, :self.n2] - cur[:, None], -1)
+                idx   = int(numpy.argmax(moves))
+                if moves.flat[idx] > 0:
+                    move_gain, move = int(moves.flat[idx]), divmod(idx, self.n2)
+            # Swap gains: exchange the nodes that i and k are mapped to
+            swap_gain, swap = 0, None
+            if self.n1 > 1:
+                m_i, m_k = mapping[self.ei], mapping[self.ek]
+                other = gains[:, mapping]       # other[i, k] = gains[i, mapping[k]]
+                cross = self.pair_matrix((self.ej == m_k) & (self.el == m_k))
+                new   = self.pair_matrix((self.ej == m_k) & (self.el == m_i))
+                old   = self.pair_matrix((self.ej == m_i) & (self.el == m_k))
+                swaps = other + other.T - cur[:, None] - cur[None, :] - cross - cross.T + new + old
+                swaps = numpy.where(upper, swaps, -1)
+                idx   = int(numpy.argmax(swaps))
+                if swaps.flat[idx] > move_gain:
+                    swap_gain, swap = int(swaps.flat[idx]), divmod(idx, self.n1)
+            # Apply the best operation, preferring a move when the gains are equal (as smatch does)
+            if swap is not None:
+                i, k = swap
+                mapping[i], mapping[k] = mapping[k], mapping[i]
+                match_num += swap_gain
+            elif move is not None:
+                i, j = move
+                mapping[i] = j
+                match_num += move_gain
+            else:
+                break
+            gains = self.get_gains(mapping)
+            cur   = gains[rows, mapping]
+        return mapping.tolist(), match_num
+
+
+###############################################################################
+#### Helper functions for building the arrays
+###############################################################################
+
+# Same as smatch.normalize
+def normalize(item):
+    return item.lower().rstrip('_')
+
+# Get the node indexes from the triples by stripping the prefix from the names
+def node_indexes(triples, pos, prefix):
+    return numpy.array([int(t[pos][len(prefix):]) for t in triples], dtype=numpy.int64)
+
+# Integer id for the normalized values of each triple at the given positions
+def key_ids(triples, vocab, positions):
+    keys = [tuple(normalize(t[p]) for p in positions) for t in triples]
+    return numpy.array([vocab.setdefault(k, len(vocab)) for k in keys], dtype=numpy.int64)
+
+# Return the index arrays (p, q) for all pairs where ids1[p] == ids2[q]
+# The pairs are ordered by p and then by q.
+def join(ids1, ids2):
+    order2  = numpy.argsort(ids2, kind='stable')
+    sorted2 = ids2[order2]
+    lo      = numpy.searchsorted(sorted2, ids1, 'left')
+    counts  = numpy.searchsorted(sorted2, ids1, 'right') - lo
+    total   = int(counts.sum())
+    p       = numpy.repeat(numpy.arange(len(ids1)), counts)
+    starts  = numpy.cumsum(counts) - counts
+    q       = order2[numpy.repeat(lo - starts, counts) + numpy.arange(total)]
+    return p, q
@@ -1,10 +1,10 @@
 import re
 import logging
 from   collections import defaultdict, OrderedDict
-from   multiprocessing import Pool
-import smatch
-from   amr import AMR
+from   ..graph_processing.amr_loading import iter_amr_entries
 from   .smatch_reentracy_srl import compute_reentracy_srl
+from   .smatch_graph_store import as_graph_store, VARIANTS
+from   .smatch_scorer import use_scorer, compute_f_from_counts
 
 logger = logging.getLogger(__name__)
 
@@ -38,62 +38,69 @@ logger = logging.getLogger(__name__)
 
 # Score a list of entry pairs
 # The entries should be a list of single line strings.
-def compute_smatch(test_entries, gold_entries):
-    pairs = zip(test_entries, gold_entries)
-    mum_match = mum_test = mum_gold = 0
-    pool = Pool()
-    for (n1, n2, n3) in pool.imap_unordered(match_pair, pairs):
-        mum_match += n1
-        mum_test  += n2
-        mum_gold  += n3
-    pool.close()
-    pool.join()
-    precision, recall, f_score =  smatch.compute_f(mum_match, mum_test, mum_gold)
+# scorer is an optional SmatchScorer to use (and reuse) for multiprocessing
+def compute_smatch(test_entries, gold_entries, scorer=None):
+    with use_scorer(scorer) as scorer:
+        counts = scorer.score_entries(test_entries, gold_entries)
+    precision, recall, f_score = compute_f_from_counts(counts)
     return precision, recall, f_score
 
 
-def compute_scores(test_fn, gold_fn):
+# Score a pair of GraphStores (see smatch_graph_store.py) using the given variant of the triples
+# (ie.. 'smatch', 'unlabeled' or 'no_wsd').  Lists of entry strings are also accepted.
+def compute_store_smatch(test_store, gold_store, variant='smatch', scorer=None):
+    test_store = as_graph_store(test_store)
+    gold_store = as_graph_store(gold_store)
+    with use_scorer(scorer) as scorer:
+        counts = scorer.score_graphs(test_store, gold_store, [variant])[variant]
+    precision, recall, f_score = compute_f_from_counts(counts)
+    return precision, recall, f_score
+
+
+def compute_scores(test_fn, gold_fn, scorer=None):
     # Get the graph from each entry in each file
     test_entries = get_entries(test_fn)
     gold_entries = get_entries(gold_fn)
     assert len(test_entries) == len(gold_entries), '%d != %d' % (len(test_entries), len(gold_entries))
-    # Compute standard smatch scores
-    precision, recall, f_score = compute_smatch(test_entries, gold_entries)
-    output_score('Smatch', precision, recall, f_score)
-    # Compute unlabeled data
-    tes = [unlabel(e) for e in test_entries]
-    ges = [unlabel(e) for e in gold_entries]
-    precision, recall, f_score = compute_smatch(tes, ges)
-    output_score('Unlabeled', precision, recall, f_score)
-    # Compute withough Word Sense Disambiguation
-    tes = [remove_wsd(e) for e in test_entries]
-    ges = [remove_wsd(e) for e in gold_entries]
-    precision, recall, f_score = compute_smatch(tes, ges)
-    output_score('No WSD', precision, recall, f_score)
-    # get the other misc sub-scores
-    score_dict = compute_subscores(test_entries, gold_entries)
-    for stype, (pr, rc, f) in score_dict.items():
-        output_score(stype, pr, rc, f)
-    # Get the Reentracies and SRL scores
-    score_dict = compute_reentracy_srl(test_entries, gold_entries)
-    for stype, (pr, rc, f) in score_dict.items():
-        output_score(stype, pr, rc, f)
+    # Parse all the graphs once.  All the scores below are derived from these.
+    test_store = as_graph_store(test_entries)
+    gold_store = as_graph_store(gold_entries)
+    with use_scorer(scorer) as scorer:
+        # Compute the standard, unlabeled and without Word Sense Disambiguation smatch scores
+        # All variants of a graph pair are scored in the same task.
+        variant_counts = scorer.score_graphs(test_store, gold_store, VARIANTS)
+        for stype, variant in (('Smatch', 'smatch'), ('Unlabeled', 'unlabeled'), ('No WSD', 'no_wsd')):
+            precision, recall, f_score = compute_f_from_counts(variant_counts[variant])
+            output_score(stype, precision, recall, f_score)
+        # get the other misc sub-scores
+        score_dict = compute_subscores(test_store, gold_store)
+        for stype, (pr, rc, f) in score_dict.items():
+            output_score(stype, pr, rc, f)
+        # Get the Reentracies and SRL scores
+        score_dict = compute_reentracy_srl(test_store, gold_store, scorer=scorer)
+        for stype, (pr, rc, f) in score_dict.items():
+            output_score(stype, pr, rc, f)
 
 
 # Read in an AMR file and return the graph as a string
 def get_entries(fname):
-    with open(fname) as f:
-        data = f.read()
-    entries = []
-    for e in data.split('\n\n'):
-        lines = [l.strip() for l in e.splitlines()]
-        lines = [l for l in lines if (l and not l.startswith('#'))]
-        string = ' '.join(lines)
-        string = string.replace('\t', ' ')      # replace tabs with a space
-        string = re.sub(' +', ' ', string)      # squeeze multiple spaces into a single
-        if string:
-            entries.append( string )
-    return entries
+    return list(iter_entries(fname))
+
+# Generator version of the above that reads the file one entry at a time (see iter_amr_entries)
+def iter_entries(fname):
+    for entry in iter_amr_entries(fname, strip_comments=False):
+        entry = join_entry_lines(entry.splitlines())
+        if entry:
+            yield entry
+
+# Join the lines of a graph into a single line string, removing any metadata
+def join_entry_lines(lines):
+    lines = [l.strip() for l in lines]
+    lines = [l for l in lines if (l and not l.startswith('#'))]
+    string = ' '.join(lines)
+    string = string.replace('\t', ' ')      # replace tabs with a space
+    string = re.sub(' +', ' ', string)      # squeeze multiple spaces into a single
+    return string
 
 
 ###############################################################################
@@ -103,16 +110,6 @@ def get_entries(fname):
 def output_score(stype, precision, recall, f_score):
     print('%-16s -> P: %.3f,  R: %.3f,  F: %.3f' % (stype, precision, recall, f_score))
 
-# Process a single pair (function separated for multiprocessing)
-def match_pair(pair):
-    amr1, amr2 = pair
-    smatch.match_triple_dict.clear() # clear the matching triple dictionary
-    try:
-        ret = smatch.get_amr_match(amr1, amr2)
-        return ret
-    except:
-        return 0, 0, 0
-
 # Returns a dictionary of variables to concepts
 def var2concept(amr):
     v2c = {}
@@ -121,28 +118,25 @@ def var2concept(amr):
     return v2c
 
 # Modify graphs and compute scores on the variations
+# pred and gold may be lists of entry strings or GraphStores
 def compute_subscores(pred, gold):
     inters = defaultdict(int)
     golds = defaultdict(int)
     preds = defaultdict(int)
     # Loop through all entries
-    for amr_pred, amr_gold in zip(pred, gold):
-        # Create the predicted data
-        amr_pred = AMR.parse_AMR_line(amr_pred.replace("\n",""))
+    for amr_pred, amr_gold in zip(as_graph_store(pred), as_graph_store(gold)):
+        # Get the predicted data
         if amr_pred is None:
             logger.error('Empty amr_pred entry')
             continue
-        dict_pred = var2concept(amr_pred)
-        triples_pred = [t for t in amr_pred.get_triples()[1]]
-        triples_pred.extend([t for t in amr_pred.get_triples()[2]])
-        # Create the gold data
-        amr_gold = AMR.parse_AMR_line(amr_gold.replace("\n",""))
+        dict_pred = amr_pred.v2c
+        triples_pred = amr_pred.attributes + amr_pred.relations
+        # Get the gold data
         if amr_gold is None:
             logger.error('Empty amr_gold entry')
             continue
-        dict_gold = var2concept(amr_gold)
-        triples_gold = [t for t in amr_gold.get_triples()[1]]
-        triples_gold.extend([t for t in amr_gold.get_triples()[2]])
+        dict_gold = amr_gold.v2c
+        triples_gold = amr_gold.attributes + amr_gold.relations
         # Non_sense_frames scores
         list_pred = non_sense_frames(dict_pred)
         list_gold = non_sense_frames(dict_gold)
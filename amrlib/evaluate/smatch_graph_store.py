@@ -0,0 +1,296 @@
+import re
+import logging
+from   collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+
+###################################################################################################
+# Parsed graph store for smatch_enhanced.compute_scores
+#
+# The smatch scores and all of the enhanced sub-scores are computed from the same set of graphs.
+# Instead of re-parsing the graph strings for every metric, each entry is scanned once and the raw
+# edges are kept.  The triples for each metric are then derived from those edges.
+#
+# The scanner follows smatch's AMR.parse_AMR_line (from the smatch library's amr.py) character for
+# character, so the quirks of that parser (ie.. quote handling) are preserved.  Two sets of triples
+# can be created from the raw edges...
+#   smatch   - The conventions of smatch's amr.py.  "-of" roles (with a few exceptions) are inverted
+#              and mod is converted to domain.  These are used for smatch and the misc sub-scores.
+#   legacy   - The conventions of the older AMR class in smatch_reentracy_srl.py.  Relations and
+#              attributes are stored in dictionaries and only some "-of" roles are inverted.
+#              These are used for the reentrancy and SRL scores.
+# The "unlabeled" and "no_wsd" variants are created by transforming the roles / concepts of the
+# raw edges, which is equivalent to running the regex substitutions in smatch_enhanced on the
+# graph strings and then re-parsing them.
+###################################################################################################
+
+# Variant names for get_triples()
+VARIANTS = ('smatch', 'unlabeled', 'no_wsd')
+
+# Edge types that the scanner records. These are needed to re-create the slightly different
+# behavior of the smatch and legacy parsers.
+EDGE_NODE  = 0      # :role (x / concept ..    the target is a new node
+EDGE_COLON = 1      # :role value :            value terminated by the next role
+EDGE_PAREN = 2      # :role value )            value terminated by the end of the node
+
+# Roles that smatch's parser does not invert, even though they end in "-of"
+SMATCH_NO_INVERT = set(['prep-on-behalf-of', 'prep-out-of', 'consist-of'])
+
+
+# A store of parsed graphs, one for each entry in a file.
+# Entries that can't be parsed are stored as None.
+class GraphStore(object):
+    def __init__(self, entries):
+        self.entries = list(entries)    # the original strings, used for cache keys
+        self.graphs  = [ParsedGraph.from_string(e) for e in self.entries]
+
+    def __len__(self):
+        return len(self.graphs)
+
+    def __getitem__(self, idx):
+        return self.graphs[idx]
+
+    def __iter__(self):
+        return iter(self.graphs)
+
+    # Get the renamed triples for every graph in the store (None for graphs that failed to parse)
+    def get_triples(self, prefix, variant='smatch'):
+        return [g.get_triples(prefix, variant) if g is not None else None for g in self.graphs]
+
+
+# Convert a list of entry strings to a GraphStore if needed
+def as_graph_store(entries):
+    if isinstance(entries, GraphStore):
+        return entries
+    return GraphStore(entries)
+
+
+# A single graph, parsed once, with the triples needed for scoring derived from the raw edges
+class ParsedGraph(object):
+    def __init__(self, nodes, node_values, edges):
+        self.nodes       = nodes        # variable names, in order of appearance
+        self.node_values = node_values  # concepts for the above variables
+        self.edges       = edges        # list of raw (source, role, target, edge_type, target_seen)
+        self.v2c         = dict(zip(nodes, node_values))
+        self.attributes, self.relations = self._build_smatch(edges)
+        self._cache      = {}
+
+    # Instance triples ("instance", variable, concept)
+    @property
+    def instances(self):
+        return [('instance', n, v) for n, v in zip(self.nodes, self.node_values)]
+
+    # Return the parsed graph or None if the string can't be parsed
+    @classmethod
+    def from_string(cls, line):
+        try:
+            return cls(*scan_amr_line(line.replace('\n', '')))
+        except Exception as e:
+            logger.debug('Unable to parse graph: %s' % e)
+            return None
+
+    # Get the instance, attribute and relation triples with the variables renamed to prefix + index
+    # (ie.. a0, a1, ..) as needed by smatch.get_best_match()
+    def get_triples(self, prefix, variant='smatch'):
+        key = (prefix, variant)
+        if key not in self._cache:
+            self._cache[key] = self._get_triples(prefix, variant)
+        return self._cache[key]
+
+    def _get_triples(self, prefix, variant):
+        if variant == 'smatch':
+            node_values, attributes, relations = self.node_values, self.attributes, self.relations
+        elif variant == 'unlabeled':
+            edges = [(s, unlabel_role(r), t, et, seen) for (s, r, t, et, seen) in self.edges]
+            node_values = self.node_values
+            attributes, relations = self._build_smatch(edges)
+        elif variant == 'no_wsd':
+            node_values = [remove_wsd_concept(v) for v in self.node_values]
+            attributes, relations = self.attributes, self.relations
+        else:
+            raise ValueError('Unknown triples variant %s' % variant)
+        rename = {n:prefix + str(i) for i, n in enumerate(self.nodes)}
+        instances  = [('instance', rename[n], v) for n, v in zip(self.nodes, node_values)]
+        attributes = [(r, rename[s], v) for (r, s, v) in attributes]
+        relations  = [(r, rename[s], rename[t]) for (r, s, t) in relations]
+        return instances, attributes, relations
+
+    # Attribute and relation triples using the conventions in the older AMR code from
+    # smatch_reentracy_srl.py.  Returned as a single list, attributes first then relations.
+    def get_legacy_triples(self):
+        if 'legacy' not in self._cache:
+            self._cache['legacy'] = self._build_legacy(self.edges)
+        return self._cache['legacy']
+
+    # Build the attribute and relation triples the way smatch's amr.py does
+    def _build_smatch(self, edges):
+        rel_dict1 = defaultdict(list)   # relations between known nodes
+        rel_dict2 = defaultdict(list)   # constants or nodes not yet seen when the edge was scanned
+        for source, role, target, edge_type, seen in edges:
+            rel_dict = rel_dict1 if (edge_type == EDGE_NODE or seen) else rel_dict2
+            if role.endswith('-of') and role not in SMATCH_NO_INVERT:
+                rel_dict[target].append((role[:-3], source))
+            elif role == 'mod':
+                rel_dict[target].append(('domain', source))
+            else:
+                rel_dict[source].append((role, target))
+        attributes, relations = [], []
+        for node in self.nodes:
+            for role, target in rel_dict1.get(node, []):
+                relations.append((role, node, target))
+            for role, target in rel_dict2.get(node, []):
+                if target in self.v2c:
+                    relations.append((role, node, target))
+                else:
+                    attributes.append((role, node, target))
+            if node == self.nodes[0]:
+                attributes.append(('TOP', node, 'top'))
+        return attributes, relations
+
+    # Build the attribute and relation triples the way the AMR class in smatch_reentracy_srl does
+    def _build_legacy(self, edges):
+        rel_dict1 = defaultdict(list)
+        rel_dict2 = defaultdict(list)
+        for source, role, target, edge_type, seen in edges:
+            if edge_type == EDGE_NODE:
+                if role.endswith('-of'):
+                    rel_dict1[target].append((role[:-3], source))
+                else:
+                    rel_dict1[source].append((role, target))
+            elif edge_type == EDGE_PAREN and role.endswith('-of'):
+                rel_dict1[target].append((role[:-3], source))
+            elif seen:
+                rel_dict1[source].append((role, target))
+            else:
+                rel_dict2[source].append((role, target))
+        attributes, relations = [], []
+        for node in self.nodes:
+            relation_dict, attribute_dict = {}, {}
+            for role, target in rel_dict1.get(node, []):
+                relation_dict[target] = role
+            for role, target in rel_dict2.get(node, []):
+                if target in self.v2c:
+                    relation_dict[target] = role
+                else:
+                    attribute_dict[role] = target
+            if node == self.nodes[0]:
+                attribute_dict['TOP'] = self.node_values[0]
+            attributes.extend((role, node, value) for role, value in attribute_dict.items())
+            relations.extend((role, node, target) for target, role in relation_dict.items())
+        return attributes + relations
+
+
+# Scan a single line AMR string and return the list of nodes, their concepts and the raw edges.
+# This is the same state machine as smatch's AMR.parse_AMR_line except that edges are recorded
+# as they appear, without applying any role inversion.  Raises ValueError on a malformed graph.
+def scan_amr_line(line):
+    # state: 1 for (, 2 for :, 3 for /, 0 for start or )
+    state             = 0
+    stack             = []
+    cur_charseq       = []
+    node_dict         = {}
+    node_name_list    = []
+    edges             = []
+    cur_relation_name = ''
+    in_quote          = False
+    for c in line.strip():
+        if c == ' ':
+            if state == 2:
+                cur_charseq.append(c)
+            continue
+        if c == '"':
+            if in_quote:
+                cur_charseq.append('_')
+            in_quote = not in_quote
+        elif c == '(':
+            if in_quote:
+                cur_charseq.append(c)
+                continue
+            if state == 2:
+                if cur_relation_name != '':
+                    raise ValueError('Format error')
+                cur_relation_name = ''.join(cur_charseq).strip()
+                cur_charseq[:] = []
+            state = 1
+        elif c == ':':
+            if in_quote:
+                cur_charseq.append(c)
+                continue
+            if state == 3:
+                node_dict[stack[-1]] = ''.join(cur_charseq)
+                cur_charseq[:] = []
+            elif state == 2:
+                parts = ''.join(cur_charseq).split()
+                cur_charseq[:] = []
+                if len(parts) < 2:
+                    raise ValueError('Relation missing a value')
+                if len(stack) == 0:
+                    raise ValueError('Relation outside of a node')
+                edges.append((stack[-1], parts[0], parts[1], EDGE_COLON, parts[1] in node_dict))
+            state = 2
+        elif c == '/':
+            if in_quote:
+                cur_charseq.append(c)
+                continue
+            if state != 1:
+                raise ValueError('Unexpected /')
+            node_name = ''.join(cur_charseq)
+            cur_charseq[:] = []
+            if node_name in node_dict:
+                raise ValueError('Duplicate node name %s' % node_name)
+            stack.append(node_name)
+            node_name_list.append(node_name)
+            if cur_relation_name != '':
+                edges.append((stack[-2], cur_relation_name, node_name, EDGE_NODE, True))
+                cur_relation_name = ''
+            state = 3
+        elif c == ')':
+            if in_quote:
+                cur_charseq.append(c)
+                continue
+            if len(stack) == 0:
+                raise ValueError('Unmatched parenthesis')
+            if state == 2:
+                parts = ''.join(cur_charseq).split()
+                cur_charseq[:] = []
+                if len(parts) < 2:
+                    raise ValueError('Relation missing a value')
+                edges.append((stack[-1], parts[0], parts[1], EDGE_PAREN, parts[1] in node_dict))
+            elif state == 3:
+                node_dict[stack[-1]] = ''.join(cur_charseq)
+                cur_charseq[:] = []
+            stack.pop()
+            cur_relation_name = ''
+            state = 0
+        else:
+            cur_charseq.append(c)
+    if not node_name_list:
+        raise ValueError('No nodes in graph')
+    node_values = []
+    for node in node_name_list:
+        if node not in node_dict:
+            raise ValueError('Node name not found %s' % node)
+        node_values.append(node_dict[node])
+    return node_name_list, node_values, edges
+
+
+###############################################################################
+#### Role and concept transforms for the graph variants
+###############################################################################
+
+# Same substitutions as smatch_enhanced.unlabel(), applied to a single role
+match_of    = re.compile(r':[0-9a-zA-Z]*-of')
+match_no_of = re.compile(r':[0-9a-zA-Z]*(?!-of)')
+unlabel_cache = {}
+def unlabel_role(role):
+    if role not in unlabel_cache:
+        label = re.sub(match_no_of, ':label',    ':' + role)
+        label = re.sub(match_of,    ':label-of', label)
+        unlabel_cache[role] = label[1:]
+    return unlabel_cache[role]
+
+# Same substitution as smatch_enhanced.remove_wsd(), applied to a single concept
+match_wsd = re.compile(r'^([a-zA-Z0-9\-][a-zA-Z0-9\-]*)-[0-9][0-9]*')
+def remove_wsd_concept(concept):
+    return re.sub(match_wsd, r'\1-01', concept)
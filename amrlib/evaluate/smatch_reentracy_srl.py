@@ -1,6 +1,8 @@
 import logging
-from   multiprocessing import Pool
+from   collections import defaultdict
 import smatch
+from   .smatch_graph_store import as_graph_store
+from   .smatch_scorer import use_scorer, compute_f_from_counts
 
 logger = logging.getLogger(__name__)
 
@@ -22,29 +24,27 @@ logger = logging.getLogger(__name__)
 
 
 # Compute multiple subscores
-def compute_reentracy_srl(pred, gold):
+# pred and gold may be lists of entry strings or GraphStores
+# scorer is an optional SmatchScorer to use for multiprocessing
+def compute_reentracy_srl(pred, gold, scorer=None):
     reentrancies_pred = []
     reentrancies_gold = []
     srl_pred = []
     srl_gold = []
     # Loop through all entries
-    for amr_pred, amr_gold in zip(pred, gold):
-        # Create the predicted data
-        amr_pred = AMR.parse_AMR_line(amr_pred.replace("\n",""))
+    for amr_pred, amr_gold in zip(as_graph_store(pred), as_graph_store(gold)):
+        # Get the predicted data
         if amr_pred is None:
             logger.error('Empty amr_pred entry')
             continue
-        dict_pred = var2concept(amr_pred)
-        triples_pred = [t for t in amr_pred.get_triples()[1]]
-        triples_pred.extend([t for t in amr_pred.get_triples()[2]])
-        # Create the gold data
-        amr_gold = AMR.parse_AMR_line(amr_gold.replace("\n",""))
+        dict_pred = amr_pred.v2c
+        triples_pred = amr_pred.get_legacy_triples()
+        # Get the gold data
         if amr_gold is None:
             logger.error('Empty amr_gold entry')
             continue
-        dict_gold = var2concept(amr_gold)
-        triples_gold = [t for t in amr_gold.get_triples()[1]]
-        triples_gold.extend([t for t in amr_gold.get_triples()[2]])
+        dict_gold = amr_gold.v2c
+        triples_gold = amr_gold.get_legacy_triples()
         # Rentracies data
         reentrancies_pred.append(reentrancy(dict_pred, triples_pred))
         reentrancies_gold.append(reentrancy(dict_gold, triples_gold))
@@ -54,22 +54,18 @@ def compute_reentracy_srl(pred, gold):
 
     # Compute and add reentracies/SRL smatch scores to dictionary
     rdict = {}
-    rdict['Reentrancies'] = compute_smatch_2(reentrancies_pred, reentrancies_gold)
-    rdict['SRL']          = compute_smatch_2(srl_pred, srl_gold)
+    with use_scorer(scorer) as scorer:
+        rdict['Reentrancies'] = compute_smatch_2(reentrancies_pred, reentrancies_gold, scorer)
+        rdict['SRL']          = compute_smatch_2(srl_pred, srl_gold, scorer)
     return rdict
 
 
-def compute_smatch_2(list1, list2):
-    num_match, num_test, num_gold = (0, 0, 0)
-    pairs = zip(list1, list2)
-    pool = Pool()
-    for (n1, n2, n3) in pool.imap_unordered(match_pair_2, pairs):
-        num_match += n1
-        num_test  += n2
-        num_gold  += n3
-    pool.close()
-    pool.join()
-    precision, recall, f_score =  smatch.compute_f(num_match, num_test, num_gold)
+def compute_smatch_2(list1, list2, scorer=None):
+    pairs = list(zip(list1, list2))
+    costs = [(len(l1[1]) + len(l2[1]))**2 + 1 for l1, l2 in pairs]  # based on the number of nodes
+    with use_scorer(scorer) as scorer:
+        counts = scorer.map(match_pair_2, pairs, costs)
+    precision, recall, f_score = compute_f_from_counts(counts)
     return precision, recall, f_score
 
 
@@ -99,40 +95,50 @@ def var2concept(amr):
     return v2c
 
 
+# Build an AMR object from the extracted triples and the var/concept dictionary.
+# Variables are added in order of first appearance and each variable's relations are taken from a
+# single pass index of the triples by their source variable.
 def parse_relations(rels, v2c):
     var_list = []
     conc_list = []
+    var_set = set()
+    children = defaultdict(list)    # source var -> triples, in the original order
     for r in rels:
-        if str(r[1]) not in var_list and str(r[1]) != "TOP" and r[1] in v2c:
+        if str(r[1]) not in var_set and str(r[1]) != "TOP" and r[1] in v2c:
             var_list.append(str(r[1]))
+            var_set.add(str(r[1]))
             conc_list.append(str(v2c[r[1]]))
-        if str(r[2]) not in var_list and r[2] in v2c:
+        if str(r[2]) not in var_set and r[2] in v2c:
             var_list.append(str(r[2]))
+            var_set.add(str(r[2]))
             conc_list.append(str(v2c[r[2]]))
-    k = 0
-    rel_dict = []*len(var_list)
-    att_dict = []*len(var_list)
+        if r[2] in v2c:
+            children[str(r[1])].append(r)
+    rel_dict = []
+    att_dict = []
     for v in var_list:
         rel_dict.append({})
         att_dict.append({})
-        for i in rels:
-            if str(i[1]) == str(v) and i[2] in v2c:
-                rel_dict[k][str(i[2])] = i[0]
-                att_dict[k][i[0]] = str(v2c[i[2]])
-        k += 1
+        for i in children.get(str(v), []):
+            rel_dict[-1][str(i[2])] = i[0]
+            att_dict[-1][i[0]] = str(v2c[i[2]])
     return AMR(var_list, conc_list, rel_dict, att_dict)
 
 
+# Extract the triples for all nodes with more than one parent
 def reentrancy(v2c_dict, triples):
     lst = []
-    vrs = []
-    for n in list(v2c_dict.keys()):
-        parents = [(l,v1,v2) for (l,v1,v2) in triples if v2 == n and l != "instance"]
-        if len(parents) > 1:
+    vrs = set()
+    parents = defaultdict(list)     # target -> triples, in the original order
+    for t in triples:
+        if t[0] != "instance":
+            parents[t[2]].append(t)
+    for n in v2c_dict:
+        if len(parents.get(n, [])) > 1:
             #extract triples involving this (multi-parent) node
-            for t in parents:
+            for t in parents[n]:
                 lst.append(t)
-                vrs.extend([t[1],t[2]])
+                vrs.update([t[1],t[2]])
     #collect var/concept pairs for all extracted nodes
     dict1 = {}
     for i in v2c_dict:
@@ -143,7 +149,7 @@ def reentrancy(v2c_dict, triples):
 
 def srl(v2c_dict, triples):
     lst = []
-    vrs = []
+    vrs = set()
     for t in triples:
         if t[0].startswith("ARG"):
             #although the smatch code we use inverts the -of relations
@@ -151,10 +157,10 @@ def srl(v2c_dict, triples):
             #them here
             if t[0].endswith("of"):
                 lst.append((t[0][0:-3],t[2],t[1]))
-                vrs.extend([t[2],t[1]])
+                vrs.update([t[2],t[1]])
             else:
                 lst.append(t)
-                vrs.extend([t[1],t[2]])
+                vrs.update([t[1],t[2]])
     #collect var/concept pairs for all extracted nodes
     dict1 = {}
     for i in v2c_dict:
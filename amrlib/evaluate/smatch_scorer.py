@@ -0,0 +1,226 @@
+import os
+import heapq
+import logging
+from   functools import partial
+from   contextlib import contextmanager
+from   multiprocessing import Pool
+import smatch
+
+logger = logging.getLogger(__name__)
+
+
+###################################################################################################
+# Multiprocessing engine for smatch scoring
+#
+# The SmatchScorer owns a single process pool that is created the first time it's needed and
+# kept until close() is called, so it can be shared by all the scoring functions in a run (or by
+# every evaluation in a training loop).  Work is sent to the pool in chunks that are balanced by
+# the estimated cost of each pair, instead of one pair at a time.
+#
+# Example:
+#   with SmatchScorer() as scorer:
+#       precision, recall, f_score = compute_smatch(test_entries, gold_entries, scorer=scorer)
+#       compute_scores(test_fn, gold_fn, scorer=scorer)
+#
+# By default the hill-climbing from the smatch library is used.  To use the vectorized version in
+# smatch_engine.py, pass in an engine (ie.. SmatchScorer(engine=SmatchEngine(seed=0)) ).
+#
+# If a SmatchCache (see smatch_cache.py) is given, the counts for each pair are looked up there first
+# and only the pairs that aren't in the cache are scored.
+###################################################################################################
+
+class SmatchScorer(object):
+    def __init__(self, processes=None, chunks_per_process=4, engine=None, cache=None):
+        self.processes          = processes if processes is not None else (os.cpu_count() or 1)
+        self.chunks_per_process = chunks_per_process
+        self.engine             = engine    # None for the smatch library or a SmatchEngine
+        self.cache              = cache     # optional SmatchCache
+        self.pool               = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # Shut down the process pool.  The scorer can still be used after this and will
+    # create a new pool if needed.
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def get_pool(self):
+        if self.pool is None:
+            self.pool = Pool(self.processes)
+        return self.pool
+
+    # Apply func to every item and return the results in the same order as the items.
+    # func must be a module level function so it can be pickled.  costs is an optional list of the
+    # estimated compute cost for each item, used to balance the size of the chunks.
+    def map(self, func, items, costs=None):
+        items = list(items)
+        if not items:
+            return []
+        if costs is None:
+            costs = [1] * len(items)
+        chunks = self.get_chunks(costs)
+        tasks  = [(func, [(i, items[i]) for i in chunk]) for chunk in chunks]
+        results = [None] * len(items)
+        if self.processes <= 1 or len(tasks) == 1:
+            task_results = map(run_chunk, tasks)
+        else:
+            task_results = self.get_pool().imap_unordered(run_chunk, tasks)
+        for chunk_results in task_results:
+            for idx, result in chunk_results:
+                results[idx] = result
+        return results
+
+    # Split the item indices into chunks with approximately the same total cost.  The most costly
+    # items are assigned first, each to the chunk with the lowest total so far.  Chunks are returned
+    # largest first so the most expensive work starts early.
+    def get_chunks(self, costs):
+        num_chunks = max(1, min(len(costs), self.processes * self.chunks_per_process))
+        heap   = [(0, cnum) for cnum in range(num_chunks)]
+        chunks = [[] for _ in range(num_chunks)]
+        for idx in sorted(range(len(costs)), key=lambda i: costs[i], reverse=True):
+            total, cnum = heapq.heappop(heap)
+            chunks[cnum].append(idx)
+            heapq.heappush(heap, (total + costs[idx], cnum))
+        totals = {cnum:total for total, cnum in heap}
+        chunks = [chunks[cnum] for cnum in sorted(totals, key=totals.get, reverse=True)]
+        return [c for c in chunks if c]
+
+    # Name of the matching algorithm, used in the cache keys so results from different engines
+    # aren't mixed.
+    def get_method_name(self):
+        if self.engine is None:
+            return 'smatch'
+        return 'engine-%s-%s' % (self.engine.iteration_num, self.engine.seed)
+
+    # Score pairs of single line graph strings.  Returns a list of (match, test, gold) counts.
+    def score_entries(self, test_entries, gold_entries):
+        pairs = list(zip(test_entries, gold_entries))
+        costs = [(len(t) + len(g))**2 for t, g in pairs]
+        func  = partial(match_pair, engine=self.engine)
+        if self.cache is None:
+            return self.map(func, pairs, costs)
+        method  = self.get_method_name()
+        keys    = [self.cache.get_key(t, g, 'smatch', method) for t, g in pairs]
+        results = [self.cache.get(key) for key in keys]
+        todo    = [i for i, r in enumerate(results) if r is None]
+        for i, counts in zip(todo, self.map(func, [pairs[i] for i in todo], [costs[i] for i in todo])):
+            results[i] = counts
+            self.cache.set(keys[i], counts)
+        self.cache.save()
+        return results
+
+    # Score pairs of ParsedGraphs (see smatch_graph_store.py) for all the requested variants of the
+    # triples at once.  Returns a dictionary, keyed by the variant, of lists of (match, test, gold).
+    def score_graphs(self, test_store, gold_store, variants=('smatch',)):
+        variants = tuple(variants)
+        pairs = [(t, g, variants) for t, g in zip(test_store, gold_store)]
+        costs = [graph_pair_cost(t, g) for t, g, _ in pairs]
+        func  = partial(match_graph_pair, engine=self.engine)
+        if self.cache is None:
+            results = self.map(func, pairs, costs)
+        else:
+            # A pair is only re-scored if any of its variants are missing from the cache
+            method  = self.get_method_name()
+            keys    = [[self.cache.get_key(t, g, v, method) for v in variants]
+                        for t, g in zip(test_store.entries, gold_store.entries)]
+            results = [tuple(self.cache.get(key) for key in pkeys) for pkeys in keys]
+            todo    = [i for i, r in enumerate(results) if None in r]
+            for i, counts in zip(todo, self.map(func, [pairs[i] for i in todo], [costs[i] for i in todo])):
+                results[i] = counts
+                for key, vcounts in zip(keys[i], counts):
+                    self.cache.set(key, vcounts)
+            self.cache.save()
+        return {v:[r[i] for r in results] for i, v in enumerate(variants)}
+
+
+# Use the scorer if supplied, otherwise create a temporary one that's closed when done
+@contextmanager
+def use_scorer(scorer=None):
+    if scorer is not None:
+        yield scorer
+    else:
+        scorer = SmatchScorer()
+        try:
+            yield scorer
+        finally:
+            scorer.close()
+
+
+# Sum a list of (match, test, gold) counts
+def sum_counts(counts):
+    num_match = num_test = num_gold = 0
+    for (n1, n2, n3) in counts:
+        num_match += n1
+        num_test  += n2
+        num_gold  += n3
+    return num_match, num_test, num_gold
+
+
+# Compute precision, recall and f_score from a list of (match, test, gold) counts
+def compute_f_from_counts(counts):
+    return smatch.compute_f(*sum_counts(counts))
+
+
+###############################################################################
+#### Functions run in the worker processes
+###############################################################################
+
+def run_chunk(task):
+    func, indexed_items = task
+    return [(idx, func(item)) for idx, item in indexed_items]
+
+# Estimated cost of matching a pair of ParsedGraphs
+def graph_pair_cost(test_graph, gold_graph):
+    num_nodes  = len(test_graph.nodes) if test_graph is not None else 0
+    num_nodes += len(gold_graph.nodes) if gold_graph is not None else 0
+    return num_nodes**2 + 1
+
+# Process a single pair of graph strings
+# engine is None to use the smatch library or a SmatchEngine
+def match_pair(pair, engine=None):
+    amr1, amr2 = pair
+    smatch.match_triple_dict.clear() # clear the matching triple dictionary
+    try:
+        if engine is not None:
+            return engine.get_amr_match(amr1, amr2)
+        ret = smatch.get_amr_match(amr1, amr2)
+        return ret
+    except:
+        return 0, 0, 0
+
+# Process a single pair of pre-parsed, renamed triples (see GraphStore.get_triples)
+def match_triples(pair, engine=None):
+    test_triples, gold_triples = pair
+    if test_triples is None or gold_triples is None:
+        return 0, 0, 0
+    smatch.match_triple_dict.clear() # clear the matching triple dictionary
+    inst1, attrib1, rel1 = test_triples
+    inst2, attrib2, rel2 = gold_triples
+    try:
+        if engine is not None:
+            _, best_match_num = engine.get_best_match(inst1, attrib1, rel1, inst2, attrib2, rel2, 'a', 'b')
+        else:
+            _, best_match_num = smatch.get_best_match(inst1, attrib1, rel1, inst2, attrib2, rel2, 'a', 'b')
+    except:
+        return 0, 0, 0
+    num_test = len(inst1) + len(attrib1) + len(rel1)
+    num_gold = len(inst2) + len(attrib2) + len(rel2)
+    return best_match_num, num_test, num_gold
+
+# Process a pair of ParsedGraphs for several variants of the triples
+# Returns a tuple of (match, test, gold) counts, one for each variant
+def match_graph_pair(pair, engine=None):
+    test_graph, gold_graph, variants = pair
+    counts = []
+    for variant in variants:
+        test_triples = test_graph.get_triples('a', variant) if test_graph is not None else None
+        gold_triples = gold_graph.get_triples('b', variant) if gold_graph is not None else None
+        counts.append(match_triples((test_triples, gold_triples), engine))
+    return tuple(counts)
@@ -0,0 +1,131 @@
+import csv
+import logging
+from   itertools import zip_longest
+import numpy
+from   .smatch_enhanced import iter_entries
+from   .smatch_scorer import use_scorer, sum_counts
+import smatch
+
+logger = logging.getLogger(__name__)
+
+
+###################################################################################################
+# Streaming smatch scoring with per-graph output
+#
+# The test and gold files are read in lockstep, one entry at a time, and scored in batches so the
+# whole corpus never needs to be in memory.  The (match, test, gold) counts and the P/R/F for every
+# graph are written to out_fn and the corpus totals are returned.
+#   out_fn ending in .npz  - numpy arrays: match, test, gold, precision, recall, f_score
+#                            (the counts are kept in memory until the end, 12 bytes per graph)
+#   anything else          - CSV with a header line, written as each batch is scored
+#
+# Example:
+#   precision, recall, f_score = stream_smatch(PRED, GOLD, 'scores.csv')
+#   for idx, f_score in get_worst_graphs('scores.csv', 10):
+#       print(idx, f_score)
+###################################################################################################
+
+CSV_FIELDS = ['index', 'match', 'test', 'gold', 'precision', 'recall', 'f_score']
+
+
+# Score the files and write the per-graph scores to out_fn.  Returns the corpus precision, recall, f_score.
+# scorer is an optional SmatchScorer to use for multiprocessing (and caching)
+def stream_smatch(test_fn, gold_fn, out_fn, batch_size=1000, scorer=None):
+    writer = NPZScoreWriter(out_fn) if out_fn.endswith('.npz') else CSVScoreWriter(out_fn)
+    totals = (0, 0, 0)
+    with use_scorer(scorer) as scorer:
+        for test_batch, gold_batch in iter_entry_batches(test_fn, gold_fn, batch_size):
+            counts = scorer.score_entries(test_batch, gold_batch)
+            writer.write(counts)
+            totals = sum_counts([totals] + counts)
+    writer.close()
+    logger.info('Wrote scores for %d graphs to %s' % (writer.count, out_fn))
+    precision, recall, f_score = smatch.compute_f(*totals)
+    return precision, recall, f_score
+
+
+# Read the two files in lockstep and yield batches of (test_entries, gold_entries)
+def iter_entry_batches(test_fn, gold_fn, batch_size):
+    test_batch, gold_batch = [], []
+    for test_entry, gold_entry in zip_longest(iter_entries(test_fn), iter_entries(gold_fn)):
+        if test_entry is None or gold_entry is None:
+            raise ValueError('%s and %s have a different number of entries' % (test_fn, gold_fn))
+        test_batch.append(test_entry)
+        gold_batch.append(gold_entry)
+        if len(test_batch) >= batch_size:
+            yield test_batch, gold_batch
+            test_batch, gold_batch = [], []
+    if test_batch:
+        yield test_batch, gold_batch
+
+
+# Load the per-graph scores written by stream_smatch into a dictionary of numpy arrays
+# keyed by match, test, gold, precision, recall and f_score.
+def load_graph_scores(fn):
+    if fn.endswith('.npz'):
+        with numpy.load(fn) as data:
+            return {k:data[k] for k in data.files}
+    with open(fn, newline='') as f:
+        rows = list(csv.DictReader(f))
+    scores = {}
+    for key in CSV_FIELDS[1:]:
+        dtype = numpy.int64 if key in ('match', 'test', 'gold') else numpy.float64
+        scores[key] = numpy.array([r[key] for r in rows], dtype=dtype)
+    return scores
+
+
+# Return a list of (index, f_score) for the num graphs with the lowest f_score
+def get_worst_graphs(fn, num=10):
+    f_scores = load_graph_scores(fn)['f_score']
+    num = min(num, len(f_scores))
+    if num <= 0:
+        return []
+    worst = numpy.argpartition(f_scores, num - 1)[:num]
+    worst = worst[numpy.argsort(f_scores[worst], kind='stable')]
+    return [(int(i), float(f_scores[i])) for i in worst]
+
+
+###############################################################################
+#### Writers for the per-graph scores
+###############################################################################
+
+class CSVScoreWriter(object):
+    def __init__(self, fn):
+        self.f      = open(fn, 'w', newline='')
+        self.writer = csv.writer(self.f)
+        self.writer.writerow(CSV_FIELDS)
+        self.count  = 0
+
+    def write(self, counts):
+        for (match, test, gold) in counts:
+            precision, recall, f_score = smatch.compute_f(match, test, gold)
+            self.writer.writerow([self.count, match, test, gold,
+                                  '%.6f' % precision, '%.6f' % recall, '%.6f' % f_score])
+            self.count += 1
+
+    def close(self):
+        self.f.close()
+
+
+class NPZScoreWriter(object):
+    def __init__(self, fn):
+        self.fn     = fn
+        self.chunks = []
+        self.count  = 0
+
+    def write(self, counts):
+        self.chunks.append(numpy.array(counts, dtype=numpy.int32).reshape(-1, 3))
+        self.count += len(counts)
+
+    def close(self):
+        counts = numpy.concatenate(self.chunks) if self.chunks else numpy.zeros((0, 3), dtype=numpy.int32)
+        match, test, gold = counts[:, 0], counts[:, 1], counts[:, 2]
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            precision = numpy.where(test > 0, match / test, 0.0)
+            recall    = numpy.where(gold > 0, match / gold, 0.0)
+            f_score   = numpy.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+        # Same as smatch.compute_f, if either graph is empty all scores are 0
+        empty = (test == 0) | (gold == 0)
+        precision[empty] = recall[empty] = f_score[empty] = 0.0
+        numpy.savez_compressed(self.fn, match=match, test=test, gold=gold,
+                               precision=precision, recall=recall, f_score=f_score)
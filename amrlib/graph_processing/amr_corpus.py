@@ -0,0 +1,185 @@
+import os
+import re
+import mmap
+import hashlib
+import logging
+import numpy
+
+logger = logging.getLogger(__name__)
+
+
+###################################################################################################
+# Random access to the entries in a large AMR file
+#
+# build_amr_index() scans the file once and saves a sidecar index (fname + '.index.npz') with the
+# byte offset and length of every entry and hashes of the "::id" and "::snt" metadata.
+# AMRCorpus memory-maps the file and uses the index to read single entries, slices, entries by id
+# or shards (contiguous ranges with about the same number of bytes) without loading the whole file.
+# Entries are the same strings returned by load_amr_entries().  Compressed files aren't supported.
+#
+# Example:
+#   with AMRCorpus('test.txt') as corpus:
+#       entry   = corpus[125]
+#       entry   = corpus.get_by_id('bolt12_07_4800.1')
+#       entries = corpus[10:20]
+#       for entry in corpus.iter_shard(worker_idx, num_workers):
+#           ...
+###################################################################################################
+
+INDEX_EXT  = '.index.npz'
+SEP_RE     = re.compile(rb'\r?\n(?:\r?\n)+')        # one or more empty lines
+ID_RE      = re.compile(r'^# ::id\s+(\S+)', re.MULTILINE)
+SNT_RE     = re.compile(r'^# ::snt\s(.*)$', re.MULTILINE)
+
+
+class AMRCorpus(object):
+    def __init__(self, fname, index_fn=None):
+        self.fname    = fname
+        self.index_fn = index_fn if index_fn is not None else fname + INDEX_EXT
+        index = load_amr_index(fname, self.index_fn)
+        if index is None:
+            index = build_amr_index(fname, self.index_fn)
+        self.offsets    = index['offsets']
+        self.lengths    = index['lengths']
+        self.id_hashes  = index['id_hashes']
+        self.snt_hashes = index['snt_hashes']
+        self.f  = open(fname, 'rb')
+        self.mm = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(fname) else b''
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self.get_entry(i) for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError('AMRCorpus index %d out of range' % idx)
+        return self.get_entry(idx)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.get_entry(i)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if isinstance(self.mm, mmap.mmap):
+            self.mm.close()
+        self.f.close()
+
+    def get_entry(self, idx):
+        start = int(self.offsets[idx])
+        return clean_entry(self.mm[start:start + int(self.lengths[idx])].decode('utf-8'))
+
+    # Return the entry with the given ::id or raise KeyError
+    def get_by_id(self, amr_id):
+        for idx in numpy.flatnonzero(self.id_hashes == get_hash(amr_id)):
+            entry = self.get_entry(idx)
+            if get_amr_id(entry) == amr_id:     # check for hash collisions
+                return entry
+        raise KeyError(amr_id)
+
+    # Return the indexes of the entries with the given ::snt
+    def find_sentence(self, sent):
+        sent = sent.strip()
+        return [int(i) for i in numpy.flatnonzero(self.snt_hashes == get_hash(sent))
+                if get_amr_sent(self.get_entry(i)) == sent]
+
+    # Split the corpus into num_shards contiguous (start, end) index ranges with about the same
+    # number of bytes in each
+    def get_shard_range(self, shard_idx, num_shards):
+        if not 0 <= shard_idx < num_shards:
+            raise ValueError('shard_idx %d out of range for %d shards' % (shard_idx, num_shards))
+        if len(self) == 0:
+            return 0, 0
+        ends   = self.offsets + self.lengths
+        bounds = numpy.linspace(0, ends[-1], num_shards + 1)
+        start  = int(numpy.searchsorted(ends, bounds[shard_idx], side='right')) if shard_idx else 0
+        end    = int(numpy.searchsorted(ends, bounds[shard_idx+1], side='right')) \
+                 if shard_idx < num_shards - 1 else len(self)
+        return start, end
+
+    def iter_shard(self, shard_idx, num_shards):
+        start, end = self.get_shard_range(shard_idx, num_shards)
+        for i in range(start, end):
+            yield self.get_entry(i)
+
+
+# Scan the file and save the index.  Returns the index as a dictionary of numpy arrays.
+def build_amr_index(fname, index_fn=None):
+    index_fn = index_fn if index_fn is not None else fname + INDEX_EXT
+    offsets, lengths, id_hashes, snt_hashes = [], [], [], []
+    with open(fname, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(fname) else b''
+        try:
+            start = 0
+            for match in SEP_RE.finditer(data):
+                add_block(data, start, match.start(), offsets, lengths, id_hashes, snt_hashes)
+                start = match.end()
+            add_block(data, start, len(data), offsets, lengths, id_hashes, snt_hashes)
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+    stat  = os.stat(fname)
+    index = {'offsets':numpy.array(offsets, dtype=numpy.int64),
+             'lengths':numpy.array(lengths, dtype=numpy.int64),
+             'id_hashes':numpy.array(id_hashes, dtype=numpy.uint64),
+             'snt_hashes':numpy.array(snt_hashes, dtype=numpy.uint64),
+             'file_size':numpy.int64(stat.st_size), 'file_mtime':numpy.int64(stat.st_mtime_ns)}
+    with open(index_fn, 'wb') as f:
+        numpy.savez(f, **index)
+    logger.info('Wrote index for %d entries to %s' % (len(offsets), index_fn))
+    return index
+
+# Load the index, returning None if it doesn't exist or the AMR file has changed since it was built
+def load_amr_index(fname, index_fn=None):
+    index_fn = index_fn if index_fn is not None else fname + INDEX_EXT
+    if not os.path.exists(index_fn):
+        return None
+    with numpy.load(index_fn) as data:
+        index = {k:data[k] for k in data.files}
+    stat = os.stat(fname)
+    if int(index['file_size']) != stat.st_size or int(index['file_mtime']) != stat.st_mtime_ns:
+        logger.info('%s has changed since %s was built' % (fname, index_fn))
+        return None
+    return index
+
+
+###############################################################################
+#### Helper functions
+###############################################################################
+
+# Add the block of bytes data[start:end] to the index lists if it has an entry in it
+def add_block(data, start, end, offsets, lengths, id_hashes, snt_hashes):
+    entry = clean_entry(data[start:end].decode('utf-8'))
+    if not entry:
+        return
+    offsets.append(start)
+    lengths.append(end - start)
+    amr_id = get_amr_id(entry)
+    sent   = get_amr_sent(entry)
+    id_hashes.append(get_hash(amr_id) if amr_id is not None else 0)
+    snt_hashes.append(get_hash(sent) if sent is not None else 0)
+
+# Strip off non-amr header info and leading / trailing white-space, the same as load_amr_entries()
+def clean_entry(text):
+    lines = [l for l in text.splitlines() if not (l.startswith('#') and not l.startswith('# ::'))]
+    return '\n'.join(lines).strip()
+
+def get_amr_id(entry):
+    match = ID_RE.search(entry)
+    return match.group(1) if match else None
+
+def get_amr_sent(entry):
+    match = SNT_RE.search(entry)
+    return match.group(1).strip() if match else None
+
+# 64 bit hash that's the same in every process (python's hash() is randomized)
+def get_hash(string):
+    return int.from_bytes(hashlib.blake2b(string.encode('utf-8'), digest_size=8).digest(), 'little')
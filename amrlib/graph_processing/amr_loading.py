@@ -1,25 +1,113 @@
 import re
+import io
+import bz2
 import gzip
+import lzma
+from   itertools import islice
+from   multiprocessing import Pool
+
+CHUNK_SIZE = 1 << 20    # characters read at a time by iter_amr_entries
 
 
 # Loading AMR entries with this code is faster than using penman.load() and this was progress
 # can be show when processing them.
 def load_amr_entries(fname, strip_comments=True):
+    return list(iter_amr_entries(fname, strip_comments))
+
+
+# Generator version of load_amr_entries that reads the file in chunks and yields each entry as soon
+# as it's complete, so the whole file is never in memory.  Files ending in .gz, .bz2 or .xz are
+# decompressed as they're read.
+# Entries are separated by empty lines and are stripped of leading / trailing white-space.
+# If strip_comments is True, non-amr header info (see start of Little Prince corpus), ie.. lines
+# starting with "#" but not "# ::", are removed.
+def iter_amr_entries(fname, strip_comments=True):
+    with open_amr_file(fname) as f:
+        lines = []
+        for line in iter_lines(f, strip_comments):
+            if line:
+                if not (strip_comments and line.startswith('#') and not line.startswith('# ::')):
+                    lines.append(line)
+                continue
+            entry = '\n'.join(lines).strip()
+            lines = []
+            if entry:
+                yield entry
+        entry = '\n'.join(lines).strip()
+        if entry:
+            yield entry
+
+
+# Write the graph strings to an open file, in the same format as penman.dump() (a blank line between
+# entries and a line-feed at the end).  Returns the number of entries written.
+def write_amr_entries(f, gstrings):
+    count = 0
+    for gstring in gstrings:
+        f.write(('\n' if count else '') + gstring + '\n')
+        count += 1
+    return count
+
+
+# Map func over the items and yield the results in order, using a process pool if processes > 1.
+# Pool.imap reads its whole input up front so the items are given to it batch_size at a time, which
+# lets large files be streamed through the pool.  initializer(*initargs) is run in each worker (or
+# once in this process if processes <= 1).
+def imap_batches(func, items, processes=1, batch_size=1000, initializer=None, initargs=()):
+    if processes <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        yield from map(func, items)
+        return
+    items = iter(items)
+    pool  = Pool(processes, initializer=initializer, initargs=initargs)
+    try:
+        while True:
+            batch = list(islice(items, batch_size))
+            if not batch:
+                break
+            yield from pool.imap(func, batch, chunksize=max(1, len(batch)//(4*processes)))
+    finally:
+        pool.close()
+        pool.join()
+
+
+# Open a plain or compressed AMR file for reading text
+# Compressed files are decoded without newline translation, the same as bytes.decode()
+def open_amr_file(fname):
     if fname.endswith('.gz'):
-        with gzip.open(fname, 'rb') as f:
-            data = f.read().decode()
+        return io.TextIOWrapper(gzip.open(fname, 'rb'), encoding='utf-8', newline='')
+    elif fname.endswith('.bz2'):
+        return io.TextIOWrapper(bz2.open(fname, 'rb'), encoding='utf-8', newline='')
+    elif fname.endswith('.xz'):
+        return io.TextIOWrapper(lzma.open(fname, 'rb'), encoding='utf-8', newline='')
     else:
-        with open(fname) as f:
-            data = f.read()
-    # Strip off non-amr header info (see start of Little Prince corpus)
-    if strip_comments:
-        lines = [l for l in data.splitlines() if not (l.startswith('#') and not \
-                 l.startswith('# ::'))]
-        data = '\n'.join(lines)
-    entries = data.split('\n\n')            # split via standard amr
-    entries = [e.strip() for e in entries]  # clean-up line-feeds, spaces, etc
-    entries = [e for e in entries if e]     # remove any empty entries
-    return entries
+        return open(fname)
+
+
+# Read the file in chunks and yield the lines, without line-feeds.  If use_splitlines is True,
+# lines are split the same as str.splitlines() (which also splits on \r, form-feeds, etc..),
+# otherwise they're only split on "\n".
+def iter_lines(f, use_splitlines):
+    carry = ''
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        data = carry + chunk
+        if use_splitlines:
+            parts = data.splitlines(True)
+            # keep the last line for the next chunk if it's incomplete or might be the start of "\r\n"
+            carry = parts.pop() if parts[-1].endswith('\r') or parts[-1].splitlines()[0] == parts[-1] else ''
+            for part in parts:
+                yield part.splitlines()[0]
+        else:
+            parts = data.split('\n')
+            carry = parts.pop()
+            yield from parts
+    if use_splitlines:
+        yield from carry.splitlines()
+    elif carry:
+        yield carry
 
 
 # Split the entry into graph lines and metadata lines
@@ -44,9 +132,7 @@ def split_amr_meta(entry):
 # sent and graph are both a list, string for each entry in the file
 def load_amr_graph_sent(fpath):
     entries = {'sent':[], 'graph':[]}
-    with open(fpath) as f:
-        data = f.read()
-    for entry in data.split('\n\n'):
+    for entry in iter_amr_entries(fpath, strip_comments=False):
         sent     = None
         gstrings = []
         for line in entry.splitlines():
@@ -1,3 +1,6 @@
+import os
+import re
+from   multiprocessing import Pool
 from   unidecode import unidecode
 
 
@@ -18,6 +21,40 @@ def load_raw_amr(fname):
     return entries
 
 
+# Load the raw files and write all the entries to out_fn, in the order of fpaths
+# Files are loaded with a process pool if processes > 1 and the entries are written as each file is
+# completed.  Returns the number of entries written.
+def collate_raw_amr(fpaths, out_fn, processes=1):
+    count = 0
+    pool  = Pool(processes) if processes > 1 else None
+    try:
+        results = pool.imap(load_raw_amr, fpaths) if pool is not None else map(load_raw_amr, fpaths)
+        with open(out_fn, 'w') as f:
+            for entries in results:
+                for entry in entries:
+                    f.write('%s\n\n' % entry)
+                count += len(entries)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return count
+
+
+# Collate the LDC2020T02 split directories (ie.. amr_annotation_3.0/data/amrs/split) into one file
+# for each of dev, test and train.  Returns a dictionary of the output filename to number of entries.
+def collate_ldc_splits(base_dir, out_dir, processes=1):
+    os.makedirs(out_dir, exist_ok=True)
+    counts = {}
+    for dirname in ('dev', 'test', 'training'):
+        dn = os.path.join(base_dir, dirname)
+        fpaths = [os.path.join(dn, fn) for fn in os.listdir(dn)]
+        fn = 'train.txt' if dirname == 'training' else dirname + '.txt'
+        out_path = os.path.join(out_dir, fn)
+        counts[out_path] = collate_raw_amr(fpaths, out_path, processes)
+    return counts
+
+
 # From https://stackoverflow.com/questions/6609895/efficiently-replace-bad-characters
 convert_dict = {
     b'\xc2\x82' : b',',        # High code comma
@@ -43,9 +80,11 @@ convert_dict = {
     b'\xcc\xa8' : b'',         # modifier - under curve
     b'\xcc\xb1' : b''          # modifier - under line
 }
+convert_re = re.compile(b'|'.join(re.escape(code) for code in convert_dict))
+# All the codes are replaced in a single pass.  Since the replacements are ASCII this is the same
+# as calling raw_bytes.replace() for each code.
 def to_ascii(raw_bytes):
-    for code, repl in convert_dict.items():
-        raw_bytes = raw_bytes.replace(code, repl)
+    raw_bytes = convert_re.sub(lambda m: convert_dict[m.group(0)], raw_bytes)
     text = raw_bytes.decode('utf-8')
     text = unidecode(text)      # converts unicode to ASCII
     return text
@@ -2,7 +2,6 @@ import os
 import tempfile
 import penman
 from   penman.models.noop import NoOpModel
-from   graphviz import Digraph    # sudo apt install graphviz; pip3 install graphviz
 
 
 # render_fn is the temp file used for rendering
@@ -11,6 +10,7 @@ class AMRPlot(object):
     def __init__(self, render_fn=None, format='pdf'):
         if render_fn is None:
             render_fn = os.path.join(tempfile.gettempdir(), 'amr_graph.gv')
+        from graphviz import Digraph    # sudo apt install graphviz; pip3 install graphviz
         self.graph = Digraph('amr_graph', filename=render_fn, format=format)
         self.graph.attr(rankdir='LR', size='12,8') # rankdir=left-to-right, size=width,height in inches
         self.counter = 0
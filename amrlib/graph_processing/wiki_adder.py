@@ -1,9 +1,14 @@
 import json
+import time
+import threading
+from   concurrent.futures import ThreadPoolExecutor
 from   unidecode import unidecode
 import logging
 import requests
+from   requests.adapters import HTTPAdapter
 from   tqdm import tqdm
 import penman
+from   .amr_loading import iter_amr_entries, imap_batches, write_amr_entries
 
 logger = logging.getLogger(__name__)
 
@@ -27,13 +32,27 @@ logger = logging.getLogger(__name__)
 # is a good idea so that when re-run, the url doesn't need to be queried
 # url online  url="http://api.dbpedia-spotlight.org/en/annotate"
 # url local   url="http://localhost:2222/rest/annotate"
+# Server queries go through a pooled requests.Session.  Failed queries (connection errors, time-outs,
+# 429 and 5xx responses) are retried max_retries times, waiting backoff * 2^n seconds between tries.
+# With wikify_file(..., concurrent=True), all the distinct names in the file are looked up first, with
+# up to max_workers queries in flight at once, and then the graphs are annotated from the results.
+# cache_db is an optional WikiCache (see wiki_cache.py) which is checked after the json cache.  All
+# lookup results, including phrases with no wiki entry, are saved to it as they're found.
 class WikiAdder:
-    def __init__(self, url=None, cache_fn=None):
-        self.confidence = 0.5   # Spotlight query confidence requirement
-        self.url        = url
-        self.cache      = self.load_cache(cache_fn) if cache_fn is not None else {}
+    def __init__(self, url=None, cache_fn=None, max_workers=8, max_retries=2, backoff=0.5, timeout=60,
+                 cache_db=None):
+        self.confidence  = 0.5   # Spotlight query confidence requirement
+        self.url         = url
+        self.cache       = self.load_cache(cache_fn) if cache_fn is not None else {}
+        self.cache_db    = cache_db
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff     = backoff
+        self.timeout     = timeout
+        self.session     = None
+        self.lock        = threading.Lock()     # for stats updated from the query threads
         # For debug stats
-        self.cache_init_sz  = len(self.cache)
+        self.cache_init_sz  = len(self.cache) + (len(cache_db) if cache_db is not None else 0)
         self.wiki_lookups   = 0
         self.cache_hits     = 0
         self.server_queries = 0
@@ -55,33 +74,67 @@ class WikiAdder:
         return string[:-1]  # string final line-feed
 
     # Load a file, add wiki attribs and save it
-    def wikify_file(self, infn, outfn):
-        new_graphs = []
-        for graph in tqdm(penman.load(infn)):
-            new_graph = self.wikify_graph(graph)
-            new_graphs.append(new_graph)
-        penman.dump(new_graphs, outfn, indent=6)
+    # Entries are streamed from infn and the graphs are written to outfn in the same order.
+    # If concurrent is True, the distinct names in the file are looked up in parallel before the
+    # graphs are updated.  If processes > 1, the file is parsed and updated with a process pool, and
+    # the names are always looked up first.
+    def wikify_file(self, infn, outfn, concurrent=False, processes=1, batch_size=1000):
+        resolved, num_queried = None, 0
+        if concurrent or processes > 1:
+            phrases = set()
+            for names in imap_batches(get_entry_names, iter_amr_entries(infn), processes, batch_size):
+                phrases.update(names)
+            queries  = self.server_queries
+            resolved = self.resolve_phrases(phrases)
+            num_queried = self.server_queries - queries
+        entries = tqdm(iter_amr_entries(infn))
+        if processes > 1:
+            results = imap_batches(wikify_worker_entry, entries, processes, batch_size,
+                                   init_wikify_worker, (resolved,))
+        else:
+            results = ((self.wikify_entry(entry, resolved), 0, 0, 0) for entry in entries)
+        with open(outfn, 'w') as f:
+            write_amr_entries(f, self.add_worker_stats(results))
+        # wikify_graph counts every lookup from the resolved map as a cache hit but the first lookup
+        # of each queried phrase was a server query, the same as when looking up serially.
+        self.cache_hits -= num_queried
+
+    # Add the stats from the (gstring, lookups, hits, found) results and yield the graph strings
+    def add_worker_stats(self, results):
+        for gstring, lookups, hits, found in results:
+            self.wiki_lookups += lookups
+            self.cache_hits   += hits
+            self.wiki_found   += found
+            yield gstring
+
+    # Add wiki attributes to a graph string and return the re-encoded string
+    def wikify_entry(self, entry, resolved=None):
+        return penman.encode(self.wikify_graph(penman.decode(entry), resolved), indent=6)
 
     # Add a wiki attribute to all nodes with a :name edge and node
-    def wikify_graph(self, graph):
+    # resolved is an optional dictionary of name string to wiki values (or None) from resolve_phrases()
+    def wikify_graph(self, graph, resolved=None):
         gid = graph.metadata.get('id', '')
-        # Check for name attributes.  These shouldn't be present but might.
-        for name_attrib in [t for t in graph.attributes() if t.role == ':name']:
-            logger.warning('%s has :name attrib in graph %s' % (gid, name_attrib))
-        # Find all the name edges and loop through them
-        name_edges = [t for t in graph.edges() if t.role == ':name']
-        for name_edge in name_edges:
-            # Get the associated name string and the parent node to add :wiki to
-            name_attribs = [t.target for t in graph.attributes() if t.source == name_edge.target]
-            name_attribs = [a.replace('"', '') for a in name_attribs]
-            name_string  = ' '.join(name_attribs)
+        # Index the positions of the instance triples
+        instance_idxs = {}
+        for i, t in enumerate(graph.triples):
+            if t[1] == ':instance':
+                instance_idxs.setdefault(t[0], []).append(i)
+        inserts = {}    # index in the original graph.triples to the wiki triples to put before it
+        # Loop through the name edges
+        for name_edge, name_string in self.get_name_strings(graph):
             # This typically does not occur (only 1 instance in LDC2015E86),
             # however generated graphs may have more
             if not name_string:
                 logger.warning('%s No name assosiated with the edge %s' % (gid, str(name_edge)))
                 continue
             # Lookup the phrase in the spotlight data. .
-            wiki_val = self.get_spotlight_wiki_data(name_string)
+            if resolved is not None and name_string in resolved:
+                self.wiki_lookups += 1
+                self.cache_hits   += 1
+                wiki_val = resolved[name_string]
+            else:
+                wiki_val = self.get_spotlight_wiki_data(name_string)
             if wiki_val is not None:
                 wiki_val = '"' + wiki_val + '"'     # string attributes are quoted
                 self.wiki_found += 1
@@ -91,66 +144,140 @@ class WikiAdder:
             # Find the index of the parent in the graph.triples
             # The index technically doesn't matter but it may impact the print order
             parent_var = name_edge.source
-            parent_triples = [t for t in graph.triples if t[1] == ':instance' and t[0] == parent_var]
-            if len(parent_triples) != 1:
+            parent_idxs = instance_idxs.get(parent_var, [])
+            if len(parent_idxs) != 1:
+                parent_triples = [graph.triples[i] for i in parent_idxs]
                 logger.error('%s Graph lookup error for %s returned %s' % (gid, parent_var, parent_triples))
                 continue
-            index = graph.triples.index(parent_triples[0])
-            # Now add this to the graph just after the parent and add an empty epidata entry
+            # Add this to the graph just before the parent's instance and add an empty epidata entry
             triple = (parent_var, ':wiki', wiki_val)
-            graph.triples.insert(index, triple)
+            inserts.setdefault(parent_idxs[0], []).append(triple)
             graph.epidata[triple] = []
+        # Rebuild the triples list once instead of inserting into it for each wiki attribute
+        if inserts:
+            triples = []
+            for i, t in enumerate(graph.triples):
+                triples.extend(inserts.get(i, ()))
+                triples.append(t)
+            graph.triples[:] = triples
         return graph
 
+    # Return a list of (name_edge, name_string) for all the :name edges in the graph
+    @staticmethod
+    def get_name_strings(graph, warn=True):
+        attributes = graph.attributes()
+        # Check for name attributes.  These shouldn't be present but might.
+        if warn:
+            gid = graph.metadata.get('id', '')
+            for name_attrib in [t for t in attributes if t.role == ':name']:
+                logger.warning('%s has :name attrib in graph %s' % (gid, name_attrib))
+        # Index the attribute values by their source variable
+        attrib_vals = {}
+        for t in attributes:
+            attrib_vals.setdefault(t.source, []).append(t.target)
+        names = []
+        for name_edge in [t for t in graph.edges() if t.role == ':name']:
+            # Get the associated name string
+            name_attribs = [a.replace('"', '') for a in attrib_vals.get(name_edge.target, [])]
+            names.append( (name_edge, ' '.join(name_attribs)) )
+        return names
+
+    # Lookup a set of phrases, querying the server for those not in the cache with up to
+    # max_workers concurrent requests.  Found entries are added to the cache.
+    # Returns a dictionary of phrase to wiki value, or None if there's no entry.  Phrases that aren't
+    # in the cache when there's no url are left out.
+    # This doesn't update the lookup stats, these are counted for each name in wikify_graph().
+    def resolve_phrases(self, phrases):
+        resolved = {}
+        to_query = []
+        for phrase in phrases:
+            found, wiki = self.lookup_cache(phrase)
+            if found:
+                resolved[phrase] = wiki
+            elif self.url is not None:
+                to_query.append(phrase)
+        if to_query:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                results = executor.map(self.query_spotlight_wiki_server, to_query)
+                for phrase, wiki_pages in tqdm(zip(to_query, results), total=len(to_query)):
+                    wiki = self.select_wiki_page(phrase, wiki_pages)
+                    self.update_cache(phrase, wiki, wiki_pages is not None)
+                    resolved[phrase] = wiki
+        return resolved
+
+    # Return a tuple of (found, wiki), checking the json cache first, then the database
+    # wiki may be None for a negative entry in the database
+    def lookup_cache(self, phrase):
+        if phrase in self.cache:
+            return True, self.cache[phrase]
+        if self.cache_db is not None:
+            return self.cache_db.get(phrase)
+        return False, None
+
+    # Save the lookup result.  Negative results are only saved to the database, and only if the
+    # server query succeeded (valid is True).
+    def update_cache(self, phrase, wiki, valid=True):
+        if wiki is not None:
+            self.cache[phrase] = wiki
+        if self.cache_db is not None and (wiki is not None or valid):
+            self.cache_db.put(phrase, wiki)
+
     # Get the wikipedia entry.
     # First try the cache and and if that fails, try the URL server lookup if one is speficied.
     # In the case that there is more than 1 entry returned, use the one with the highest score.
     # This happens with longer phrases where multiple words can produce multiple dbpedia entries.
     def get_spotlight_wiki_data(self, phrase):
         self.wiki_lookups += 1
-        if phrase in self.cache:
+        found, wiki = self.lookup_cache(phrase)
+        if found:
             self.cache_hits += 1
-            return self.cache[phrase]
+            return wiki
         # Get the data from the URL and in if there are multiple, use the one with the highest score
         if self.url is not None:
             wiki_pages = self.query_spotlight_wiki_server(phrase)
-            if not wiki_pages:
-                return None
-            # Filter out pages where the "surfaceForm" (aka "text") doesn't exactly match
-            # Note that experimentally this appears to help the overall score but it also
-            # eliminates some good ones
-            # "George W. Bush" returns {'wiki': 'George_W._Bush', 'score': 0.9317, 'text': 'Bush'}
-            # "Nuclear Nonproliferation Treaty" = returns..
-            # {'wiki': 'Treaty_on_the_Non-Proliferation_of_Nuclear_Weapons', 'score': 1.0, 'text':
-            #  'Nonproliferation Treaty'}
-            wiki_pages = [p for p in wiki_pages if p['text'].lower() == phrase.lower()]
-            if not wiki_pages:
-                return None
-            # Always keep highest scoring page
-            wiki_pages = sorted(wiki_pages, key=lambda x:x['score'])
-            wiki       = wiki_pages[-1]['wiki']     # take last, sorted low to high
-            self.cache[phrase] = wiki
+            wiki       = self.select_wiki_page(phrase, wiki_pages)
+            self.update_cache(phrase, wiki, wiki_pages is not None)
             return wiki
         return None
 
+    # Pick the wiki entry from the pages returned by the server or return None
+    @staticmethod
+    def select_wiki_page(phrase, wiki_pages):
+        if not wiki_pages:
+            return None
+        # Filter out pages where the "surfaceForm" (aka "text") doesn't exactly match
+        # Note that experimentally this appears to help the overall score but it also
+        # eliminates some good ones
+        # "George W. Bush" returns {'wiki': 'George_W._Bush', 'score': 0.9317, 'text': 'Bush'}
+        # "Nuclear Nonproliferation Treaty" = returns..
+        # {'wiki': 'Treaty_on_the_Non-Proliferation_of_Nuclear_Weapons', 'score': 1.0, 'text':
+        #  'Nonproliferation Treaty'}
+        wiki_pages = [p for p in wiki_pages if p['text'].lower() == phrase.lower()]
+        if not wiki_pages:
+            return None
+        # Always keep highest scoring page
+        wiki_pages = sorted(wiki_pages, key=lambda x:x['score'])
+        wiki       = wiki_pages[-1]['wiki']     # take last, sorted low to high
+        return wiki
+
     # Query the server with a sentence string (or phrase)
-    # This returns a dictionary of every entry found with the sentence string (lowered)
-    # mapped to the wikipedia entry.  So this can be called with an entire sentence or simply a phrase.
+    # This returns a list of every entry found with the sentence string (lowered)
+    # mapped to the wikipedia entry, or None if the query failed.
+    # So this can be called with an entire sentence or simply a phrase.
     # Note that the server is case-sensative and proper nouns must be capitalized correctly.
     # For server status see https://status.dbpedia-spotlight.org/#
     def query_spotlight_wiki_server(self, text):
-        self.server_queries += 1
+        with self.lock:
+            self.server_queries += 1
         headers = {'accept': 'application/json'}
         data = {'text':text, 'confidence':self.confidence}
         try:
-            req = requests.post(self.url, data=data, headers=headers)
-            req.raise_for_status()
-            ret = req.content.decode('utf-8')
-            sdict = json.loads(ret)
+            sdict = self.post_with_retries(data, headers)
         except:
-            self.server_errors += 1
+            with self.lock:
+                self.server_errors += 1
             logger.error('Exception quering for: %s' % text)
-            return {}
+            return None
         # Form a list of the returned pages
         wiki_pages = []
         for res in sdict.get('Resources', []):
@@ -161,6 +288,39 @@ class WikiAdder:
             wiki_pages.append( {'wiki':wiki, 'score':score, 'text':text} )
         return wiki_pages
 
+    # Post the query, retrying connection errors, time-outs and 429 / 5xx responses with exponential
+    # backoff.  Raises the last exception if all the tries fail.
+    def post_with_retries(self, data, headers):
+        session = self.get_session()
+        for attempt in range(self.max_retries + 1):
+            try:
+                req = session.post(self.url, data=data, headers=headers, timeout=self.timeout)
+                req.raise_for_status()
+                return json.loads(req.content.decode('utf-8'))
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                status = getattr(e.response, 'status_code', None)
+                retry  = status is None or status == 429 or status >= 500
+                if not retry or attempt >= self.max_retries:
+                    raise
+                logger.debug('Retrying query after %s' % e)
+                time.sleep(self.backoff * 2**attempt)
+
+    # Create the requests session on first use with a connection pool large enough for max_workers
+    def get_session(self):
+        with self.lock:
+            if self.session is None:
+                self.session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+                self.session.mount('http://', adapter)
+                self.session.mount('https://', adapter)
+            return self.session
+
+    # Close the http connections
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
     # Get all sentences from an AMR file
     @staticmethod
     def get_sents_from_AMR(infn):
@@ -195,3 +355,24 @@ class WikiAdder:
         self.cache['U.S.A.']  = 'United_States'
         self.cache['America'] = 'United_States'
         self.cache['West']    = 'Western_world'
+
+
+###############################################################################
+#### Helper functions for multiprocessing
+###############################################################################
+
+# Get the set of name strings in a graph string
+def get_entry_names(entry):
+    return set(p for _, p in WikiAdder.get_name_strings(penman.decode(entry), warn=False) if p)
+
+def init_wikify_worker(resolved):
+    global worker_adder, worker_resolved
+    worker_adder    = WikiAdder()
+    worker_resolved = resolved
+
+# Returns the wikified graph string with the number of lookups, cache hits and wiki entries found
+def wikify_worker_entry(entry):
+    adder = worker_adder
+    lookups, hits, found = adder.wiki_lookups, adder.cache_hits, adder.wiki_found
+    gstring = adder.wikify_entry(entry, worker_resolved)
+    return gstring, adder.wiki_lookups - lookups, adder.cache_hits - hits, adder.wiki_found - found
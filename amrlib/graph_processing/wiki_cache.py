@@ -0,0 +1,77 @@
+import json
+import time
+import sqlite3
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Persistent cache of Spotlight lookups for WikiAdder, stored in an sqlite database
+# Unlike the json cache, phrases with no wiki entry are also saved (as negative entries, with a
+# wiki value of None) so they aren't queried again on later runs.
+# Every put() is written to the database immediately so there's no need to save the cache and
+# the database uses write-ahead logging so multiple processes can share it.
+# If ttl (or negative_ttl) is set, entries (or negative entries) older than this many seconds are
+# ignored and will be looked up again.
+# Example:
+#   cache = WikiCache('spotlight_wiki.db', negative_ttl=30*24*3600)
+#   cache.import_json('spotlight_wiki.json')
+#   wiki  = WikiAdder(url=url, cache_db=cache)
+class WikiCache(object):
+    def __init__(self, db_fn, ttl=None, negative_ttl=None, timeout=30):
+        self.db_fn        = db_fn
+        self.ttl          = ttl
+        self.negative_ttl = negative_ttl
+        self.lock         = threading.Lock()
+        self.conn = sqlite3.connect(db_fn, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS wiki (phrase TEXT PRIMARY KEY, wiki TEXT, updated REAL)')
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM wiki').fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    # Return a tuple of (found, wiki).  If found is True, wiki is the saved value, which is None for a
+    # negative entry.  Expired entries are not found.
+    def get(self, phrase):
+        with self.lock:
+            row = self.conn.execute('SELECT wiki, updated FROM wiki WHERE phrase=?', (phrase,)).fetchone()
+        if row is None:
+            return False, None
+        wiki, updated = row
+        ttl = self.ttl if wiki is not None else self.negative_ttl
+        if ttl is not None and time.time() - updated > ttl:
+            return False, None
+        return True, wiki
+
+    # Add or update an entry.  Use wiki=None for a phrase that has no wiki entry.
+    def put(self, phrase, wiki):
+        with self.lock:
+            self.conn.execute('INSERT OR REPLACE INTO wiki (phrase, wiki, updated) VALUES (?, ?, ?)',
+                              (phrase, wiki, time.time()))
+
+    # Add all the entries from a json cache file saved by WikiAdder.save_cache()
+    # Returns the number of entries imported
+    def import_json(self, json_fn):
+        with open(json_fn) as f:
+            cache = json.load(f)
+        now = time.time()
+        with self.lock:
+            with self.conn:
+                self.conn.execute('BEGIN')
+                self.conn.executemany('INSERT OR REPLACE INTO wiki (phrase, wiki, updated) VALUES (?, ?, ?)',
+                                      [(p, w, now) for p, w in cache.items()])
+        logger.info('%d entries imported from %s' % (len(cache), json_fn))
+        return len(cache)
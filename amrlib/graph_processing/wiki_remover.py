@@ -2,23 +2,22 @@ import os
 import logging
 from   tqdm import tqdm
 import penman
-from   .amr_loading import load_amr_entries
+from   .amr_loading import iter_amr_entries, imap_batches, write_amr_entries
 
 
 logger = logging.getLogger(__name__)
 
 
 # Remove all :wiki entries from a file
-def wiki_remove_file(indir, infn, outdir, outfn):
-    graphs = []
-    inpath = os.path.join(indir, infn)
-    entries = load_amr_entries(inpath)
-    for entry in tqdm(entries):
-        graph = _process_entry(entry)
-        graphs.append(graph)
+# Entries are streamed from the input and written to the output in the same order.  If processes > 1
+# they're processed with a pool, batch_size entries at a time.
+def wiki_remove_file(indir, infn, outdir, outfn, processes=1, batch_size=1000):
+    inpath  = os.path.join(indir, infn)
     outpath = os.path.join(outdir, outfn)
     print('Saving file to ', outpath)
-    penman.dump(graphs, outpath, indent=6)
+    entries = tqdm(iter_amr_entries(inpath))
+    with open(outpath, 'w') as f:
+        write_amr_entries(f, imap_batches(_process_entry_string, entries, processes, batch_size))
 
 
 # Remove all :wiki entries from an AMR string
@@ -26,6 +25,11 @@ def wiki_remove_graph(entry):
     return _process_entry(entry)
 
 
+# Remove the :wiki entries and return the re-encoded graph string.  Module level for multiprocessing.
+def _process_entry_string(entry):
+    return penman.encode(_process_entry(entry), indent=6)
+
+
 # Take in a single AMR string and return a penman graph
 def _process_entry(entry):
     pen = penman.decode(entry)
@@ -34,7 +38,7 @@ def _process_entry(entry):
     for t in triples:
         try:
             pen.triples.remove(t)
-            del pen.epidata[t]
+            pen.epidata.pop(t, None)    # duplicate triples only have one epidata entry
         except:
-            logger.error('Unable to remove triple: %s' % (t))
+            logger.error('Unable to remove triple: %s' % str(t))
     return pen
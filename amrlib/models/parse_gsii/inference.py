@@ -14,8 +14,6 @@ from   .utils import move_to_device
 from   .bert_utils import BertEncoderTokenizer, BertEncoder
 from   ..inference_bases import STOGInferenceBase
 from   ...graph_processing.amr_loading import load_amr_entries, split_amr_meta
-from   ...graph_processing.annotator import annotate_graph
-from   ...evaluate.smatch_enhanced import compute_smatch
 from   ...utils.config import Config
 
 
@@ -48,6 +46,7 @@ class Inference(STOGInferenceBase):
 
     # parse a list of sentences (strings)
     def parse_sents(self, sents, add_metadata=True):
+        from ...graph_processing.annotator import annotate_graph
         assert isinstance(sents, list)
         # Annotate the entry then compile it in a StringIO file-type object
         # For Simplicity, convert the sentences into an in-memory AMR text file
@@ -69,6 +68,7 @@ class Inference(STOGInferenceBase):
     # parse a list of spacy spans (ie.. span has list of tokens)
     # Duplicate of above code but SpaCy parsing is already done so don't do it again
     def parse_spans(self, spans, add_metadata=True):
+        from ...graph_processing.annotator import annotate_graph
         sio_f = io.StringIO()
         for i, span in enumerate(spans):
             sent   = span.text
@@ -108,7 +108,9 @@ class Inference(STOGInferenceBase):
 
     # Parse the AMR input file and then add the meta-data from here to the final output.
     # Compute smatch scores between the input_file and the generated graphs.
-    def reparse_annotated_file(self, indir, infn, outdir, outfn, print_summary=True):
+    # scorer is an optional SmatchScorer, to reuse its process pool across calls
+    def reparse_annotated_file(self, indir, infn, outdir, outfn, print_summary=True, scorer=None):
+        from ...evaluate.smatch_enhanced import compute_smatch
         # Load the test data and the model
         test_data_fn = os.path.join(indir, infn)
         output_fn    = os.path.join(outdir, outfn)
@@ -138,7 +140,7 @@ class Inference(STOGInferenceBase):
         pbar.close()
         # Compute smatch score
         try:
-            precision, recall, f_score = compute_smatch(test_entries, gold_entries)
+            precision, recall, f_score = compute_smatch(test_entries, gold_entries, scorer=scorer)
         except:
             logger.error('compute_smatch failed')
             f_score = 0
@@ -13,6 +13,8 @@ from   .vocabs import get_vocabs
 from   .utils import move_to_device
 from   .bert_utils import BertEncoderTokenizer, BertEncoder
 from   .inference import Inference
+from   ...evaluate.smatch_scorer import SmatchScorer
+from   ...evaluate.smatch_cache import SmatchCache
 
 
 # LR scheduler = lr_scale(1.0) * 1/sqrt(512) * min(1/sqrt(batchnum), (batchnum/warmup)*1/sqrt(warmup))
@@ -93,6 +95,9 @@ def run_training(args, ls):
     ls.print('Loading training data')
     train_data = DataLoader(vocabs, args.train_data, args.train_batch_size, for_train=True)
     train_data.set_unk_rate(args.unk_rate)
+    # Smatch scoring pool, kept for all the evaluations.  Pairs that don't change between
+    # evaluations are taken from the cache instead of being re-scored.
+    scorer = SmatchScorer(cache=SmatchCache(os.path.join(args.model_dir, 'dev_smatch_cache.json')))
     # Train
     ls.print('Training')
     epoch, loss_avg, concept_loss_avg, arc_loss_avg, rel_loss_avg = 0, 0, 0, 0, 0
@@ -136,12 +141,13 @@ def run_training(args, ls):
                 out_fn = 'epoch%d.pt.dev_generated' % (epoch)
                 inference = Inference.build_from_model(model, vocabs)
                 f_score, ctr = inference.reparse_annotated_file('.', args.dev_data, args.model_dir, out_fn,
-                        print_summary=False)
+                        print_summary=False, scorer=scorer)
                 ls.print('Smatch F: %.3f.  Wrote %d AMR graphs to %s' % \
                         (f_score, ctr, os.path.join(args.model_dir, out_fn)))
             except:
                 ls.print('Exception during generation')
                 traceback.print_exc()
             model.train()
+    scorer.close()
     # End time-stamp
     ls.print('Training finished: ' + datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
@@ -1,5 +1,6 @@
 #!/usr/bin/python3
 import setup_run_dir    # this import tricks script to run from 2 levels up
+import os
 from   amrlib.graph_processing.wiki_remover import wiki_remove_file
 from   amrlib.utils.logging import silence_penman
 
@@ -12,4 +13,4 @@ if __name__ == '__main__':
 
     # run the pipeline
     for fn in ('test.txt.features', 'dev.txt.features', 'train.txt.features'):
-        wiki_remove_file(data_dir, fn, data_dir, fn + '.nowiki')
+        wiki_remove_file(data_dir, fn, data_dir, fn + '.nowiki', processes=os.cpu_count())
@@ -15,7 +15,7 @@ if __name__ == '__main__':
 
     wiki = WikiAdder(url=url, cache_fn=cache_fn)
     print('Wikifing', infn)
-    wiki.wikify_file(infn, outfn)
+    wiki.wikify_file(infn, outfn, concurrent=True)
     print('Data written to', outfn)
     wiki.save_cache(cache_fn)
     print('cache saved to', cache_fn)
@@ -6,8 +6,6 @@ import json
 from   multiprocessing import Pool
 from   functools import partial
 import spacy
-import penman
-from   penman.models.noop import NoOpModel
 from   amrlib.utils.logging import setup_logging, silence_penman, WARN
 from   amrlib.graph_processing.amr_loading import load_amr_entries
 from   amrlib.graph_processing.annotator import load_spacy, add_lemmas
@@ -43,16 +41,10 @@ if __name__ == '__main__':
                 graphs.append(graph)
     print('%d graphs left with the same tokenization length' % len(graphs))
 
-    # Run the aligner
-    print('Aligning Graphs')
-    new_graphs = []
+    # Run the aligner and save the graphs
+    print('Aligning Graphs and saving to', out_fname)
     keep_keys = ('id', 'snt', 'tokens', 'lemmas', 'rbw_alignments')
-    for graph in graphs:
-        aligner = RBWAligner.from_penman_w_json(graph, align_str_name='rbw_alignments')
-        pgraph = aligner.get_penman_graph()
-        pgraph.metadata = {k:v for k, v in pgraph.metadata.items() if k in keep_keys}
-        new_graphs.append( pgraph )
-
-    # Save the graphs
-    print('Saving to', out_fname)
-    penman.dump(new_graphs, out_fname, model=NoOpModel(), indent=6)
+    num_written, num_failed, hit_rate = RBWAligner.align_corpus(graphs, out_fname, keep_keys=keep_keys,
+                                                                align_str_name='rbw_alignments')
+    print('Wrote %d graphs.  %d failed to align.' % (num_written, num_failed))
+    print('Match candidate cache hit rate: %.1f%%' % (100.*hit_rate))
@@ -1,7 +1,7 @@
 #!/usr/bin/python3
 import setup_run_dir    # this import tricks script to run from 2 levels up
 import os
-from   amrlib.alignments.faa_aligner.preprocess import preprocess_train
+from   amrlib.alignments.faa_aligner.preprocess import preprocess_train_to_dir
 
 
 if __name__ == '__main__':
@@ -10,15 +10,10 @@ if __name__ == '__main__':
     amr_fn      = os.path.join(working_dir, 'gstrings.txt')
 
     print('Reading and writing data in', working_dir)
-    # Read in the english sentences and linearized AMR lines
-    with open(eng_fn) as f:
-        eng_lines = [l.strip().lower() for l in f]
-    with open(amr_fn) as f:
-        amr_lines = [l.strip().lower() for l in f]
-
-    # Proprocess the data
-    data = preprocess_train(eng_lines, amr_lines)
-
-    # Save the preprocess data and the model input file, the input data
-    # already in the working directory
-    data.save(working_dir, save_input_data=False)
+    # Preprocess the english sentences and linearized AMR lines, a chunk at a time, and save the
+    # preprocess data and the model input file.  The input data is already in the working directory.
+    with open(eng_fn) as f_eng, open(amr_fn) as f_amr:
+        eng_lines = (l.strip().lower() for l in f_eng)
+        amr_lines = (l.strip().lower() for l in f_amr)
+        count = preprocess_train_to_dir(eng_lines, amr_lines, working_dir, processes=os.cpu_count())
+    print('Preprocessed %d lines' % count)
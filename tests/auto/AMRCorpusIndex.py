@@ -0,0 +1,77 @@
+#!/usr/bin/python3
+import sys
+sys.path.insert(0, '../..')    # make '..' first in the lib search path
+import os
+import shutil
+import logging
+import tempfile
+import unittest
+from   amrlib.graph_processing.amr_corpus import AMRCorpus
+from   amrlib.graph_processing.amr_loading import load_amr_entries
+
+
+amr_text = '''# AMR release; corpus: little prince; section: dev; number of AMRs: 2
+
+# ::id lpp_1943.1
+# ::snt Chapter 1
+(c / chapter
+  :mod 1)
+
+
+# ::id lpp_1943.2
+# not a metadata line
+# ::snt Once when I was six years old I saw a magnificent picture .
+(s / see-01
+      :ARG0 (i / i)
+      :ARG1 (p / picture))
+
+# ::id lpp_1943.3
+# ::snt It was a picture of a boa constrictor .
+(p / picture
+      :topic (b / boa))
+'''
+
+
+class AMRCorpusIndex(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.fn = os.path.join(self.tmp_dir, 'amr.txt')
+        with open(self.fn, 'w') as f:
+            f.write(amr_text)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def testAccess(self):
+        expected = load_amr_entries(self.fn)
+        with AMRCorpus(self.fn) as corpus:
+            self.assertTrue(os.path.exists(self.fn + '.index.npz'))
+            self.assertEqual(list(corpus), expected)
+            self.assertEqual(corpus[-1], expected[-1])
+            self.assertEqual(corpus[1:], expected[1:])
+            self.assertEqual(corpus.get_by_id('lpp_1943.2'), expected[1])
+            self.assertRaises(KeyError, corpus.get_by_id, 'lpp_1943.4')
+            self.assertEqual(corpus.find_sentence('Chapter 1'), [0])
+            shards = [list(corpus.iter_shard(i, 2)) for i in range(2)]
+            self.assertEqual(shards[0] + shards[1], expected)
+
+    # Changing the file should rebuild the index
+    def testStaleIndex(self):
+        AMRCorpus(self.fn).close()
+        with open(self.fn, 'a') as f:
+            f.write('\n# ::id extra.1\n(e / extra)\n')
+        with AMRCorpus(self.fn) as corpus:
+            self.assertEqual(len(corpus), 4)
+            self.assertEqual(corpus.get_by_id('extra.1'), '# ::id extra.1\n(e / extra)')
+
+
+if __name__ == '__main__':
+    level  = logging.WARNING
+    format = '[%(levelname)s %(filename)s ln=%(lineno)s] %(message)s'
+    logging.basicConfig(level=level, format=format)
+
+    # run all methods that start with 'test'
+    unittest.main()
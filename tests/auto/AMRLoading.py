@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+import sys
+sys.path.insert(0, '../..')    # make '..' first in the lib search path
+import os
+import bz2
+import gzip
+import lzma
+import shutil
+import logging
+import tempfile
+import unittest
+from   amrlib.graph_processing import amr_loading
+from   amrlib.graph_processing.amr_loading import load_amr_entries, iter_amr_entries
+
+
+amr_text = '''# AMR release; corpus: little prince; section: dev; number of AMRs: 2
+# generated on Sat Jan 1
+
+
+# ::id lpp_1943.1
+# ::snt Chapter 1
+(c / chapter
+  :mod 1)
+
+
+# ::id lpp_1943.2
+# not a metadata line
+# ::snt Once when I was six years old I saw a magnificent picture .
+(s / see-01
+      :ARG0 (i / i)
+      :ARG1 (p / picture))
+'''
+
+
+class AMRLoading(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    def testCompressed(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            fn = os.path.join(tmp_dir, 'amr.txt')
+            with open(fn, 'w') as f:
+                f.write(amr_text)
+            expected = load_amr_entries(fn)
+            self.assertEqual(len(expected), 2)
+            self.assertEqual(expected[1].splitlines()[:2], ['# ::id lpp_1943.2', '# ::snt Once when I ' \
+                             'was six years old I saw a magnificent picture .'])
+            self.assertEqual(len(load_amr_entries(fn, strip_comments=False)), 3)
+            for ext, opener in (('.gz', gzip.open), ('.bz2', bz2.open), ('.xz', lzma.open)):
+                with opener(fn + ext, 'wt') as f:
+                    f.write(amr_text)
+                self.assertEqual(load_amr_entries(fn + ext), expected)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    # Entries that span the read chunks should be the same
+    def testChunks(self):
+        tmp_dir = tempfile.mkdtemp()
+        chunk_size = amr_loading.CHUNK_SIZE
+        try:
+            fn = os.path.join(tmp_dir, 'amr.txt')
+            with open(fn, 'w') as f:
+                f.write(amr_text * 3)
+            expected = load_amr_entries(fn)
+            amr_loading.CHUNK_SIZE = 7
+            self.assertEqual(list(iter_amr_entries(fn)), expected)
+        finally:
+            amr_loading.CHUNK_SIZE = chunk_size
+            shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    level  = logging.WARNING
+    format = '[%(levelname)s %(filename)s ln=%(lineno)s] %(message)s'
+    logging.basicConfig(level=level, format=format)
+
+    # run all methods that start with 'test'
+    unittest.main()
@@ -0,0 +1,62 @@
+#!/usr/bin/python3
+import sys
+sys.path.insert(0, '../..')    # make '..' first in the lib search path
+import os
+import shutil
+import logging
+import tempfile
+import unittest
+from   unidecode import unidecode
+from   amrlib.graph_processing.amr_loading_raw import to_ascii, convert_dict, load_raw_amr, collate_raw_amr
+
+
+amr_bytes = '''# AMR release (generated on Fri Jan 1); corpus: test; number of AMRs: 2
+
+# ::id test_1.1
+# ::snt \x93Caf\xe9\x94 \xbd price \x97 \xabnow\xbb
+(c / cafe)
+
+# ::id test_1.2
+# ::snt Na̱meʿs
+(n / name)
+'''.encode('utf-8')
+
+
+class AMRLoadingRaw(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    # The single pass replacement should be the same as replacing each code in turn
+    def testToASCII(self):
+        expected = amr_bytes
+        for code, repl in convert_dict.items():
+            expected = expected.replace(code, repl)
+        self.assertEqual(to_ascii(amr_bytes), unidecode(expected.decode('utf-8')))
+        self.assertIn('# ::snt "Cafe" 1/2 price -- <<now>>', to_ascii(amr_bytes))
+        self.assertIn("# ::snt Name's", to_ascii(amr_bytes))
+
+    def testCollate(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            fpaths = []
+            for i in range(3):
+                fpaths.append(os.path.join(tmp_dir, 'amr_%d.txt' % i))
+                with open(fpaths[-1], 'wb') as f:
+                    f.write(amr_bytes.replace(b'test_1', b'test_%d' % i))
+            expected = ''.join('%s\n\n' % e for fpath in fpaths for e in load_raw_amr(fpath))
+            for processes in (1, 2):
+                out_fn = os.path.join(tmp_dir, 'out.txt')
+                self.assertEqual(collate_raw_amr(fpaths, out_fn, processes), 6)
+                with open(out_fn) as f:
+                    self.assertEqual(f.read(), expected)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    level  = logging.WARNING
+    format = '[%(levelname)s %(filename)s ln=%(lineno)s] %(message)s'
+    logging.basicConfig(level=level, format=format)
+
+    # run all methods that start with 'test'
+    unittest.main()
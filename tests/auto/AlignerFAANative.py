@@ -0,0 +1,71 @@
+#!/usr/bin/python3
+import sys
+sys.path.insert(0, '../..')    # make '..' first in the lib search path
+import os
+import math
+import random
+import shutil
+import logging
+import tempfile
+import unittest
+from   amrlib.alignments.faa_aligner.fa_native import IBM2Model, grow_diag_final_and
+
+
+# Scalar version of fast_align's force-align loop (diagonal favoring, with the null word)
+def ref_align(t, src, trg, p_null, tension):
+    def unnorm(i, j, m, n):
+        return math.exp(-abs(j / n - i / m) * tension)
+    n, m  = len(src), len(trg)
+    links = []
+    for j in range(m):
+        max_pat = t.get(('<eps>', trg[j]), 1e-9) * p_null
+        a_j = 0
+        az  = sum(unnorm(j + 1, i, m, n) for i in range(1, n + 1)) / (1.0 - p_null)
+        for i in range(1, n + 1):
+            pat = t.get((src[i-1], trg[j]), 1e-9) * (unnorm(j + 1, i, m, n) / az)
+            if pat > max_pat:
+                max_pat, a_j = pat, i
+        if a_j > 0:
+            links.append((a_j - 1, j))
+    return links
+
+
+class AlignerFAANative(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    def testIBM2(self):
+        rng   = random.Random(0)
+        src_w = ['<eps>'] + ['s%d' % i for i in range(20)]
+        trg_w = ['t%d' % i for i in range(20)]
+        t = {(s, w):rng.uniform(0.001, 0.5) for s in src_w for w in trg_w if rng.random() < 0.3}
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            fn = os.path.join(tmp_dir, 'params')
+            with open(fn, 'w') as f:
+                for (s, w), p in t.items():
+                    f.write('%s\t%s\t%f\n' % (s, w, math.log(p)))
+            model = IBM2Model(fn, 0.16, 3.0)
+        finally:
+            shutil.rmtree(tmp_dir)
+        t = {k:math.exp(float('%f' % math.log(p))) for k, p in t.items()}   # same precision as the file
+        # include unknown words and empty sentences
+        src_sents = [[rng.choice(src_w[1:] + ['unk']) for _ in range(rng.randint(0, 15))] for _ in range(200)]
+        trg_sents = [[rng.choice(trg_w + ['unk']) for _ in range(rng.randint(1, 15))] for _ in range(200)]
+        links = model.align(src_sents, trg_sents)
+        for src, trg, sent_links in zip(src_sents, trg_sents, links):
+            self.assertEqual(sent_links, ref_align(t, src, trg, 0.16, 3.0))
+
+    def testGrowDiagFinalAnd(self):
+        fwd = [(0, 0), (1, 1), (2, 1), (4, 3)]
+        rev = [(0, 0), (1, 1), (1, 2), (3, 4), (5, 5)]
+        self.assertEqual(grow_diag_final_and(fwd, rev), [(0, 0), (1, 1), (1, 2), (2, 1), (3, 4), (4, 3), (5, 5)])
+
+
+if __name__ == '__main__':
+    level  = logging.WARNING
+    format = '[%(levelname)s %(filename)s ln=%(lineno)s] %(message)s'
+    logging.basicConfig(level=level, format=format)
+
+    # run all methods that start with 'test'
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/python3
+import sys
+sys.path.insert(0, '../..')    # make '..' first in the lib search path
+import os
+import json
+import stat
+import shutil
+import logging
+import tempfile
+import unittest
+from   amrlib.alignments.faa_aligner.faa_aligner import TrainedAligner
+
+
+# Stub for fast_align that speaks the same line protocol.  Aligns each word to the same position
+# (reversed for -r) and outputs   f words ||| e words ||| links ||| score
+stub_fast_align = '''#!%s
+import sys
+reverse = '-r' in sys.argv
+for line in sys.stdin:
+    eng, amr = [s.split() for s in line.split('|||')]
+    links = ['%%d-%%d' %% (i, i) for i in range(min(len(eng), len(amr)))]
+    if reverse:
+        links = links[::-1]
+    sys.stdout.write('%%s ||| %%s ||| %%s ||| -1.0\\n' %% (' '.join(eng), ' '.join(amr), ' '.join(links)))
+    sys.stdout.flush()
+''' % sys.executable
+
+# Stub for atools that reads the forward and reverse alignments and outputs the forward one
+stub_atools = '''#!%s
+import sys
+while True:
+    fwd = sys.stdin.readline()
+    rev = sys.stdin.readline()
+    if not fwd:
+        break
+    sys.stdout.write(fwd)
+    sys.stdout.flush()
+''' % sys.executable
+
+
+class AlignerFAAWorker(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        for name, code in (('fast_align', stub_fast_align), ('atools', stub_atools)):
+            fn = os.path.join(self.tmp_dir, name)
+            with open(fn, 'w') as f:
+                f.write(code)
+            os.chmod(fn, os.stat(fn).st_mode | stat.S_IEXEC)
+        params = {'q':0.16, 'a':0.04, 'heuristic':'grow-diag-final-and', 'fwd_T':0.1, 'fwd_m':1.0}
+        with open(os.path.join(self.tmp_dir, 'amrlib_meta.json'), 'w') as f:
+            json.dump({'train_params':params}, f)
+        self.aligner = TrainedAligner(self.tmp_dir, bin_dir=self.tmp_dir, persistent=True, timeout=10.0)
+
+    def tearDown(self):
+        self.aligner.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def testPersistent(self):
+        eng_lines = ['the boy wants to go', 'he', 'a b c'] * 1000
+        amr_lines = ['boy want-01 go-02', 'he', 'x y'] * 1000
+        at_lines  = self.aligner.align(eng_lines, amr_lines)
+        self.assertEqual(at_lines[:3], ['0-0 1-1 2-2', '0-0', '0-0 1-1'])
+        self.assertEqual(len(at_lines), len(eng_lines))
+        # The same processes are used for the next call
+        pids = {name:w.proc.pid for name, w in self.aligner.workers.items()}
+        self.assertEqual(self.aligner.align(['a b'], ['x y']), ['0-0 1-1'])
+        self.assertEqual(pids, {name:w.proc.pid for name, w in self.aligner.workers.items()})
+
+    def testRestart(self):
+        self.assertEqual(self.aligner.align(['a b'], ['x y']), ['0-0 1-1'])
+        worker = self.aligner.workers['fwd']
+        worker.proc.kill()
+        worker.proc.wait()
+        self.assertEqual(self.aligner.align(['a b'], ['x y']), ['0-0 1-1'])
+        self.assertEqual(worker.restarts, 1)
+
+
+if __name__ == '__main__':
+    level  = logging.ERROR
+    format = '[%(levelname)s %(filename)s ln=%(lineno)s] %(message)s'
+    logging.basicConfig(level=level, format=format)
+
+    # run all methods that start with 'test'
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+import sys
+sys.path.insert(0, '../..')    # make '..' first in the lib search path
+import os
+import logging
+import tempfile
+import unittest
+import penman
+from   penman.models.noop import NoOpModel
+from   amrlib.alignments.rbw_aligner.rbw_aligner import RBWAligner, CandidateIndex
+from   amrlib.alignments.rbw_aligner.match_candidates import get_match_candidates, get_cache_info
+from   amrlib.alignments.rbw_aligner.match_candidates import could_be_number
+
+
+test_graph = '''
+# ::tokens ["The", "boys", "want", "the", "other", "boys", "to", "establish", "a", "store", "."]
+# ::lemmas ["the", "boy", "want", "the", "other", "boy", "to", "establish", "a", "store", "."]
+(w / want-01
+   :ARG0 (b / boy)
+   :ARG1 (e / establishment-01
+            :ARG0 (b2 / boy)
+            :ARG1 (s / store)))
+'''
+
+
+class AlignerRBW(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    def testCandidateIndex(self):
+        index = CandidateIndex([['boys', 'boy'], ['to', 'to'], ['established', 'establish'], ['boy', 'boy']])
+        self.assertEqual(index.get_exact('boy'), [0, 3])
+        self.assertEqual(index.get_exact('to'), [1])
+        self.assertEqual(index.get_longest_prefix('establishment'), (9, [2]))
+        self.assertEqual(index.get_longest_prefix('boyish'), (3, [0, 3]))
+        self.assertEqual(index.get_longest_prefix('xyz'), (0, [0, 1, 2, 3]))
+
+    def testMatchCandidates(self):
+        self.assertEqual(get_match_candidates('Twenty-One', 'twenty-one'), ['twenty-one', 'twenty-one', '21'])
+        self.assertEqual(get_match_candidates('unhappy', 'unhappy'), ['unhappy', 'unhappy', 'happy'])
+        self.assertEqual(get_match_candidates('May', 'may'), ['may', 'may', '5'])
+        self.assertFalse(could_be_number('store'))
+        self.assertTrue(could_be_number('1984'))
+        hits = get_cache_info().hits
+        candidates = get_match_candidates('May', 'may')
+        candidates.append('x')      # the cached value must not be modified
+        self.assertEqual(get_match_candidates('May', 'may'), ['may', 'may', '5'])
+        self.assertEqual(get_cache_info().hits, hits + 2)
+
+    # Repeated concepts align to the first unaligned token, in order.  Fuzzy matches use the prefix.
+    def testAlignments(self):
+        aligner = RBWAligner.from_string_w_json(test_graph)
+        alignments = aligner.get_penman_graph().metadata['alignments']
+        self.assertEqual(alignments, '1-1.1 2-1 5-1.2.1 7-1.2 9-1.2.2')
+
+    def testAlignCorpus(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            out_fn = os.path.join(tmpdir, 'aligned.txt')
+            num_written, num_failed, _ = RBWAligner.align_corpus([test_graph, '(bad', test_graph], out_fn,
+                                                                 workers=1, keep_keys=['alignments'])
+            self.assertEqual((num_written, num_failed), (2, 1))
+            graphs = penman.load(out_fn)
+        self.assertEqual(len(graphs), 2)
+        self.assertEqual(graphs[1].metadata, {'alignments':'1-1.1 2-1 5-1.2.1 7-1.2 9-1.2.2'})
+
+    # The file should be the same as penman.dump of the aligned graphs
+    def testAlignCorpusFormat(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            out_fn = os.path.join(tmpdir, 'aligned.txt')
+            RBWAligner.align_corpus([test_graph, test_graph], out_fn, workers=1)
+            dump_fn = os.path.join(tmpdir, 'dump.txt')
+            graphs = [RBWAligner.from_string_w_json(test_graph).get_penman_graph() for _ in range(2)]
+            penman.dump(graphs, dump_fn, model=NoOpModel(), indent=6)
+            with open(out_fn) as f1, open(dump_fn) as f2:
+                self.assertEqual(f1.read(), f2.read())
+
+
+if __name__ == '__main__':
+    level  = logging.WARNING
+    format = '[%(levelname)s %(filename)s ln=%(lineno)s] %(message)s'
+    logging.basicConfig(level=level, format=format)
+
+    # run all methods that start with 'test'
+    unittest.main()
@@ -0,0 +1,46 @@
+#!/usr/bin/python3
+import sys
+sys.path.insert(0, '../..')    # make '..' first in the lib search path
+import logging
+import unittest
+from   concurrent.futures import ThreadPoolExecutor
+from   amrlib.alignments.faa_aligner import feat2tree
+
+
+amr_lines   = ['(w / want-01 :ARG0 (b / boy) :ARG1 (g / go-02 :ARG0 b))',
+               '(n / name :op1 "York" :op2 "City")']
+align_lines = ['w__/__want-01__e.2 w__:arg0__e.1 w__:arg0__b__e.1 g__/__go-02__e.4',
+               'n__:op1__"york"__e.0,1']
+
+
+class FAAFeat2Tree(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    def testAlign(self):
+        lines = feat2tree.align(amr_lines, align_lines)
+        self.assertEqual(lines[0], '(w / want-01~e.2 :arg0~e.1 (b / boy) :arg1 (g / go-02~e.4 :arg0 b))')
+        self.assertEqual(lines[1], '(n / name :op1 "york"~e.0,1 :op2 "city")')
+
+    # The second "b" is a coref so it's a leaf, not the (b / boy) node
+    def testCorefy(self):
+        _, amr = feat2tree.input_amrparse(amr_lines[0])
+        amr = amr.corefy(amr.get_nonterm_nodes())
+        self.assertEqual([n.val for n in amr.get_nonterm_nodes()], ['w', 'b', 'g'])
+        self.assertFalse(amr.feats[2].node.feats[1].node.feats)
+
+    def testThreads(self):
+        expected = feat2tree.align(amr_lines * 50, align_lines * 50)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda _: feat2tree.align(amr_lines * 50, align_lines * 50), range(8)))
+        for result in results:
+            self.assertEqual(result, expected)
+
+
+if __name__ == '__main__':
+    level  = logging.WARNING
+    format = '[%(levelname)s %(filename)s ln=%(lineno)s] %(message)s'
+    logging.basicConfig(level=level, format=format)
+
+    # run all methods that start with 'test'
+    unittest.main()
@@ -0,0 +1,35 @@
+#!/usr/bin/python3
+import sys
+sys.path.insert(0, '../..')    # make '..' first in the lib search path
+import logging
+import unittest
+from   amrlib.alignments.faa_aligner.get_alignments import GetAlignments
+
+
+class FAAGetAlignments(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    def testAlignments(self):
+        graphs = ['(w / want-01~e.1 :ARG0~e.0 (b / boy~e.0) :ARG1 (g / go-02~e.3,4 :ARG0 b))',
+                  '(n / name :op1 "New York"~e.2)']
+        ga = GetAlignments.from_amr_strings(graphs)
+        self.assertEqual(ga.get_alignments(), ['1-1 0-1.1.r 0-1.1 3-1.2 4-1.2 ', '2-1.1 '])
+
+    # Graphs larger than the old fixed size tree (1000 tokens, 100 children per node)
+    def testLargeGraph(self):
+        ops   = ' '.join(':op%d (x%d / thing~e.%d)' % (i+1, i, i) for i in range(500))
+        graph = '(a / and %s)' % ops
+        alignment = GetAlignments.from_amr_strings([graph]).get_alignments()[0]
+        links = alignment.split()
+        self.assertEqual(len(links), 500)
+        self.assertEqual(links[-1], '499-1.500')
+
+
+if __name__ == '__main__':
+    level  = logging.WARNING
+    format = '[%(levelname)s %(filename)s ln=%(lineno)s] %(message)s'
+    logging.basicConfig(level=level, format=format)
+
+    # run all methods that start with 'test'
+    unittest.main()
@@ -0,0 +1,51 @@
+#!/usr/bin/python3
+import sys
+sys.path.insert(0, '../..')    # make '..' first in the lib search path
+import os
+import shutil
+import logging
+import tempfile
+import unittest
+from   amrlib.alignments.faa_aligner.preprocess import preprocess_train, preprocess_train_to_dir
+
+
+eng_lines = ['the boy wants to go .', 'i am 24 and a mother .', 'he said that .'] * 5
+amr_lines = ['(w / want-01 :arg0 (b / boy) :arg1 (g / go-02 :arg0 b))',
+             '(a / and :op1 (a2 / age-01 :arg1 (i / i) :arg2 24) :op2 (m / mother :poss i))',
+             '(s / say-01 :arg0 (h / he) :arg1 (t / that))'] * 5
+
+
+class FAAPreprocess(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    # The streaming version should write the same files as preprocess_train + ProcData.save
+    def testStreaming(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            preprocess_train(eng_lines, amr_lines).save(tmp_dir)
+            expected = self.read_files(tmp_dir)
+            for processes in (1, 2):
+                count = preprocess_train_to_dir(iter(eng_lines), iter(amr_lines), tmp_dir, chunk_size=4,
+                                                processes=processes)
+                self.assertEqual(count, len(eng_lines))
+                self.assertEqual(self.read_files(tmp_dir), expected)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    @staticmethod
+    def read_files(wk_dir):
+        data = {}
+        for fn in ('fa_in.txt', 'eng_tok_origpos.txt', 'amr_tuple.txt'):
+            with open(os.path.join(wk_dir, fn)) as f:
+                data[fn] = f.read()
+        return data
+
+
+if __name__ == '__main__':
+    level  = logging.WARNING
+    format = '[%(levelname)s %(filename)s ln=%(lineno)s] %(message)s'
+    logging.basicConfig(level=level, format=format)
+
+    # run all methods that start with 'test'
+    unittest.main()
@@ -0,0 +1,49 @@
+#!/usr/bin/python3
+import sys
+sys.path.insert(0, '../..')    # make '..' first in the lib search path
+import logging
+import unittest
+import warnings
+from   nltk.tokenize.destructive import NLTKWordTokenizer
+from   nltk.translate.bleu_score import corpus_bleu, sentence_bleu
+from   amrlib.evaluate.fast_bleu_scorer import FastBLEUScorer, fast_tokenize, FALLBACK_RE
+
+
+refs = ['The boy wants to go to the store.', 'I am 24 and a mother of a 2.5 year old.',
+        'Paris, the city, has 1,000 people at 12:30!', 'He said 5% of the thing was for $3; really?']
+hyps = ['The boy wants to go to a store.', 'I am 24 and the mother of a 2.5 year old child.',
+        'Paris is a big city with 1,000 people at 12:30 .', 'He said 5% was for him; really?']
+
+
+class FastBLEU(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    # Strings that use the fast path should give the same tokens as nltk's Treebank rules
+    def testTokenize(self):
+        tokenizer = NLTKWordTokenizer()
+        for string in refs + hyps:
+            self.assertIsNone(FALLBACK_RE.search(string))
+            self.assertEqual(fast_tokenize(string), tokenizer.tokenize(string))
+        self.assertIsNotNone(FALLBACK_RE.search('He said "no". She left.'))
+
+    def testBLEU(self):
+        scorer   = FastBLEUScorer()
+        refs_tok = scorer.tokenize_strings(refs, space_tokenize=True)
+        hyps_tok = scorer.tokenize_strings(hyps, space_tokenize=True)
+        bleu, ref_len, hyp_len, sent_bleu = scorer.compute_bleu_and_sentences(refs_tok, hyps_tok)
+        self.assertAlmostEqual(bleu, corpus_bleu([[r] for r in refs_tok], hyps_tok))
+        self.assertEqual((ref_len, hyp_len), (scorer.get_length(refs_tok), scorer.get_length(hyps_tok)))
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')     # nltk warns about 0 counts for higher n-grams
+            for ref, hyp, score in zip(refs_tok, hyps_tok, sent_bleu):
+                self.assertAlmostEqual(float(score), sentence_bleu([ref], hyp))
+
+
+if __name__ == '__main__':
+    level  = logging.WARNING
+    format = '[%(levelname)s %(filename)s ln=%(lineno)s] %(message)s'
+    logging.basicConfig(level=level, format=format)
+
+    # run all methods that start with 'test'
+    unittest.main()
@@ -0,0 +1,54 @@
+#!/usr/bin/python3
+import sys
+sys.path.insert(0, '../..')    # make '..' first in the lib search path
+import os
+import shutil
+import logging
+import tempfile
+import unittest
+from   amrlib.alignments.isi_tables import transpose_adtable, transpose_ttable
+
+
+class ISITables(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, fn, text):
+        fn = os.path.join(self.tmp_dir, fn)
+        with open(fn, 'w') as f:
+            f.write(text)
+        return fn
+
+    def read(self, fn):
+        with open(os.path.join(self.tmp_dir, fn)) as f:
+            return f.read()
+
+    def testADTable(self):
+        # duplicates keep the last value, zero values and positions >= 110 are dropped
+        a1 = self.write('a1', '2 1 3 5 0.5\n1 1 3 5 0.25\n2 1 3 7 0.75\n1 2 2 5 0\n120 1 1 5 0.5\n')
+        d1 = self.write('d1', '2 1 3 5 0.5\n1 1 4 5 0.25\n3 2 3 1 0.125\n')
+        transpose_adtable(a1, d1, os.path.join(self.tmp_dir, 'atable'), os.path.join(self.tmp_dir, 'dtable'))
+        self.assertEqual(self.read('atable'), '2 3 1 100 0.125000\n1 1 5 100 0.250000\n1 2 5 100 0.500000\n')
+        self.assertEqual(self.read('dtable'), '1 1 100 3 0.250000\n1 2 100 3 0.750000\n')
+
+    def testTTable(self):
+        # only the leading null word lines of t0 are used and t1 is transposed, without the null word
+        t0 = self.write('t0', '0 2 0.5\n0 1 0.25\n1 1 0.9\n0 3 0.9\n')
+        t1 = self.write('t1', '4 1 0.125\n3 2 0.0000000001\n5 0 0.9\n2 1 0.5\n')
+        transpose_ttable(t0, t1, os.path.join(self.tmp_dir, 'ttable'))
+        self.assertEqual(self.read('ttable'), '0 1 0.250000\n0 2 0.500000\n1 2 0.500000\n1 4 0.125000\n')
+
+
+if __name__ == '__main__':
+    level  = logging.WARNING
+    format = '[%(levelname)s %(filename)s ln=%(lineno)s] %(message)s'
+    logging.basicConfig(level=level, format=format)
+
+    # run all methods that start with 'test'
+    unittest.main()
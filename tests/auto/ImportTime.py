@@ -0,0 +1,55 @@
+#!/usr/bin/python3
+import sys
+sys.path.insert(0, '../..')    # make '..' first in the lib search path
+import os
+import logging
+import unittest
+import subprocess
+
+
+# Libraries that are slow to import and should only be loaded when they're used
+HEAVY_MODULES = ('torch', 'transformers', 'spacy', 'smatch', 'nltk', 'graphviz', 'requests')
+IMPORT_BUDGET = 0.5     # seconds, for "import amrlib"
+REPO_DIR      = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+
+# Run the import in a new interpreter with "python -X importtime" and return a dictionary of the
+# top-level package names imported, to their cumulative import time in seconds
+def get_import_times(module_name):
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module_name],
+                          cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+class ImportTime(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    def testImportAMRLib(self):
+        times = get_import_times('amrlib')
+        heavy = [name for name in times if name.split('.')[0] in HEAVY_MODULES]
+        self.assertEqual(heavy, [])
+        self.assertLess(times['amrlib'], IMPORT_BUDGET)
+
+    # Modules whose heavy dependencies are only needed by some of their functions
+    def testLazyModules(self):
+        for module_name in ('amrlib.evaluate.fast_bleu_scorer', 'amrlib.graph_processing.amr_plot',
+                            'amrlib.graph_processing.annotator'):
+            times = get_import_times(module_name)
+            heavy = [name for name in times if name.split('.')[0] in HEAVY_MODULES]
+            self.assertEqual(heavy, [], module_name)
+
+
+if __name__ == '__main__':
+    level  = logging.WARNING
+    format = '[%(levelname)s %(filename)s ln=%(lineno)s] %(message)s'
+    logging.basicConfig(level=level, format=format)
+
+    # run all methods that start with 'test'
+    unittest.main()
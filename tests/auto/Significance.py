@@ -0,0 +1,55 @@
+#!/usr/bin/python3
+import sys
+sys.path.insert(0, '../..')    # make '..' first in the lib search path
+import logging
+import unittest
+import numpy
+from   nltk.translate.bleu_score import corpus_bleu
+from   amrlib.evaluate.bleu_scorer import BLEUScorer
+from   amrlib.evaluate.significance import get_bleu_stats, smatch_from_stats, bootstrap_ci
+from   amrlib.evaluate.significance import paired_bootstrap, approximate_randomization
+
+
+refs = ['the boy wants to go to the store .', 'i am 24 and a mother of a 2 and a half year old .',
+        'the city of paris is big .', 'he said that the thing was for the person .']
+hyps = ['the boy wants to go to a store .', 'i am 24 and the mother of a 2 and a half year old child .',
+        'paris is a big city .', 'he said the thing was for him .']
+
+
+class Significance(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    # BLEU from the per-sentence stats should be the same as nltk's corpus_bleu
+    def testBLEUStats(self):
+        refs_tok = BLEUScorer.tokenize_strings(refs, space_tokenize=True)
+        hyps_tok = BLEUScorer.tokenize_strings(hyps, space_tokenize=True)
+        stats = get_bleu_stats(refs_tok, hyps_tok)
+        bleu  = BLEUScorer.compute_bleu_from_stats(stats.sum(axis=0))
+        self.assertAlmostEqual(float(bleu), corpus_bleu([[r] for r in refs_tok], hyps_tok))
+        result = bootstrap_ci(stats, 'bleu', num_samples=200, seed=0)
+        self.assertLessEqual(result['ci'][0], result['ci'][1])
+
+    def testSmatch(self):
+        rng     = numpy.random.default_rng(0)
+        gold    = rng.integers(10, 40, size=500)
+        stats_a = numpy.stack([gold - rng.integers(0, 3, size=500), gold, gold], axis=1)
+        stats_b = numpy.stack([gold - rng.integers(0, 8, size=500), gold, gold], axis=1)
+        self.assertAlmostEqual(float(smatch_from_stats(stats_a[0])), stats_a[0, 0] / gold[0])
+        result = paired_bootstrap(stats_a, stats_b, 'smatch', num_samples=1000, seed=0)
+        self.assertGreater(result['delta'], 0)
+        self.assertLess(result['p_value'], 0.01)
+        self.assertTrue(result['delta_ci'][0] <= result['delta'] <= result['delta_ci'][1])
+        # Identical systems should not be significantly different
+        result = approximate_randomization(stats_a, stats_a, 'smatch', num_samples=200, seed=0)
+        self.assertEqual(result['p_value'], 1.0)
+        self.assertLess(approximate_randomization(stats_a, stats_b, seed=0)['p_value'], 0.01)
+
+
+if __name__ == '__main__':
+    level  = logging.WARNING
+    format = '[%(levelname)s %(filename)s ln=%(lineno)s] %(message)s'
+    logging.basicConfig(level=level, format=format)
+
+    # run all methods that start with 'test'
+    unittest.main()
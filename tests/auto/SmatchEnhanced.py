@@ -0,0 +1,153 @@
+#!/usr/bin/python3
+import sys
+sys.path.insert(0, '../..')    # make '..' first in the lib search path
+import os
+import logging
+import tempfile
+import unittest
+import amr      # part of the smatch library
+from   amrlib.evaluate.smatch_enhanced import unlabel, remove_wsd, compute_subscores, compute_smatch
+from   amrlib.evaluate.smatch_reentracy_srl import AMR as LegacyAMR
+from   amrlib.evaluate.smatch_reentracy_srl import reentrancy, srl, parse_relations
+from   amrlib.evaluate.smatch_graph_store import GraphStore, VARIANTS
+from   amrlib.evaluate.smatch_scorer import SmatchScorer, sum_counts
+from   amrlib.evaluate.smatch_engine import SmatchEngine
+from   amrlib.evaluate.smatch_cache import SmatchCache
+from   amrlib.evaluate.smatch_stream import stream_smatch, load_graph_scores, get_worst_graphs
+
+
+test_entries = [
+    '(a / and :op1 (a2 / age-01 :ARG1 (i / i) :ARG2 (t / temporal-quantity :quant 24 :unit (y2 / year))) '
+    ':op2 (h / have-rel-role-91 :ARG0 i :ARG1 (p / person :age (t3 / temporal-quantity :quant 2.5 '
+    ':unit (y / year))) :ARG2 (m / mother)))',
+    '(w / want-01 :ARG0 (b / boy :mod (b2 / big)) :ARG1 (g / go-02 :ARG0 b :polarity -) :ARG1-of b)',
+    '(c / city :wiki "Paris" :name (n / name :op1 "Paris") :consist-of (p / person :ARG0-of (r / run-02)))',
+    '(s / say-01 :ARG0 (p / person :mod 5) :ARG1 (t / thing :prep-on-behalf-of p) :time (d / date-entity '
+    ':year 2012 :month 3))',
+]
+
+gold_entries = [
+    '(a / and :op1 (a2 / age-01 :ARG1 (i / i) :ARG2 (t / temporal-quantity :quant 24 :unit (y2 / year))) '
+    ':op2 (h / have-rel-role-91 :ARG0 i :ARG1 (p / person :age (t3 / temporal-quantity :quant 2.5 '
+    ':unit (y / year))) :ARG2 (m / mother)))',
+    '(w / want-02 :ARG0 (b / boy) :ARG1 (g / go-02 :ARG0 b :polarity -))',
+    '(c / city :wiki "Paris" :name (n / name :op1 "Paris"))',
+    '(s / say-01 :ARG0 (p / person) :ARG1 (t / thing))',
+]
+
+
+def get_triples(amr_class, string, prefix):
+    graph = amr_class.parse_AMR_line(string)
+    graph.rename_node(prefix)
+    return graph.get_triples()
+
+
+class SmatchEnhanced(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    # The graph store's triples should be the same as re-parsing the modified strings
+    def testGraphStoreTriples(self):
+        store = GraphStore(test_entries + gold_entries)
+        for entry, graph in zip(test_entries + gold_entries, store):
+            self.assertEqual(graph.get_triples('a'), get_triples(amr.AMR, entry, 'a'))
+            self.assertEqual(graph.get_triples('b', 'unlabeled'), get_triples(amr.AMR, unlabel(entry), 'b'))
+            self.assertEqual(graph.get_triples('a', 'no_wsd'), get_triples(amr.AMR, remove_wsd(entry), 'a'))
+            legacy = LegacyAMR.parse_AMR_line(entry).get_triples()
+            self.assertEqual(graph.get_legacy_triples(), legacy[1] + legacy[2])
+
+    def testGraphStoreBadEntry(self):
+        store = GraphStore(['(a / and :op1', '(a / b) (c / d))'])
+        self.assertEqual(len(store), 2)
+        self.assertIsNone(store[1])
+        self.assertEqual(store.get_triples('a')[1], None)
+
+    def testSubscores(self):
+        scores = compute_subscores(GraphStore(test_entries), GraphStore(gold_entries))
+        self.assertEqual(scores, compute_subscores(test_entries, gold_entries))
+        self.assertEqual(scores['Wikification'], (1.0, 1.0, 1.0))
+
+    def testReentrancySRL(self):
+        graph = GraphStore(test_entries[1:2])[0]
+        triples, v2c = reentrancy(graph.v2c, graph.get_legacy_triples())
+        self.assertEqual(sorted(triples), [('ARG0', 'g', 'b'), ('ARG0', 'w', 'b')])
+        self.assertEqual(list(v2c), ['w', 'b', 'g'])
+        amr = parse_relations(*srl(graph.v2c, graph.get_legacy_triples()))
+        self.assertEqual(amr.nodes, ['w', 'b', 'g'])
+        self.assertEqual(amr.relations[0], {'b':'ARG0', 'g':'ARG1'})
+
+    def testScorer(self):
+        with SmatchScorer(processes=2) as scorer:
+            counts = scorer.score_entries(test_entries, gold_entries)
+            self.assertEqual(counts[0], (23, 23, 23))     # identical graphs
+            self.assertEqual(compute_smatch(test_entries, gold_entries, scorer=scorer),
+                             compute_smatch(test_entries, gold_entries))
+            variant_counts = scorer.score_graphs(GraphStore(test_entries), GraphStore(gold_entries), VARIANTS)
+            self.assertEqual(sum_counts(variant_counts['smatch']), sum_counts(counts))
+            pool = scorer.pool
+            scorer.score_entries(test_entries, gold_entries)
+            self.assertIs(scorer.pool, pool)                # pool is reused
+        self.assertIsNone(scorer.pool)
+
+    def testScorerChunks(self):
+        scorer = SmatchScorer(processes=2, chunks_per_process=2)
+        chunks = scorer.get_chunks([10, 1, 1, 1, 5, 5, 1, 1, 1, 4])
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(sorted(i for c in chunks for i in c), list(range(10)))
+        self.assertEqual(chunks[0], [0])
+
+    # The vectorized engine should give the same scores as the smatch library
+    def testEngine(self):
+        with SmatchScorer(processes=1) as scorer:
+            expected = scorer.score_entries(test_entries, gold_entries)
+        with SmatchScorer(processes=1, engine=SmatchEngine(seed=0)) as scorer:
+            counts = scorer.score_entries(test_entries, gold_entries)
+            self.assertEqual(counts, expected)
+            variant_counts = scorer.score_graphs(GraphStore(test_entries), GraphStore(gold_entries), VARIANTS)
+            self.assertEqual(variant_counts['smatch'], expected)
+        engine = SmatchEngine(seed=1)
+        self.assertEqual(engine.get_amr_match(test_entries[3], gold_entries[3]),
+                         engine.get_amr_match(test_entries[3], gold_entries[3]))
+
+    # Cached pairs should not be re-scored and the cache should be reloaded from disk
+    def testCache(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fn = os.path.join(tmpdir, 'cache.json')
+            with SmatchScorer(processes=1, cache=SmatchCache(fn)) as scorer:
+                counts = scorer.score_entries(test_entries, gold_entries)
+                self.assertEqual(scorer.cache.misses, 4)
+                scorer.score_graphs(GraphStore(test_entries), GraphStore(gold_entries), VARIANTS)
+                self.assertEqual(scorer.cache.hits, 4)      # smatch variant was already cached
+            cache = SmatchCache(fn)
+            self.assertEqual(len(cache), 12)
+            with SmatchScorer(processes=1, cache=cache) as scorer:
+                changed = test_entries[:3] + [gold_entries[3]]
+                new_counts = scorer.score_entries(changed, gold_entries)
+                self.assertEqual((cache.hits, cache.misses), (3, 1))
+                self.assertEqual(new_counts[:3], counts[:3])
+                self.assertEqual(new_counts[3][0], new_counts[3][2])
+
+    # Streaming scores should match compute_smatch and the worst graph should be found
+    def testStream(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            test_fn, gold_fn = os.path.join(tmpdir, 'test.txt'), os.path.join(tmpdir, 'gold.txt')
+            for fn, entries in ((test_fn, test_entries), (gold_fn, gold_entries)):
+                with open(fn, 'w') as f:
+                    f.write('\n\n'.join('# ::id %d\n%s' % (i, e) for i, e in enumerate(entries)))
+            expected = compute_smatch(test_entries, gold_entries)
+            with SmatchScorer(processes=1) as scorer:
+                for out_fn in ('scores.csv', 'scores.npz'):
+                    out_fn = os.path.join(tmpdir, out_fn)
+                    scores = stream_smatch(test_fn, gold_fn, out_fn, batch_size=3, scorer=scorer)
+                    self.assertEqual(scores, expected)
+                    self.assertEqual(len(load_graph_scores(out_fn)['f_score']), 4)
+                    self.assertEqual(get_worst_graphs(out_fn, 1)[0][0], 3)
+
+
+if __name__ == '__main__':
+    level  = logging.WARNING
+    format = '[%(levelname)s %(filename)s ln=%(lineno)s] %(message)s'
+    logging.basicConfig(level=level, format=format)
+
+    # run all methods that start with 'test'
+    unittest.main()
@@ -0,0 +1,165 @@
+#!/usr/bin/python3
+import sys
+sys.path.insert(0, '../..')    # make '..' first in the lib search path
+import os
+import json
+import shutil
+import logging
+import tempfile
+import unittest
+import threading
+from   urllib.parse import parse_qs
+from   http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from   amrlib.graph_processing.wiki_adder import WikiAdder
+from   amrlib.graph_processing.wiki_cache import WikiCache
+from   amrlib.graph_processing.wiki_remover import wiki_remove_file
+
+
+amr_text = '''# ::id 1
+# ::snt Barack Obama visited Paris .
+(v / visit-01
+      :ARG0 (p / person
+            :name (n / name
+                  :op1 "Barack"
+                  :op2 "Obama"))
+      :ARG1 (c / city
+            :name (n2 / name
+                  :op1 "Paris")))
+
+# ::id 2
+# ::snt Obama lives in Nowhere .
+(l / live-01
+      :ARG0 (p / person
+            :name (n / name
+                  :op1 "Barack"
+                  :op2 "Obama"))
+      :location (c / city
+            :name (n2 / name
+                  :op1 "Nowhere")))
+'''
+
+wiki_data = {'Barack Obama':'Barack_Obama', 'Paris':'Paris'}
+
+
+# Stand-in for the Spotlight annotate endpoint.  The first query for each phrase returns a 503.
+class SpotlightHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        length = int(self.headers['Content-Length'])
+        text   = parse_qs(self.rfile.read(length).decode('utf-8'))['text'][0]
+        with self.server.lock:
+            self.server.queries.append(text)
+            first = self.server.queries.count(text) == 1
+        if first:
+            self.send_response(503)
+            self.end_headers()
+            return
+        resources = []
+        if text in wiki_data:
+            resources.append({'@URI':'http://dbpedia.org/resource/' + wiki_data[text],
+                              '@similarityScore':'0.99', '@surfaceForm':text})
+        body = json.dumps({'Resources':resources}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class WikiAdderSpotlight(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), SpotlightHandler)
+        self.server.lock    = threading.Lock()
+        self.server.queries = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = 'http://127.0.0.1:%d/rest/annotate' % self.server.server_address[1]
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmp_dir)
+
+    # The concurrent version should query each distinct name once (plus the retry) and write
+    # the same file as the serial version
+    def testConcurrent(self):
+        infn = os.path.join(self.tmp_dir, 'in.txt')
+        with open(infn, 'w') as f:
+            f.write(amr_text)
+        outputs, stats = [], []
+        for concurrent in (False, True):
+            self.server.queries = []
+            wiki  = WikiAdder(url=self.url, max_workers=4, backoff=0.01)
+            outfn = os.path.join(self.tmp_dir, 'out_%s.txt' % concurrent)
+            wiki.wikify_file(infn, outfn, concurrent=concurrent)
+            wiki.close()
+            self.assertEqual(wiki.server_errors, 0)
+            self.assertEqual(wiki.wiki_found, 3)
+            stats.append((wiki.wiki_lookups, wiki.cache_hits, wiki.server_queries, wiki.wiki_found))
+            with open(outfn) as f:
+                outputs.append(f.read())
+        self.assertEqual(stats[0], (4, 1, 3, 3))
+        self.assertEqual(stats[0], stats[1])
+        self.assertEqual(sorted(self.server.queries), ['Barack Obama']*2 + ['Nowhere']*2 + ['Paris']*2)
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertIn(':wiki "Barack_Obama"', outputs[1])
+        self.assertIn(':wiki -', outputs[1])
+
+    # With the database cache, negative results are saved too so a second run makes no queries
+    def testCacheDB(self):
+        infn = os.path.join(self.tmp_dir, 'in.txt')
+        with open(infn, 'w') as f:
+            f.write(amr_text)
+        json_fn = os.path.join(self.tmp_dir, 'cache.json')
+        with open(json_fn, 'w') as f:
+            json.dump({'Paris':'Paris'}, f)
+        db_fn = os.path.join(self.tmp_dir, 'cache.db')
+        with WikiCache(db_fn) as cache:
+            self.assertEqual(cache.import_json(json_fn), 1)
+        for concurrent in (False, True):
+            self.server.queries = []
+            with WikiCache(db_fn) as cache:
+                wiki = WikiAdder(url=self.url, backoff=0.01, cache_db=cache)
+                wiki.wikify_file(infn, os.path.join(self.tmp_dir, 'out.txt'), concurrent=concurrent)
+                wiki.close()
+                self.assertEqual(cache.get('Nowhere'), (True, None))
+            self.assertEqual(wiki.wiki_found, 3)
+            expected = ['Barack Obama']*2 + ['Nowhere']*2 if not concurrent else []
+            self.assertEqual(sorted(self.server.queries), expected)
+        # Expired entries aren't returned
+        with WikiCache(db_fn, negative_ttl=-1) as cache:
+            self.assertEqual(cache.get('Nowhere'), (False, None))
+            self.assertEqual(cache.get('Paris'), (True, 'Paris'))
+
+    # The process pool versions should write the same files as the serial versions
+    def testProcesses(self):
+        infn = os.path.join(self.tmp_dir, 'in.txt')
+        with open(infn, 'w') as f:
+            f.write('\n'.join([amr_text] * 3))
+        outputs = []
+        for processes in (1, 2):
+            wiki = WikiAdder()
+            wiki.cache.update(wiki_data)
+            wiki.wikify_file(infn, os.path.join(self.tmp_dir, 'wiki.txt'), processes=processes, batch_size=4)
+            self.assertEqual((wiki.wiki_lookups, wiki.cache_hits, wiki.wiki_found), (12, 9, 9))
+            wiki_remove_file(self.tmp_dir, 'wiki.txt', self.tmp_dir, 'nowiki.txt', processes=processes,
+                             batch_size=4)
+            for fn in ('wiki.txt', 'nowiki.txt'):
+                with open(os.path.join(self.tmp_dir, fn)) as f:
+                    outputs.append(f.read())
+        self.assertEqual(outputs[:2], outputs[2:])
+        self.assertEqual(outputs[0].count(':wiki'), 12)
+        self.assertNotIn(':wiki', outputs[1])
+
+
+if __name__ == '__main__':
+    level  = logging.WARNING
+    format = '[%(levelname)s %(filename)s ln=%(lineno)s] %(message)s'
+    logging.basicConfig(level=level, format=format)
+
+    # run all methods that start with 'test'
+    unittest.main()